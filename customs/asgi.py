@@ -0,0 +1,483 @@
+from __future__ import annotations
+
+import sys
+import time
+import asyncio
+import warnings
+
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.http import parse_cookie
+
+from customs.customs import _AuthPlan, _Singleton
+from customs.exceptions import UnauthorizedException
+from customs.helpers import store_user
+from customs.metrics import MetricsSink, count_attempt, count_session_check
+from customs.results import AuthResult
+from customs.strategies.base_strategy import BaseStrategy
+
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+User = TypeVar("User")
+Scope = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[MutableMapping[str, Any]]]
+Send = Callable[[MutableMapping[str, Any]], Awaitable[None]]
+
+
+class ASGIRequest:
+    """Request object for ASGI applications. Exposes the same request information that strategies
+    use from Flask requests (headers, args, cookies and data), based on an ASGI scope.
+
+    Args:
+        scope (Scope): The ASGI connection scope
+        body (bytes, optional): The (complete) body of the request. Defaults to b"".
+    """
+
+    def __init__(self, scope: Scope, body: bytes = b"") -> None:
+        self.scope = scope
+        self.data = body
+        self.environ: Dict[str, Any] = {}
+        self.method: str = scope.get("method", "GET")
+        self.path: str = scope.get("path", "/")
+        self.headers = Headers(
+            [
+                (key.decode("latin-1"), value.decode("latin-1"))
+                for key, value in scope.get("headers", [])
+            ]
+        )
+        self.args = MultiDict(
+            parse_qsl(scope.get("query_string", b"").decode("latin-1"))
+        )
+        self.cookies = parse_cookie(self.headers.get("Cookie", ""))
+        self.session: Optional[MutableMapping] = scope.get("session")
+
+    @classmethod
+    async def from_request(cls, request: Any, read_body: bool = True) -> ASGIRequest:
+        """Create a request from a framework specific request object that exposes the ASGI
+        scope, e.g. a Starlette or Quart request.
+
+        Args:
+            request (Any): The framework request, with a `scope` attribute
+            read_body (bool, optional): Whether to read the body of the request. Defaults to True.
+
+        Returns:
+            ASGIRequest: The request
+        """
+
+        body = b""
+        if read_body:
+            if hasattr(request, "body"):
+                body = await request.body()
+            elif hasattr(request, "get_data"):
+                body = await request.get_data(as_text=False)
+        return cls(request.scope, body=body)
+
+    @property
+    def url(self) -> str:
+        scheme = self.scope.get("scheme", "http")
+        host = self.headers.get("Host")
+        if host is None:
+            server = self.scope.get("server") or ("localhost", None)
+            host = server[0] if server[1] is None else f"{server[0]}:{server[1]}"
+        query = self.scope.get("query_string", b"").decode("latin-1")
+        return urlunparse((scheme, host, self.path, "", query, ""))
+
+    def get_data(self, cache: bool = True) -> bytes:
+        return self.data
+
+
+class AsyncCustoms(metaclass=_Singleton):
+    """ASGI counterpart of Customs. AsyncCustoms is a protective layer around any ASGI application,
+    that authenticates requests using the coroutine variants of the strategies. The authenticated user
+    is added to the ASGI scope (`scope["user"]`). When the application (or a middleware) provides a
+    session in the scope (`scope["session"]`), it is used to remember authenticated users.
+
+    HTTP requests and websocket connections in a protected zone are authenticated, websocket connections
+    that fail are closed before they are accepted. The body of a request is only read for strategies that
+    declare the "content" source (e.g. the local strategy), and only up to `max_body_size`. OAuth2 strategies
+    need a Flask app (for their session and login routes) and are not supported.
+
+    Args:
+        app (Callable): The ASGI application to protect
+        use_sessions (bool, optional): Whether or not to use sessions for storing user information.
+            Defaults to True.
+        unauthorized_redirect_url (str, optional): The URL to redirect to when a user tries to access an
+            endpoint without proper authorization
+        metrics (Optional[MetricsSink], optional): Sink for metrics on strategy attempts, latencies and sessions.
+            Defaults to None (no metrics).
+        parallel_strategies (bool, optional): Attempt I/O bound strategies (see `BaseStrategy.io_bound`)
+            concurrently, as tasks. The first successful strategy wins, failures are still reported for the
+            first strategy. Defaults to False.
+        max_body_size (int, optional): The maximum size in bytes of a body that is read for authentication,
+            larger requests are rejected (413). Defaults to 1 MiB.
+
+    Examples:
+        >>> from customs.asgi import AsyncCustoms
+        >>> customs = AsyncCustoms(app)
+        >>> # Define strategies here ...
+        >>> customs.safe_zone("/api", strategies=["jwt"])
+        >>> # Serve `customs` instead of `app`
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        use_sessions: bool = True,
+        unauthorized_redirect_url: Optional[str] = None,
+        metrics: Optional[MetricsSink] = None,
+        parallel_strategies: bool = False,
+        max_body_size: int = 1024 * 1024,
+    ) -> None:
+
+        # Store input arguments
+        self.app = app
+        self.use_sessions = use_sessions
+        self.unauthorized_redirect_url = unauthorized_redirect_url
+        self.metrics = metrics
+        self.parallel_strategies = parallel_strategies
+        self.max_body_size = max_body_size
+
+        # Registered available strategies, and the protected zones (path prefix and plan)
+        self.available_strategies: Dict[str, BaseStrategy] = {}
+        self.zones: List[Tuple[str, _AuthPlan]] = []
+
+    def register_strategy(self, name: str, strategy: BaseStrategy) -> AsyncCustoms:
+        """Register a strategy, and make it available by its name.
+
+        Args:
+            name (str): The name of the strategy
+            strategy (BaseStrategy): The strategy (which should inherit from BaseStrategy)
+
+        Returns:
+            AsyncCustoms: Returns this instance of customs for chaining
+        """
+
+        # OAuth2 strategies depend on Flask (the module is only loaded when such a strategy exists)
+        oauth2 = sys.modules.get("customs.strategies.oauth2_strategy")
+        if oauth2 is not None and isinstance(strategy, oauth2.OAuth2Strategy):
+            warnings.warn(
+                f"Strategy '{name}' needs a Flask app and will not work with AsyncCustoms"
+            )
+        self.available_strategies[name] = strategy
+        return self
+
+    def safe_zone(
+        self, zone: str, strategies: List[Union[str, BaseStrategy]]
+    ) -> AsyncCustoms:
+        """Protect every path that starts with a prefix with specific strategies. When multiple zones
+        match a path, the zone with the longest prefix is used.
+
+        Args:
+            zone (str): The path prefix to protect, e.g. "/" for the entire app
+            strategies (List[Union[str, BaseStrategy]]): The (names of the) strategies to use
+
+        Returns:
+            AsyncCustoms: Returns this instance of customs for chaining
+        """
+
+        strategy_objects: List[BaseStrategy] = []
+        for strategy in strategies:
+            if isinstance(strategy, BaseStrategy):
+                strategy_objects.append(strategy)
+            elif strategy in self.available_strategies:
+                strategy_objects.append(self.available_strategies[strategy])
+            else:
+                warnings.warn(
+                    f"Strategy '{strategy}' is not registered with Customs and will be ignored"
+                )
+
+        plan = _AuthPlan(
+            strategies=strategy_objects,
+            accepts_user=True,
+            use_sessions=self.use_sessions,
+        )
+        self.zones.append((zone, plan))
+        self.zones.sort(key=lambda item: len(item[0]), reverse=True)
+        return self
+
+    def _get_plan(self, path: str) -> Optional[_AuthPlan]:
+        # Zones match whole path segments, "/api" doesn't protect "/apiary"
+        for prefix, plan in self.zones:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return plan
+        return None
+
+    async def _check_session(self, request: ASGIRequest) -> Optional[User]:
+        """Check the session of the request (if any) for a user that has been authenticated before."""
+
+        session = request.session
+        if session is not None and "user" in session and "strategy" in session:
+            strategy = self.available_strategies.get(session["strategy"])
+            if strategy is not None:
+                started = time.perf_counter()
+                try:
+                    user = await strategy.deserialize_user_async(session["user"])
+                except UnauthorizedException:
+                    user = None
+
+                self.record_timing(
+                    "deserialize", time.perf_counter() - started, strategy.name
+                )
+                if self.metrics is not None:
+                    count_session_check(self.metrics, user is not None)
+                return user
+
+        if self.metrics is not None:
+            count_session_check(self.metrics, False)
+        return None
+
+    def record_timing(
+        self, phase: str, duration: float, strategy: Optional[str] = None
+    ) -> None:
+        """Record the duration of a phase of authentication in the metrics (as "customs_<phase>_duration_seconds").
+
+        Args:
+            phase (str): The phase of authentication, e.g. "strategy" or "deserialize"
+            duration (float): The duration in seconds
+            strategy (Optional[str], optional): The name of the strategy. Defaults to None.
+        """
+        if self.metrics is not None:
+            labels = {} if strategy is None else {"strategy": strategy}
+            self.metrics.observe(
+                f"customs_{phase}_duration_seconds", duration, **labels
+            )
+
+    async def _check_passport(
+        self, strategies: List[BaseStrategy], request: ASGIRequest
+    ) -> Tuple[AuthResult, Optional[BaseStrategy]]:
+        """Check the identity of the user using the strategies (one after the other, or concurrently
+        for I/O bound strategies when `parallel_strategies` is enabled).
+
+        Returns:
+            Tuple[AuthResult, Optional[BaseStrategy]]: The successful result and the strategy that was used
+                for verifying, or the failure of the first strategy (and no strategy)
+        """
+
+        results: Dict[BaseStrategy, AuthResult] = {}
+
+        # Start the I/O bound strategies concurrently, when there is more than one of them
+        tasks: Dict[asyncio.Future, BaseStrategy] = {}
+        io_bound = [strategy for strategy in strategies if strategy.io_bound]
+        if self.parallel_strategies and len(io_bound) > 1:
+            for strategy in io_bound:
+                task: asyncio.Future = asyncio.ensure_future(
+                    self._timed_attempt(strategy, request)
+                )
+                tasks[task] = strategy
+
+        try:
+
+            # Try the other strategies one after the other
+            for strategy in strategies:
+                if strategy in tasks.values():
+                    continue
+                result = self._record_attempt(
+                    strategy, *await self._timed_attempt(strategy, request)
+                )
+                results[strategy] = result
+                if result.success:
+                    return result, strategy
+
+            # The first concurrent strategy that succeeds wins
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    strategy = tasks[task]
+                    result = self._record_attempt(strategy, *task.result())
+                    results[strategy] = result
+                    if result.success:
+                        return result, strategy
+
+        finally:
+
+            # The remaining attempts are cancelled
+            for task in tasks:
+                task.cancel()
+
+        # No strategy was able to verify the user, report the failure of the first strategy
+        if len(strategies) == 0:
+            return AuthResult.fail(), None
+        return results[strategies[0]], None
+
+    async def _timed_attempt(
+        self, strategy: BaseStrategy, request: ASGIRequest
+    ) -> Tuple[AuthResult, float]:
+        """Attempt to authenticate a request with a strategy, and measure the duration."""
+        started = time.perf_counter()
+        result = await strategy.attempt_async(request)
+        return result, time.perf_counter() - started
+
+    def _record_attempt(
+        self, strategy: BaseStrategy, result: AuthResult, duration: float
+    ) -> AuthResult:
+        """Record the timing and metrics of an attempt."""
+        self.record_timing("strategy", duration, strategy.name)
+        if self.metrics is not None:
+            count_attempt(self.metrics, strategy.name, result.success)
+        return result
+
+    async def attempt(self, request: ASGIRequest, plan: _AuthPlan) -> AuthResult:
+        """Authenticate a request, using the session or the strategies of a plan, without raising
+        on failures.
+
+        Args:
+            request (ASGIRequest): The incoming request
+            plan (_AuthPlan): The plan for the protected zone
+
+        Returns:
+            AuthResult: The result, with the authenticated user when successful
+        """
+
+        # 1. Check session info
+        user: Any = None
+        if plan.use_sessions:
+            user = await self._check_session(request)
+            if user is not None:
+                return AuthResult.ok(user)
+
+        # 2: Check the identity/passport of the user
+        result, strategy = await self._check_passport(plan.candidates(request), request)
+
+        # When using sessions, add the serialized user to the session
+        if strategy is not None and plan.use_sessions and request.session is not None:
+            store_user(request.session, result.user, strategy)
+
+        return result
+
+    async def authenticate(self, request: ASGIRequest, plan: _AuthPlan) -> User:
+        """Authenticate a request, using the session or the strategies of a plan.
+
+        Args:
+            request (ASGIRequest): The incoming request
+            plan (_AuthPlan): The plan for the protected zone
+
+        Raises:
+            UnauthorizedException: Raised when the user can not be authenticated
+
+        Returns:
+            User: The authenticated user
+        """
+
+        result = await self.attempt(request, plan)
+        if not result.success:
+            raise result.to_exception()
+        return result.user
+
+    async def _send_unauthorized(
+        self,
+        request: ASGIRequest,
+        failure: Union[AuthResult, UnauthorizedException],
+        send: Send,
+    ) -> None:
+
+        # Redirect the user, with a reference to the original page
+        if self.unauthorized_redirect_url is not None:
+            url_parts = list(urlparse(self.unauthorized_redirect_url))
+            query = dict(parse_qsl(url_parts[4]))
+            query.update({"next": request.url})
+            url_parts[4] = urlencode(query)
+            status = 302
+            headers = [(b"location", urlunparse(url_parts).encode("latin-1"))]
+            body = b""
+        else:
+            status = failure.status_code
+            headers = [(b"content-type", b"text/plain; charset=utf-8")]
+            body = failure.message.encode("utf-8")
+
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def _send_response(self, status: int, message: str, send: Send) -> None:
+        body = message.encode("utf-8")
+        headers = [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ]
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+
+        # Only HTTP requests and websocket connections in a protected zone are checked
+        plan = (
+            self._get_plan(scope.get("path", ""))
+            if scope["type"] in ("http", "websocket")
+            else None
+        )
+        if plan is None or len(plan.strategies) == 0:
+            return await self.app(scope, receive, send)
+
+        # Read the body only when a strategy needs it, and replay it for the app
+        body: Optional[bytes] = b""
+        if scope["type"] == "http" and any(
+            "content" in (strategy.declared_sources() or ())
+            for strategy in plan.strategies
+        ):
+            body, receive = await _read_body(receive, self.max_body_size)
+            if body is None:
+                return await self._send_response(413, "Request body too large", send)
+
+        request = ASGIRequest(scope, body=body or b"")
+        result = await self.attempt(request, plan)
+        if not result.success:
+
+            # Close websocket connections (before accepting them)
+            if scope["type"] == "websocket":
+                return await send({"type": "websocket.close", "code": 1008})
+            return await self._send_unauthorized(request, result, send)
+
+        # Pass the user on to the app
+        scope["user"] = result.user
+        await self.app(scope, receive, send)
+
+
+async def _read_body(
+    receive: Receive, max_size: int
+) -> Tuple[Optional[bytes], Receive]:
+    """Read the complete body of a request, and return a replacement for `receive` that replays it.
+    The body is None when it is larger than the maximum size."""
+
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > max_size:
+            return None, receive
+        chunks.append(chunk)
+        more_body = message.get("more_body", False)
+    body = b"".join(chunks)
+
+    replayed = False
+
+    async def replay() -> MutableMapping[str, Any]:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay
@@ -0,0 +1,318 @@
+"""Benchmarks for the per-request overhead of Customs. Every scenario drives a small Flask app through
+the Werkzeug test client, and reports the throughput, latency percentiles and memory allocated per request.
+
+Run the benchmarks with:
+
+    $ python -m customs.bench --requests 2000 --output bench_results.json
+"""
+
+import sys
+import json
+import time
+import base64
+import argparse
+import platform
+import warnings
+import tracemalloc
+
+from flask import Flask
+from urllib.parse import urlsplit
+from typing import Any, Callable, Dict, List, Optional
+
+from customs import Customs
+from customs.exceptions import UnauthorizedException
+from customs.http_client import HTTPClient
+from customs.stub_provider import StubProvider
+from customs.strategies import (
+    BasicStrategy,
+    GoogleStrategy,
+    JWTStrategy,
+    LocalStrategy,
+)
+
+DATABASE = {"admin": {"username": "admin", "password": "admin"}}
+SECRET = "b5a84bba-ee46-4b3e-8a2b-3b7c8e4f0c2d"
+
+
+class BenchBasic(BasicStrategy):
+    def get_or_create_user(self, user: Dict) -> Dict:
+        return user
+
+    def validate_credentials(self, username: str, password: str) -> Dict:
+        if username in DATABASE and DATABASE[username]["password"] == password:
+            return DATABASE[username]
+        raise UnauthorizedException()
+
+
+class BenchLocal(LocalStrategy):
+    def get_or_create_user(self, user: Dict) -> Dict:
+        return user
+
+    def validate_credentials(self, username: str, password: str) -> Dict:
+        if username in DATABASE and DATABASE[username]["password"] == password:
+            return DATABASE[username]
+        raise UnauthorizedException()
+
+
+class BenchJWT(JWTStrategy):
+    def get_or_create_user(self, user: Dict) -> Dict:
+        return user
+
+
+class BenchGoogle(GoogleStrategy):
+    def get_or_create_user(self, user: Dict) -> Dict:
+        return user
+
+
+# Scenario name -> (strategy, protection mode, use sessions, session hit)
+SCENARIOS = {
+    "bare": (None, None, False, False),
+    "basic-protect": ("basic", "protect", False, False),
+    "basic-safe_zone": ("basic", "safe_zone", False, False),
+    "jwt-protect": ("jwt", "protect", False, False),
+    "jwt-safe_zone": ("jwt", "safe_zone", False, False),
+    "local-protect": ("local", "protect", False, False),
+    "local-safe_zone": ("local", "safe_zone", False, False),
+    "session-miss": ("local", "protect", True, False),
+    "session-hit": ("local", "protect", True, True),
+    "oauth2-login": ("google", "login", True, False),
+    "oauth2-validate": ("google", "validate", True, False),
+    "oauth2-validate-cached": ("google", "cached", True, False),
+}
+
+
+def build_scenario(name: str) -> Callable[[], None]:
+    """Build the app for a scenario, and return a function that performs a single request.
+
+    Args:
+        name (str): The name of the scenario
+
+    Returns:
+        Callable[[], None]: Function that performs a single (successful) request
+    """
+
+    strategy_name, mode, use_sessions, session_hit = SCENARIOS[name]
+
+    app = Flask("customs-bench")
+    app.secret_key = SECRET
+
+    if strategy_name is None:
+
+        @app.route("/")
+        def bare():
+            return "Success"
+
+    elif strategy_name == "google":
+        return _build_oauth2_scenario(app, str(mode))
+
+    else:
+        customs = Customs(app, use_sessions=use_sessions)
+        strategy = {"basic": BenchBasic, "jwt": BenchJWT, "local": BenchLocal}[
+            strategy_name
+        ]()
+
+        def view(user):
+            return user["username"]
+
+        if mode == "protect":
+            app.route("/")(customs.protect(strategies=[strategy])(view))
+        else:
+            app.route("/")(view)
+            customs.safe_zone(app, strategies=[strategy])
+
+    # Credentials for the request
+    path = "/"
+    headers: Dict[str, str] = {}
+    if strategy_name == "basic":
+        headers["Authorization"] = "Basic " + base64.b64encode(b"admin:admin").decode()
+    elif strategy_name == "jwt":
+        headers["Authorization"] = "Bearer " + strategy.sign(DATABASE["admin"])
+    elif strategy_name == "local":
+        path = "/?username=admin&password=admin"
+
+    # A session hit only sends the session cookie, after logging in once
+    client = app.test_client(use_cookies=session_hit)
+    if session_hit:
+        assert client.get(path, headers=headers).status_code == 200
+        path, headers = "/", {}
+
+    def perform_request():
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, f"Request failed: {response.status}"
+
+    return perform_request
+
+
+def _build_oauth2_scenario(app: Flask, mode: str) -> Callable[[], None]:
+    """Build an OAuth2 scenario, with all calls to the provider routed to an in-process stub provider.
+    The "login" mode goes through the full login flow on every request, the other modes validate the
+    token of a logged in user on every request (with or without caching the validation).
+    """
+
+    customs = Customs(app)
+    provider = StubProvider()
+    http_client = HTTPClient()
+    http_client.mount("http://stub-provider", provider.adapter())
+    urls: Dict[str, Any] = provider.urls("http://stub-provider")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        strategy = BenchGoogle(
+            client_id="bench",
+            client_secret="secret",
+            enable_insecure=True,
+            http_client=http_client,
+            cache_ttl=300 if mode == "cached" else None,
+            **urls,
+        )
+
+    @app.route("/")
+    @customs.protect(strategies=[strategy])
+    def view(user):
+        return user["email"]
+
+    client = app.test_client(use_cookies=False)
+    browser = provider.app.test_client(use_cookies=False)
+
+    def login() -> str:
+        response = client.get(f"{strategy.endpoint_prefix}/login")
+        cookie = response.headers["Set-Cookie"].split(";")[0]
+        location = urlsplit(response.headers["Location"])
+        response = browser.get(f"{location.path}?{location.query}")
+        response = client.get(response.headers["Location"], headers={"Cookie": cookie})
+        assert response.status_code == 302, f"Login failed: {response.status}"
+        return response.headers["Set-Cookie"].split(";")[0]
+
+    # The session cookie right after login has a token, but no authenticated strategy yet,
+    # so every request validates the token
+    cookie = login()
+
+    def perform_request():
+        headers = {"Cookie": login() if mode == "login" else cookie}
+        response = client.get("/", headers=headers)
+        assert response.status_code == 200, f"Request failed: {response.status}"
+
+    return perform_request
+
+
+def run_scenario(name: str, requests: int = 1000, warmup: int = 100) -> Dict:
+    """Run a single scenario.
+
+    Args:
+        name (str): The name of the scenario
+        requests (int, optional): The number of measured requests. Defaults to 1000.
+        warmup (int, optional): The number of requests before measuring. Defaults to 100.
+
+    Returns:
+        Dict: The results of the scenario
+    """
+
+    try:
+        perform_request = build_scenario(name)
+        for _ in range(warmup):
+            perform_request()
+
+        # Latency of every request
+        latencies: List[float] = []
+        started = time.perf_counter()
+        for _ in range(requests):
+            request_started = time.perf_counter()
+            perform_request()
+            latencies.append(time.perf_counter() - request_started)
+        total = time.perf_counter() - started
+
+        # Memory allocated per request (peak of traced memory), on a sample of the requests
+        samples = max(1, min(requests // 10, 100))
+        allocated = []
+        for _ in range(samples):
+            tracemalloc.start()
+            perform_request()
+            allocated.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    finally:
+        Customs.remove_instance()
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": requests,
+        "requests_per_second": requests / total,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "allocated_bytes_per_request": sum(allocated) / len(allocated),
+    }
+
+
+def run_benchmarks(
+    scenarios: Optional[List[str]] = None, requests: int = 1000, warmup: int = 100
+) -> Dict:
+    """Run (a selection of) the scenarios.
+
+    Args:
+        scenarios (Optional[List[str]], optional): The names of the scenarios to run. Defaults to all scenarios.
+        requests (int, optional): The number of measured requests per scenario. Defaults to 1000.
+        warmup (int, optional): The number of requests before measuring. Defaults to 100.
+
+    Returns:
+        Dict: The results, with information about the environment
+    """
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [
+            run_scenario(name, requests=requests, warmup=warmup)
+            for name in (scenarios or list(SCENARIOS))
+        ],
+    }
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    index = min(len(values) - 1, int(round(percentile / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m customs.bench",
+        description="Measure the per-request overhead of Customs.",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=1000, help="Measured requests per scenario"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=100, help="Warm-up requests per scenario"
+    )
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=list(SCENARIOS),
+        help="Scenario to run (can be repeated), defaults to all scenarios",
+    )
+    parser.add_argument(
+        "--output", default="bench_results.json", help="File to write the results to"
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scenario, requests=args.requests, warmup=args.warmup)
+
+    print(
+        f"{'scenario':<24}{'req/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'alloc (KiB)':>13}"
+    )
+    for result in results["results"]:
+        print(
+            f"{result['scenario']:<24}"
+            f"{result['requests_per_second']:>10.0f}"
+            f"{result['p50_ms']:>10.3f}"
+            f"{result['p99_ms']:>10.3f}"
+            f"{result['allocated_bytes_per_request'] / 1024:>13.1f}"
+        )
+
+    with open(args.output, "w") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+import os
+import math
+import mmap
+import time
+import pickle
+import struct
+import hashlib
+import tempfile
+import threading
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Hashable, Iterator, Optional, Tuple
+
+
+class BaseCache(ABC):
+    """Interface for the caches that are used by Customs and its strategies. Caches keep
+    track of their hits and misses, so their effectiveness can be monitored.
+
+    Caches that are shared between processes have a `secret`, that is the same for every
+    process. Strategies use it for keyed hashes of their cache keys, so every process finds
+    the entries of the others. In-process caches have no secret (None).
+
+    Caches that serialize the values they store set `serializes` to True, so callers don't need
+    to serialize values themselves. In-process caches keep references to the values.
+    """
+
+    secret: Optional[bytes] = None
+    serializes: bool = False
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a value from the cache.
+
+        Args:
+            key (Hashable): The key of the value
+
+        Returns:
+            Optional[Any]: The value, or None if it is not (or no longer) in the cache
+        """
+        ...  # pragma: no cover
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value in the cache.
+
+        Args:
+            key (Hashable): The key of the value
+            value (Any): The value to store (None values can not be cached)
+            ttl (Optional[float], optional): Time to live in seconds, overrides the default of the cache.
+                Defaults to None.
+        """
+        ...  # pragma: no cover
+
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        """Remove a value from the cache (if present).
+
+        Args:
+            key (Hashable): The key of the value
+        """
+        ...  # pragma: no cover
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all values from the cache."""
+        ...  # pragma: no cover
+
+
+class LRUCache(BaseCache):
+    """Thread safe, in-process cache with a maximum size and an optional time to live. When the
+    cache is full the least recently used entry is evicted.
+
+    Args:
+        max_size (int, optional): The maximum number of entries. Defaults to 1024.
+        ttl (Optional[float], optional): The default time to live of entries in seconds. Defaults to None (no expiry).
+
+    Examples:
+        >>> cache = LRUCache(max_size=2, ttl=60)
+        >>> cache.set("key", "value")
+        >>> cache.get("key")
+        'value'
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None) -> None:
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                # Expired, remove the entry
+                del self._entries[key]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.ttl
+        if ttl is not None and ttl <= 0:
+            return
+        expires_at = None if ttl is None else time.monotonic() + ttl
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+            # Evict the least recently used entries
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class MmapCache(BaseCache):
+    """Cache in a memory-mapped file, that is shared by all processes on the same machine (e.g.
+    the pre-forked workers of gunicorn), so a value cached by one worker is a hit for all of them.
+    The file is divided into a fixed number of slots of a fixed size, grouped in sets of `ways`
+    slots. A key can only be stored in the slots of its set, and when the set is full the entry
+    that expires first is evicted. Locks (a file lock for other processes and a thread lock) are
+    striped over the sets, so unrelated keys don't wait for each other.
+
+    Values are pickled, values that don't fit in a slot are not cached. Because unpickling data can
+    execute code, the file must be owned by the current user and must not be accessible to other users
+    (a `PermissionError` is raised otherwise). The file has a random `secret` that is shared by all
+    processes that use it. POSIX only (the locks use `fcntl`).
+
+    Args:
+        path (Optional[str], optional): The path of the file. Defaults to None (an anonymous temporary file,
+            which is shared with processes that are forked after creating the cache).
+        ttl (Optional[float], optional): The default time to live of values in seconds. Defaults to None (no expiry).
+        slots (int, optional): The number of slots. Defaults to 4096.
+        slot_size (int, optional): The size of a slot in bytes, including a header of 29 bytes. Defaults to 1024.
+        ways (int, optional): The number of slots per set. Defaults to 4.
+        stripes (int, optional): The number of locks. Defaults to 64.
+
+    Examples:
+        >>> cache = MmapCache("/run/customs/cache", ttl=60)
+        >>> strategy = BasicAuthentication(cache=cache)
+    """
+
+    serializes = True
+    _MAGIC = b"CUSTOMS1"
+    _HEADER = struct.Struct("<8sII32s")
+    _SLOT = struct.Struct("<Bd16sI")
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        slots: int = 4096,
+        slot_size: int = 1024,
+        ways: int = 4,
+        stripes: int = 64,
+    ) -> None:
+        import fcntl
+
+        super().__init__()
+        if slot_size <= self._SLOT.size:
+            raise ValueError(f"Slots should be larger than {self._SLOT.size} bytes")
+        self.path = path
+        self.ttl = ttl
+        self.ways = min(ways, slots)
+        self.sets = slots // self.ways
+        self.slots = self.sets * self.ways
+        self.slot_size = slot_size
+        self.stripes = min(stripes, self.sets)
+        self._fcntl = fcntl
+        self._thread_locks = [threading.Lock() for _ in range(self.stripes)]
+
+        # Open (or create) the file and map it into memory
+        if path is None:
+            self._file = tempfile.TemporaryFile()
+        else:
+            fd = os.open(
+                path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600
+            )
+            self._file = os.fdopen(fd, "r+b")
+
+            # Never unpickle data from a file that other users can write
+            stat = os.fstat(fd)
+            if stat.st_uid != os.getuid() or stat.st_mode & 0o077 != 0:
+                self._file.close()
+                raise PermissionError(
+                    f"Cache file '{path}' should be owned by the current user, "
+                    "without permissions for other users"
+                )
+        self._size = self._HEADER.size + self.slots * slot_size
+        with self._locked(None):
+            if os.fstat(self._file.fileno()).st_size != self._size:
+                self._file.truncate(self._size)
+            self._map = mmap.mmap(self._file.fileno(), self._size)
+
+            # Start over (with a new secret) when the file was made with another layout
+            magic, slots, size, secret = self._HEADER.unpack_from(self._map)
+            if (magic, slots, size) != (self._MAGIC, self.slots, slot_size):
+                secret = os.urandom(32)
+                self._map[:] = bytes(self._size)
+                self._HEADER.pack_into(
+                    self._map, 0, self._MAGIC, self.slots, slot_size, secret
+                )
+            self.secret = secret
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        digest, index = self._locate(key)
+        now = time.time()
+        with self._locked(index):
+            for offset in self._set_offsets(index):
+                used, expires_at, slot_digest, length = self._SLOT.unpack_from(
+                    self._map, offset
+                )
+                if used and slot_digest == digest:
+                    if expires_at == 0 or expires_at > now:
+                        start = offset + self._SLOT.size
+                        end = start + length
+                        value = pickle.loads(self._map[start:end])
+                        self.hits += 1
+                        return value
+
+                    # Expired, free the slot
+                    self._map[offset] = 0
+                    break
+
+        self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.ttl
+        if ttl is not None and ttl <= 0:
+            return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.slot_size - self._SLOT.size:
+            return
+        now = time.time()
+        expires_at = 0.0 if ttl is None else now + ttl
+
+        digest, index = self._locate(key)
+        with self._locked(index):
+
+            # Use the slot of the key, a free (or expired) slot, or the slot that expires first
+            offsets = self._set_offsets(index)
+            target, target_expires_at = offsets[0], math.inf
+            for offset in offsets:
+                used, slot_expires_at, slot_digest, _ = self._SLOT.unpack_from(
+                    self._map, offset
+                )
+                if used and slot_digest == digest:
+                    target = offset
+                    break
+                if not used or 0 < slot_expires_at <= now:
+                    slot_expires_at = -1.0
+                elif slot_expires_at == 0:
+                    slot_expires_at = math.inf
+                if slot_expires_at < target_expires_at:
+                    target, target_expires_at = offset, slot_expires_at
+
+            start = target + self._SLOT.size
+            end = start + len(data)
+            self._map[start:end] = data
+            self._SLOT.pack_into(self._map, target, 1, expires_at, digest, len(data))
+
+    def delete(self, key: Hashable) -> None:
+        digest, index = self._locate(key)
+        with self._locked(index):
+            for offset in self._set_offsets(index):
+                used, _, slot_digest, _ = self._SLOT.unpack_from(self._map, offset)
+                if used and slot_digest == digest:
+                    self._map[offset] = 0
+
+    def clear(self) -> None:
+        with self._locked(None):
+            for offset in range(self._HEADER.size, self._size, self.slot_size):
+                self._map[offset] = 0
+
+    def close(self) -> None:
+        """Unmap and close the file. The cache can not be used afterwards."""
+        self._map.close()
+        self._file.close()
+
+    def _locate(self, key: Hashable) -> Tuple[bytes, int]:
+        """Get the digest of a key (the same in every process), and the index of its set."""
+        digest = hashlib.blake2b(
+            pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL), digest_size=16
+        ).digest()
+        return digest, int.from_bytes(digest[:8], "little") % self.sets
+
+    def _set_offsets(self, index: int) -> range:
+        start = self._HEADER.size + index * self.ways * self.slot_size
+        return range(start, start + self.ways * self.slot_size, self.slot_size)
+
+    @contextmanager
+    def _locked(self, index: Optional[int]) -> Iterator[None]:
+        """Lock the stripe of a set, or everything (when the index is None), for threads and processes.
+        The file locks are taken on bytes beyond the end of the file, one byte per stripe.
+        """
+        if index is None:
+            stripes = range(self.stripes)
+        else:
+            stripes = range(index % self.stripes, index % self.stripes + 1)
+        fd = self._file.fileno()
+        for stripe in stripes:
+            self._thread_locks[stripe].acquire()
+        try:
+            self._fcntl.lockf(
+                fd, self._fcntl.LOCK_EX, len(stripes), self._size + stripes[0]
+            )
+            try:
+                yield
+            finally:
+                self._fcntl.lockf(
+                    fd, self._fcntl.LOCK_UN, len(stripes), self._size + stripes[0]
+                )
+        finally:
+            for stripe in stripes:
+                self._thread_locks[stripe].release()
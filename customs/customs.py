@@ -1,13 +1,37 @@
 from __future__ import annotations
 
+import time
 import inspect
 import warnings
+import threading
+import contextvars
 
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import timedelta
-from flask import Flask, Blueprint, request, session
+from functools import partial
+from flask import (
+    Flask,
+    Blueprint,
+    Response,
+    g,
+    has_request_context,
+    request,
+    session,
+)
 from werkzeug.utils import redirect
+from customs.cache import BaseCache
 from customs.exceptions import UnauthorizedException
+from customs.helpers import LazyUser, request_provides, store_user
+from customs.results import AuthResult
+from customs.metrics import (
+    InMemoryMetrics,
+    MetricsSink,
+    collect_cache_metrics,
+    count_attempt,
+    count_session_check,
+)
 from customs.strategies.base_strategy import BaseStrategy
+from customs.throttling import Throttle
 
 import urllib.parse as urlparse
 from urllib.parse import urlencode
@@ -16,6 +40,7 @@ from types import MethodType
 from typing import (  # type: ignore
     Callable,
     Dict,
+    FrozenSet,
     Iterable,
     List,
     TYPE_CHECKING,
@@ -35,6 +60,192 @@ if TYPE_CHECKING:
 User = TypeVar("User")
 
 
+class _AuthPlan:
+    """Authentication plan for a single endpoint. Holds everything Customs needs to know
+    about a protected view function, so it only has to be resolved once instead of on
+    every request.
+
+    Args:
+        strategies (List[BaseStrategy]): The (resolved) strategies that protect the endpoint
+        accepts_user (bool): Whether the view function accepts the "user" argument
+        use_sessions (bool): Whether or not to use sessions for this endpoint
+        rank_interval (Optional[int], optional): Number of authentications after which the strategies
+            are ranked again by how often they succeed on this endpoint. Defaults to None (the
+            strategies are always tried in their registration order).
+    """
+
+    __slots__ = (
+        "strategies",
+        "accepts_user",
+        "use_sessions",
+        "rank_interval",
+        "_sources",
+        "_consumes",
+        "_candidates",
+        "_wins",
+        "_recorded",
+        "_rank",
+        "_lock",
+    )
+
+    def __init__(
+        self,
+        strategies: List[BaseStrategy],
+        accepts_user: bool,
+        use_sessions: bool,
+        rank_interval: Optional[int] = None,
+    ) -> None:
+        self.strategies = strategies
+        self.accepts_user = accepts_user
+        self.use_sessions = use_sessions
+        self.rank_interval = rank_interval
+
+        # Number of successful authentications per strategy (since the last ranking), and
+        # the position of each strategy in the current ranking
+        self._wins: Dict[BaseStrategy, float] = {}
+        self._recorded = 0
+        self._rank: Optional[Dict[BaseStrategy, int]] = None
+
+        # The plan is shared by all requests to an endpoint, guard the counts
+        self._lock = threading.Lock()
+
+        # All sources of credentials that are declared by the strategies, and an index
+        # from the sources found in a request to the strategies that consume them
+        self._consumes: Dict[BaseStrategy, Optional[Tuple[str, ...]]] = {
+            strategy: strategy.declared_sources() for strategy in strategies
+        }
+        self._sources: Tuple[str, ...] = tuple(
+            sorted(
+                {
+                    source
+                    for consumes in self._consumes.values()
+                    for source in (consumes or ())
+                }
+            )
+        )
+        self._candidates: Dict[FrozenSet[str], List[BaseStrategy]] = {}
+
+    def candidates(self, request: Any) -> List[BaseStrategy]:
+        """Get the strategies that are able to authenticate the request, based on the
+        sources of credentials the strategies consume. Strategies that don't declare
+        their sources are always included. The order of the strategies is preserved.
+
+        Args:
+            request (Any): The incoming request
+
+        Returns:
+            List[BaseStrategy]: The candidate strategies
+        """
+
+        # Nothing declared, every strategy is a candidate
+        if len(self._sources) == 0:
+            return self.strategies
+
+        shape = frozenset(
+            source for source in self._sources if request_provides(request, source)
+        )
+        candidates = self._candidates.get(shape)
+        if candidates is None:
+            candidates = [
+                strategy
+                for strategy in self.strategies
+                if self._consumes[strategy] is None
+                or any(source in shape for source in self._consumes[strategy] or ())
+            ]
+
+            # No strategy matches, use the first one to report the error
+            if len(candidates) == 0:
+                candidates = self.strategies[:1]
+            self._candidates[shape] = candidates
+        return candidates
+
+    def order(self, candidates: List[BaseStrategy]) -> List[BaseStrategy]:
+        """Order the candidate strategies by the current ranking, so the strategy that is most
+        likely to succeed is tried first. Without a ranking the order is preserved.
+
+        Args:
+            candidates (List[BaseStrategy]): The candidate strategies
+
+        Returns:
+            List[BaseStrategy]: The strategies in the order to try them
+        """
+        rank = self._rank
+        if rank is None or len(candidates) < 2:
+            return candidates
+        return sorted(candidates, key=rank.__getitem__)
+
+    def record(self, strategy: Optional[BaseStrategy]) -> None:
+        """Record the outcome of an authentication with the strategies of this plan, and rank the
+        strategies again after every `rank_interval` authentications.
+
+        Args:
+            strategy (Optional[BaseStrategy]): The strategy that succeeded, None when all failed
+        """
+        if self.rank_interval is None:
+            return
+        with self._lock:
+            if strategy is not None:
+                self._wins[strategy] = self._wins.get(strategy, 0) + 1
+            self._recorded += 1
+            if self._recorded >= self.rank_interval:
+                self._update_rank()
+
+    def _update_rank(self) -> None:
+        """Rank the strategies by their (decayed) number of successes. Ties keep the registration
+        order, and without any successes there is no ranking at all. Called with the lock held.
+        """
+        wins = self._wins
+        if len(wins) == 0:
+            self._rank = None
+        else:
+            ranked = sorted(self.strategies, key=lambda s: -wins.get(s, 0))
+            self._rank = {strategy: index for index, strategy in enumerate(ranked)}
+
+        # Halve the counts, so the ranking follows changes in the traffic
+        self._wins = {strategy: count / 2 for strategy, count in wins.items()}
+        self._recorded = 0
+
+    @staticmethod
+    def view_accepts_user(view_function: Callable, allow_kwargs: bool = True) -> bool:
+        """Check if a view function accepts the "user" argument (or any keyword argument).
+
+        Args:
+            view_function (Callable): The view function to inspect
+            allow_kwargs (bool, optional): Whether a `**kwargs` argument counts. Defaults to True.
+
+        Returns:
+            bool: True when the user can be passed to the view function
+        """
+        parameters = inspect.signature(view_function).parameters
+        if "user" in parameters:
+            return True
+        return allow_kwargs and any(
+            parameter.kind == inspect.Parameter.VAR_KEYWORD
+            for parameter in parameters.values()
+        )
+
+
+class _AuthMemo:
+    """Result of authentication for a single request, kept on the request context (`flask.g`)
+    so nested protections (a safe zone and protected routes) never authenticate twice.
+
+    Attributes:
+        session_checked (bool): Whether the session has been checked
+        user (Any): The authenticated user, None when not authenticated (yet)
+        strategy (Optional[BaseStrategy]): The strategy that authenticated the user, None
+            when the user came from the session
+        failures (Dict[BaseStrategy, AuthResult]): The failed attempts of strategies
+    """
+
+    __slots__ = ("session_checked", "user", "strategy", "failures")
+
+    def __init__(self) -> None:
+        self.session_checked = False
+        self.user: Any = None
+        self.strategy: Optional[BaseStrategy] = None
+        self.failures: Dict[BaseStrategy, AuthResult] = {}
+
+
 class _Singleton(type):
     """Metaclass for defining classes that should match the singleton
     pattern, meaning there can only be a single instance of the class.
@@ -54,8 +265,12 @@ class _Singleton(type):
         return cls._instances[cls]
 
     def remove_instance(cls: Type[T]):
-        if cls in cls._instances:
-            del cls._instances[cls]
+        instance = cls._instances.pop(cls, None)
+
+        # Release the resources of the instance (e.g. worker threads)
+        shutdown = getattr(instance, "shutdown", None)
+        if shutdown is not None:
+            shutdown()
 
     def get_instance(cls: Type[T]) -> Optional[T]:
         """Get an existing instance of class T, if it exists. Returns None if no
@@ -84,6 +299,25 @@ class Customs(metaclass=_Singleton):
         user_class (Type, optional): The class to use for parsing user information. Defaults to dict.
         unauthorized_redirect_url (str, optional): The URL to redirect to when a user tries to access an
             endpoint without proper authorization
+        metrics (Optional[MetricsSink], optional): Sink for metrics on strategy attempts, latencies and sessions.
+            Defaults to None (no metrics).
+        metrics_endpoint (Optional[str], optional): Route that exposes the metrics in the Prometheus text
+            format, e.g. "/metrics". Uses an InMemoryMetrics sink when no sink is given. Defaults to None.
+        server_timing (bool, optional): Add a "Server-Timing" header to every response, with the time spent
+            in each phase of authentication. Defaults to False.
+        session_store (Optional[BaseCache], optional): Store for server-side sessions, e.g. an LRUCache,
+            SQLiteStore or KeyValueStore. The session cookie then only contains the session id.
+            Defaults to None (sessions are stored in the signed session cookie).
+        lazy_user (bool, optional): Pass a `LazyUser` proxy for users from the session, that only deserializes
+            the user when the view uses it. Defaults to False.
+        adaptive_order (Optional[int], optional): Try the strategy that succeeds most often on an endpoint first,
+            with the ranking updated after every `adaptive_order` authentications (e.g. 100). Failures are still
+            reported for the first strategy in registration order. Defaults to None (registration order).
+        throttle (Optional[Throttle], optional): Reject clients with too many failed password attempts (429),
+            before any strategy is attempted. Defaults to None (no throttling).
+        parallel_strategies (Optional[int], optional): Maximum number of worker threads for attempting I/O bound
+            strategies (see `BaseStrategy.io_bound`) concurrently. The first successful strategy wins, failures
+            are still reported for the first strategy. Defaults to None (strategies are attempted one by one).
 
     Examples:
         >>> from flask import Flask
@@ -99,6 +333,14 @@ class Customs(metaclass=_Singleton):
         session_timeout: timedelta = timedelta(days=31),
         user_class: Type = dict,
         unauthorized_redirect_url: Optional[str] = None,
+        metrics: Optional[MetricsSink] = None,
+        metrics_endpoint: Optional[str] = None,
+        server_timing: bool = False,
+        session_store: Optional[BaseCache] = None,
+        lazy_user: bool = False,
+        parallel_strategies: Optional[int] = None,
+        adaptive_order: Optional[int] = None,
+        throttle: Optional[Throttle] = None,
     ) -> None:
 
         # Make sure the user has set a secret
@@ -119,103 +361,368 @@ class Customs(metaclass=_Singleton):
         self.use_sessions = use_sessions
         self.user_class = user_class
         self.unauthorized_redirect_url = unauthorized_redirect_url
+        self.adaptive_order = adaptive_order
+        self.throttle = throttle
 
         # Define placeholders for the strategies in use, and registered available strategies
         self.strategies: Dict[str, BaseStrategy] = {}
         self.available_strategies: Dict[str, BaseStrategy] = {}
 
+        # Authentication plans for the app wide strategies, per endpoint
+        self._plans: Dict[Optional[str], _AuthPlan] = {}
+
         # Make sessions timeout
         self.app.permanent_session_lifetime = session_timeout
 
+        # Keep the session data on the server, only the session id goes into the cookie
+        self.session_store = session_store
+        if session_store is not None:
+            from customs.sessions import ServerSideSessionInterface
+
+            self.app.session_interface = ServerSideSessionInterface(session_store)
+
         # Register the before_request handler which will check every request using the specified strategies
         self.app.before_request(self._before_request)
 
+        # Collect metrics, and optionally expose them
+        if metrics is None and metrics_endpoint is not None:
+            metrics = InMemoryMetrics()
+        self.metrics = metrics
+        if metrics_endpoint is not None:
+            self.app.add_url_rule(
+                metrics_endpoint, "customs_metrics", self._metrics_view
+            )
+
+        # Report the timings of authentication to the client
+        self.server_timing = server_timing
+        if server_timing:
+            self.app.after_request(self._add_server_timing)
+
+        # Lazy users are deserialized inside the view, so failures surface as exceptions there
+        self.lazy_user = lazy_user
+        if lazy_user:
+            self.app.register_error_handler(
+                UnauthorizedException, self._unauthorized
+            )
+
+        # Bounded pool for attempting I/O bound strategies concurrently
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if parallel_strategies is not None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=parallel_strategies, thread_name_prefix="customs-strategy"
+            )
+
+    def shutdown(self) -> None:
+        """Stop the worker threads for parallel strategies. Called by `Customs.remove_instance()`."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
     def _check_passport(
-        self, strategies: Iterable[BaseStrategy]
-    ) -> Tuple[User, BaseStrategy]:
+        self,
+        strategies: Iterable[BaseStrategy],
+        failures: Optional[Dict[BaseStrategy, AuthResult]] = None,
+    ) -> Tuple[AuthResult, Optional[BaseStrategy]]:
         """Check the identity of the user (check their passport) using the strategies.
 
         Args:
             strategies (Iterable[BaseStrategy]): Strategies to use for checking the user
+            failures (Optional[Dict[BaseStrategy, AuthResult]], optional): Strategies that already failed
+                for this request, these are not tried again. New failures are added. Defaults to None.
 
-        Raises:
-            UnauthorizedException: Raised when no strategy is able to verify the user
+        Returns:
+            Tuple[AuthResult, Optional[BaseStrategy]]: The successful result and the strategy that was used
+                for verifying, or the failure of the first strategy (and no strategy)
+        """
+
+        ordered = list(strategies)
+        results: Dict[BaseStrategy, AuthResult] = {}
+
+        # Strategies that failed before are not tried again
+        pending: List[BaseStrategy] = []
+        for strategy in ordered:
+            if failures is not None and strategy in failures:
+                results[strategy] = failures[strategy]
+            else:
+                pending.append(strategy)
+
+        # Throttled clients are rejected before any strategy is attempted
+        if self.throttle is not None:
+            throttled = self.throttle.check(request, pending)
+            if throttled is not None:
+                if self.metrics is not None:
+                    self.metrics.increment("customs_throttled_total")
+                return throttled, None
+
+        # Start the I/O bound strategies concurrently, when there is more than one of them
+        futures: Dict[Future, BaseStrategy] = {}
+        io_bound = [strategy for strategy in pending if strategy.io_bound]
+        if self._executor is not None and len(io_bound) > 1:
+
+            # Parse a form body once, the workers would race to read the stream otherwise
+            request.form
+
+            # The workers share the request context, it is not pushed (and torn down) again
+            for strategy in io_bound:
+                context = contextvars.copy_context()
+                future = self._executor.submit(
+                    context.run, self._timed_attempt, strategy
+                )
+                futures[future] = strategy
+        running = set(futures.values())
+
+        try:
+
+            # Try the other strategies one after the other
+            for strategy in pending:
+                if strategy in running:
+                    continue
+                result = self._record_attempt(
+                    strategy, *self._timed_attempt(strategy), failures
+                )
+                results[strategy] = result
+                if result.success:
+                    return result, strategy
+
+            # The first concurrent strategy that succeeds wins
+            for future in as_completed(futures):
+                strategy = futures[future]
+                result, duration = future.result()
+                result = self._record_attempt(strategy, result, duration, failures)
+                results[strategy] = result
+                if result.success:
+                    return result, strategy
+
+        finally:
+
+            # Attempts that did not start yet are cancelled, running attempts are ignored
+            for future in futures:
+                future.cancel()
+
+        # No strategy was able to verify the user, report the failure of the first strategy
+        if len(ordered) == 0:
+            return AuthResult.fail(), None
+        return results[ordered[0]], None
+
+    def _timed_attempt(self, strategy: BaseStrategy) -> Tuple[AuthResult, float]:
+        """Attempt to authenticate the current request with a strategy, and measure the duration."""
+        started = time.perf_counter()
+        if self.throttle is None:
+            result = strategy.attempt(request)
+        else:
+            result = self.throttle.attempt(strategy, request)
+        return result, time.perf_counter() - started
+
+    def _record_attempt(
+        self,
+        strategy: BaseStrategy,
+        result: AuthResult,
+        duration: float,
+        failures: Optional[Dict[BaseStrategy, AuthResult]],
+    ) -> AuthResult:
+        """Record the timing and metrics of an attempt (on the thread of the request), and store failures."""
+        self.record_timing("strategy", duration, strategy.name)
+        if self.metrics is not None:
+            count_attempt(self.metrics, strategy.name, result.success)
+        if not result.success and failures is not None:
+            failures[strategy] = result
+        return result
+
+    def _authenticate(self, plan: _AuthPlan) -> AuthResult:
+        """Authenticate the current request with a plan: check the session first, then the
+        passport of the user. The result is memoized for the request, so later checks reuse it.
+
+        Args:
+            plan (_AuthPlan): The authentication plan for the requested endpoint
 
         Returns:
-            Tuple[User, BaseStrategy]: The user information and the strategy that was used for verifying
+            AuthResult: The result, with the authenticated user when successful
         """
 
-        # Loop the strategies
-        exceptions: List[Exception] = []
-        for strategy in strategies:
+        memo = getattr(g, "_customs_auth", None)
+        if memo is None:
+            memo = g._customs_auth = _AuthMemo()
+
+        # Reuse the user from an earlier check, if it came from the session or a strategy of this plan
+        if memo.user is not None and (
+            memo.strategy is None or memo.strategy in plan.strategies
+        ):
+            return AuthResult.ok(memo.user)
+
+        # 1. Check session info (once per request)
+        if plan.use_sessions and not memo.session_checked:
+            memo.session_checked = True
+            started = time.perf_counter()
+            session_user = self._check_session(use_sessions=True)
+            self.record_timing("session", time.perf_counter() - started)
+            if session_user is not None:
+                memo.user, memo.strategy = session_user, None
+                return AuthResult.ok(session_user)
+
+        # 2: Check the identity/passport of the user (return identity)
+        candidates = plan.candidates(request)
+        result, strategy = self._check_passport(
+            strategies=plan.order(candidates), failures=memo.failures
+        )
+        plan.record(strategy)
+
+        # Report the failure of the first strategy in registration order
+        if strategy is None:
+            return memo.failures.get(candidates[0], result) if candidates else result
+        memo.user, memo.strategy = result.user, strategy
+
+        # When using sessions, add the serialized user to the session
+        if plan.use_sessions:
+            store_user(session, result.user, strategy)
 
-            # Try to authenticate the user using the strategy
-            try:
-                user = strategy.authenticate(request)
-                return user, strategy
+        return result
+
+    def _get_plan(self) -> _AuthPlan:
+        """Get the authentication plan for the endpoint of the current request, for the app
+        wide strategies. The plan is built on the first request to the endpoint and reused afterwards.
+
+        Returns:
+            _AuthPlan: The plan for the current endpoint
+        """
 
-            # Store any unauthorized exceptions
-            except UnauthorizedException as e:
-                exceptions.append(e)
+        endpoint = request.url_rule.endpoint if request.url_rule is not None else None
+        plan = self._plans.get(endpoint)
+        if plan is None:
 
-        # No strategy was able to verify the user, raise the exception from the first strategy
-        raise exceptions[0]
+            # Get the view_function that the user wants access to (if any)
+            view_function = self.app.view_functions.get(endpoint)  # type: ignore
+            accepts_user = view_function is not None and _AuthPlan.view_accepts_user(
+                view_function
+            )
+            plan = _AuthPlan(
+                strategies=list(self.strategies.values()),
+                accepts_user=accepts_user,
+                use_sessions=self.use_sessions,
+                rank_interval=self.adaptive_order,
+            )
+            self._plans[endpoint] = plan
+        return plan
 
-    def _grant_access(self, user: User):
+    def _grant_access(self, user: User, plan: _AuthPlan):
         """Method to grant access to the user information in the view function. Will add the user
         information as an argument to the view function, if the function accepts the "user" argument.
 
         Args:
             user (User): The user data
+            plan (_AuthPlan): The authentication plan for the requested endpoint
         """
 
-        # Get the view_function that the user wants access to
-        assert (
-            request.url_rule is not None
-        ), "Unable to match view function, no url_rule attribute for the request"
-        view_function = self.app.view_functions.get(request.url_rule.endpoint)
-        assert view_function is not None, "View function not found"
-
         # Add the user as argument to the view function (but only if it accepts it)
-        view_function_has_kwargs = any(
-            [
-                parameter.kind == inspect.Parameter.VAR_KEYWORD
-                for parameter in list(
-                    dict(inspect.signature(view_function).parameters).values()
-                )
-            ]
-        )
-        if (
-            "user" in inspect.signature(view_function).parameters
-            or view_function_has_kwargs
-        ):
+        if plan.accepts_user and request.view_args is not None:
             request.view_args["user"] = user
 
-    def _check_session(self) -> Optional[User]:
+    def _check_session(self, use_sessions: bool = True) -> Optional[User]:
         """Check the session object (when using sessions) to ensure the user has been
         authenticated before.
 
+        Args:
+            use_sessions (bool, optional): Whether the endpoint uses sessions. Defaults to True.
+
         Returns:
             Optional[User]: The identified user
         """
         # Inspect the session, when using sessions
-        if self.use_sessions and "user" in session and "strategy" in session:
+        if use_sessions and "user" in session and "strategy" in session:
 
             # Get the strategy that was used to identify the user before
             strategy = self.available_strategies.get(session["strategy"])
-            if strategy is None:
-                return None
+            if strategy is not None:
+
+                # Defer loading the user until the view uses it
+                if self.lazy_user:
+                    if self.metrics is not None:
+                        count_session_check(self.metrics, True)
+                    return LazyUser(  # type: ignore
+                        partial(self._load_user, strategy, session["user"])
+                    )
+
+                # Deserialize the user data from the session into a full user object
+                try:
+                    user: Optional[User] = self._deserialize_user(
+                        strategy, session["user"]
+                    )
+                except UnauthorizedException:
+                    user = None
 
-            # Deserialize the user data from the session into a full user object
-            try:
-                user: User = strategy.deserialize_user(session["user"])
+                if self.metrics is not None:
+                    count_session_check(self.metrics, user is not None)
                 return user
-            except UnauthorizedException:
-                return None
 
         # Not using sessions or no pre-authorized user found
-        else:
-            return None
+        if use_sessions and self.metrics is not None:
+            count_session_check(self.metrics, False)
+        return None
+
+    def _deserialize_user(self, strategy: BaseStrategy, data: Dict) -> Any:
+        """Deserialize the user data from the session, and record the duration."""
+        started = time.perf_counter()
+        try:
+            return strategy.deserialize_user(data)
+        finally:
+            self.record_timing(
+                "deserialize", time.perf_counter() - started, strategy.name
+            )
+
+    def _load_user(self, strategy: BaseStrategy, data: Dict) -> Any:
+        """Load a lazy user. When the user can't be deserialized (anymore), the user is removed
+        from the session and the request is denied.
+        """
+        try:
+            return self._deserialize_user(strategy, data)
+        except UnauthorizedException:
+            session.pop("user", None)
+            session.pop("strategy", None)
+            raise
+
+    def _unauthorized(self, failure: Union[AuthResult, UnauthorizedException]):
+        """Build the response for a request that is not authorized. Also used as error handler for
+        unauthorized exceptions that are raised inside view functions.
+        """
+        if self.unauthorized_redirect_url is not None:
+            return self._redirect(self.unauthorized_redirect_url)
+        return failure.message, failure.status_code
+
+    def record_timing(
+        self, phase: str, duration: float, strategy: Optional[str] = None
+    ) -> None:
+        """Record the duration of a phase of authentication, e.g. a strategy attempt or a call to a provider.
+        Durations end up in the metrics (as "customs_<phase>_duration_seconds") and, when enabled, in the
+        "Server-Timing" header of the response.
+
+        Args:
+            phase (str): The phase of authentication, e.g. "strategy" or "deserialize"
+            duration (float): The duration in seconds
+            strategy (Optional[str], optional): The name of the strategy. Defaults to None.
+        """
+
+        if self.metrics is not None:
+            labels = {} if strategy is None else {"strategy": strategy}
+            self.metrics.observe(
+                f"customs_{phase}_duration_seconds", duration, **labels
+            )
+
+        if self.server_timing and has_request_context():
+            name = phase if strategy is None else f"{phase}-{strategy}"
+            g.setdefault("_customs_timings", []).append((name, duration))
+
+    def _add_server_timing(self, response: Response) -> Response:
+        """Add the timings of the request to the "Server-Timing" header of the response."""
+
+        timings = g.get("_customs_timings")
+        if timings:
+            response.headers.add(
+                "Server-Timing",
+                ", ".join(
+                    f"customs-{name};dur={duration * 1000:.3f}"
+                    for name, duration in timings
+                ),
+            )
+        return response
 
     def _before_request(self):
         """Method that runs before every request. Should check the request using
@@ -224,33 +731,23 @@ class Customs(metaclass=_Singleton):
         """
 
         # Make sure there are any strategies to check, otherwise just skip
-        if len(self.strategies.values()) != 0:
-
-            # 1. Check session info
-            user = self._check_session()
-
-            # No info found from the session
-            if user is None:
-
-                # 2: Check the identity/passport of the user (return identity)
-                try:
-                    user, strategy = self._check_passport(
-                        strategies=self.strategies.values()
-                    )
+        if len(self.strategies) != 0:
 
-                    # When using sessions, add the serialized user to the session
-                    if self.use_sessions:
-                        serialized_user = strategy.serialize_user(user)
-                        session["user"] = serialized_user
-                        session["strategy"] = strategy.name
+            plan = self._get_plan()
+            result = self._authenticate(plan)
+            if not result.success:
+                return self._unauthorized(result)
 
-                except UnauthorizedException as e:
-                    if self.unauthorized_redirect_url is not None:
-                        return self._redirect(self.unauthorized_redirect_url)
-                    return e.message, e.status_code
+            # Handle view function
+            self._grant_access(user=result.user, plan=plan)
 
-            # 3: Handle view function
-            self._grant_access(user=user)
+    def _metrics_view(self):
+        """View function that exposes the metrics in the Prometheus text format."""
+        render = getattr(self.metrics, "render_prometheus", None)
+        if render is None:
+            return "Metrics sink does not support the Prometheus format", 404
+        text = render(gauges=collect_cache_metrics(self.available_strategies.values()))
+        return Response(text, mimetype="text/plain; version=0.0.4")
 
     def _redirect(self, target: str):
         url_parts = list(urlparse.urlparse(target))
@@ -326,35 +823,26 @@ class Customs(metaclass=_Singleton):
                     strategy_objects.append(strategy_object)
 
         def func_wrapper(func: Callable) -> Callable:
-            def wrapper(*args, **kwargs):
-
-                # 1. Check session info
-                user = self._check_session()
-
-                # No info found from the session
-                if user is None:
 
-                    # 2: Check the identity/passport of the user (return identity)
-                    try:
-                        user, strategy = self._check_passport(
-                            strategies=strategy_objects
-                        )
+            # Resolve everything about the view function once, at registration time
+            plan = _AuthPlan(
+                strategies=strategy_objects,
+                accepts_user=_AuthPlan.view_accepts_user(func, allow_kwargs=False),
+                use_sessions=self.use_sessions,
+                rank_interval=self.adaptive_order,
+            )
 
-                        # When using sessions, add the serialized user to the session
-                        if self.use_sessions:
-                            serialized_user = strategy.serialize_user(user)
-                            session["user"] = serialized_user
-                            session["strategy"] = strategy.name
+            def wrapper(*args, **kwargs):
 
-                    except UnauthorizedException as e:
-                        if self.unauthorized_redirect_url is not None:
-                            return self._redirect(self.unauthorized_redirect_url)
-                        return e.message, e.status_code
+                # Authenticate the request (reusing the result of earlier checks)
+                result = self._authenticate(plan)
+                if not result.success:
+                    return self._unauthorized(result)
 
-                # 3: Handle view function
+                # Handle view function
                 # Add the user as argument to the handler function
-                if "user" in inspect.signature(func).parameters:
-                    kwargs["user"] = user
+                if plan.accepts_user:
+                    kwargs["user"] = result.user
 
                 return func(*args, **kwargs)
 
@@ -414,6 +902,9 @@ class Customs(metaclass=_Singleton):
         # Protect an entire app
         elif isinstance(zone, Flask):
 
+            # The app wide strategies change, so the plans have to be rebuilt
+            self._plans.clear()
+
             # Loop the listed strategies
             for strategy in strategies:
 
@@ -1,7 +1,7 @@
 import json
 
-from typing import Dict, Union
-from flask import request, session
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from flask import has_request_context, request, session
 from flask.wrappers import Request as FlaskRequest
 from werkzeug.wrappers import Request
 
@@ -25,6 +25,225 @@ def parse_headers(request: Union[Request, FlaskRequest]) -> Dict:
     return {str(key).lower(): value for key, value in dict(request.headers).items()}
 
 
+class RequestCredentials:
+    """Request scoped view on all places where credentials can be found. Every part of the request
+    is parsed at most once, on first access, and shared between all strategies that check the request.
+    The returned dictionaries are shared as well, and should be treated as read-only.
+
+    Args:
+        request (Union[Request, FlaskRequest]): The incoming request
+    """
+
+    __slots__ = ("_request", "_authorization", "_headers", "_args", "_data", "_content")
+
+    def __init__(self, request: Union[Request, FlaskRequest]) -> None:
+        self._request = request
+        self._authorization: Optional[Tuple[str, str]] = None
+        self._headers: Optional[Dict] = None
+        self._args: Optional[Dict] = None
+        self._data: Optional[Dict] = None
+        self._content: Optional[Dict] = None
+
+    @property
+    def authorization(self) -> Tuple[str, str]:
+        """The (lowercase) scheme and the value of the Authorization header, e.g. ("bearer", "<token>").
+        Both are empty strings when the header is missing.
+        """
+        if self._authorization is None:
+            header = self._request.headers.get("Authorization", "")
+            scheme, _, value = header.partition(" ")
+            self._authorization = (scheme.lower(), value)
+        return self._authorization
+
+    @property
+    def headers(self) -> Dict:
+        """The headers of the request, with lowercase names."""
+        if self._headers is None:
+            self._headers = parse_headers(self._request)
+        return self._headers
+
+    @property
+    def cookies(self) -> Dict:
+        """The cookies of the request."""
+        return self._request.cookies
+
+    @property
+    def args(self) -> Dict:
+        """The query arguments of the request."""
+        if self._args is None:
+            self._args = parse_args(self._request)
+        return self._args
+
+    @property
+    def data(self) -> Dict:
+        """The (JSON) body of the request."""
+        if self._data is None:
+            self._data = parse_data(self._request)
+        return self._data
+
+    @property
+    def content(self) -> Dict:
+        """The query arguments and body of the request combined."""
+        if self._content is None:
+            self._content = {**self.args, **self.data}
+        return self._content
+
+
+def get_credentials(request: Union[Request, FlaskRequest]) -> RequestCredentials:
+    """Get the credentials view for a request. The view is created on first use and stored
+    with the request, so all strategies share the same (parsed) information.
+
+    Args:
+        request (Union[Request, FlaskRequest]): The incoming request
+
+    Returns:
+        RequestCredentials: The credentials view for the request
+    """
+
+    credentials = request.environ.get("customs.credentials")
+    if credentials is None:
+        credentials = RequestCredentials(request)
+        request.environ["customs.credentials"] = credentials
+    return credentials
+
+
+def request_provides(request: Union[Request, FlaskRequest], source: str) -> bool:
+    """Check if a request carries a specific source of credentials. Sources are
+    described as strings, e.g. "authorization:bearer", "header:x-api-key", "cookie:token",
+    "session:oauth_token" or "content" (query arguments or a request body).
+
+    Args:
+        request (Union[Request, FlaskRequest]): The incoming request
+        source (str): The source to look for
+
+    Returns:
+        bool: True when the request carries the source
+    """
+
+    kind, _, name = source.partition(":")
+    if kind == "authorization":
+        return get_credentials(request).authorization[0] == name
+    elif kind == "header":
+        return name in request.headers
+    elif kind == "cookie":
+        return name in request.cookies
+    elif kind == "session":
+
+        # Requests that are not handled by Flask can carry their own session
+        store = getattr(request, "session", None)
+        if store is None:
+            store = session if has_request_context() else {}
+        return name in store
+    elif kind == "content":
+        credentials = get_credentials(request)
+        return bool(credentials.args) or bool(credentials.data)
+
+    # Unknown sources can never be excluded
+    return True
+
+
+def store_user(session: Any, user: Any, strategy: Any) -> bool:
+    """Store an authenticated user on the session. Strategies that don't establish sessions
+    (see `BaseStrategy.establishes_session`) leave the session untouched, and the session is
+    only written when the serialized user (or strategy) actually changed.
+
+    Args:
+        session (Any): The session (a mutable mapping)
+        user (Any): The authenticated user
+        strategy (Any): The strategy that authenticated the user
+
+    Returns:
+        bool: True when the session was modified
+    """
+
+    if not strategy.establishes_session:
+        return False
+
+    modified = False
+    serialized_user = strategy.serialize_user(user)
+    if session.get("user") != serialized_user:
+        session["user"] = serialized_user
+        modified = True
+    if session.get("strategy") != strategy.name:
+        session["strategy"] = strategy.name
+        modified = True
+    return modified
+
+
+class LazyUser:
+    """Proxy for a user that is only loaded (e.g. from the database) when it is used for the
+    first time. The loaded user is kept for the rest of the request. The proxy itself is always
+    truthy, so checking whether a user is authenticated doesn't load the user.
+
+    Args:
+        loader (Callable[[], Any]): Function that loads the user
+
+    Examples:
+        >>> user = LazyUser(lambda: {"username": "admin"})
+        >>> user["username"]
+        'admin'
+    """
+
+    __slots__ = ("_loader", "_user", "_loaded")
+
+    def __init__(self, loader: Callable[[], Any]) -> None:
+        self._loader = loader
+        self._user: Any = None
+        self._loaded = False
+
+    def _resolve(self) -> Any:
+        if not self._loaded:
+            self._user = self._loader()
+            self._loaded = True
+        return self._user
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._resolve()[key]
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self._resolve()
+
+    def __iter__(self):
+        return iter(self._resolve())
+
+    def __len__(self) -> int:
+        return len(self._resolve())
+
+    def __eq__(self, other: Any) -> bool:
+        return self._resolve() == resolve_user(other)
+
+    def __hash__(self) -> int:
+        return hash(self._resolve())
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __str__(self) -> str:
+        return str(self._resolve())
+
+    def __repr__(self) -> str:
+        if self._loaded:
+            return f"LazyUser({self._user!r})"
+        return "LazyUser(<not loaded>)"
+
+
+def resolve_user(user: Any) -> Any:
+    """Get the actual user behind a (lazy) user, e.g. to serialize it.
+
+    Args:
+        user (Any): A user, or a LazyUser proxy
+
+    Returns:
+        Any: The (loaded) user
+    """
+    if isinstance(user, LazyUser):
+        return user._resolve()
+    return user
+
+
 def set_redirect_url():
 
     # Get the URL of the page that got us here
@@ -0,0 +1,52 @@
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from typing import Any, Tuple, Union
+
+
+class HTTPClient(requests.Session):
+    """HTTP client for calls to external providers (e.g. OAuth2 providers). Connections are pooled
+    and kept alive between requests, requests get a default timeout and idempotent requests are
+    retried on connection errors and server errors.
+
+    Args:
+        pool_size (int, optional): The maximum number of connections to keep per host. Defaults to 10.
+        timeout (Union[float, Tuple[float, float]], optional): The default (connect, read) timeout in
+            seconds. Defaults to (3.05, 10).
+        retries (int, optional): The maximum number of retries. Defaults to 2.
+        backoff_factor (float, optional): The backoff factor between retries. Defaults to 0.1.
+
+    Examples:
+        >>> client = HTTPClient(pool_size=20, timeout=(1, 5))
+        >>> data = client.get("https://www.googleapis.com/oauth2/v1/tokeninfo").json()
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        timeout: Union[float, Tuple[float, float]] = (3.05, 10),
+        retries: int = 2,
+        backoff_factor: float = 0.1,
+    ) -> None:
+        super().__init__()
+        self.timeout = timeout
+
+        # Share a single connection pool for all requests
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=(502, 503, 504),
+                raise_on_status=False,
+            ),
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:  # type: ignore
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
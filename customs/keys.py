@@ -0,0 +1,302 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import warnings
+
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple, Union
+
+from jose import jwk, jwt  # type: ignore
+from jose.exceptions import JWTError  # type: ignore
+
+
+# Default algorithms for JSON Web Keys that don't specify one
+_DEFAULT_ALGORITHMS = {
+    "oct": "HS256",
+    "RSA": "RS256",
+    "EC": "ES256",
+    "OKP": "EdDSA",
+}
+_CURVE_ALGORITHMS = {
+    "P-256": "ES256",
+    "P-384": "ES384",
+    "P-521": "ES512",
+}
+
+
+class _Entry(NamedTuple):
+    kid: str
+    algorithm: str
+    key: Any
+
+
+class KeyRing:
+    """A set of keys to sign and verify JWT tokens with. Keys are parsed once, when they are
+    added, and indexed by their key id ("kid"), so verifying a token is a single lookup. Keys can
+    be added, removed or replaced (rotated) at runtime. Every change increases the `version`
+    of the key ring.
+
+    Args:
+        keys (Optional[Iterable[Union[str, bytes, Dict]]], optional): Keys to add, as secrets,
+            PEM encoded keys (with the default algorithm) or JSON Web Keys. Defaults to None.
+        jwks (Optional[Union[str, Dict]], optional): A JSON Web Key Set, or the path to a file with
+            a JSON Web Key Set, to load. Defaults to None.
+        algorithm (str, optional): The default algorithm for keys that don't specify one. Defaults to "HS256".
+
+    Examples:
+        >>> keys = KeyRing(["my-secret"])
+        >>> token = keys.sign({"username": "admin"})
+        >>> keys.decode(token)
+        {'username': 'admin'}
+    """
+
+    def __init__(
+        self,
+        keys: Optional[Iterable[Union[str, bytes, Dict]]] = None,
+        jwks: Optional[Union[str, Dict]] = None,
+        algorithm: str = "HS256",
+    ) -> None:
+        self.algorithm = algorithm
+        self.version = 0
+        self.signing_kid: Optional[str] = None
+        self._keys: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+        for key in keys or []:
+            self.add_key(key)
+        if jwks is not None:
+            self.load_jwks(jwks, replace=False)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, kid: str) -> bool:
+        return kid in self._keys
+
+    def _parse_key(
+        self,
+        key: Union[str, bytes, Dict],
+        algorithm: Optional[str] = None,
+        kid: Optional[str] = None,
+    ) -> _Entry:
+        """Parse a key into a (jose) key object."""
+
+        if isinstance(key, dict):
+            kid = kid or key.get("kid")
+            algorithm = algorithm or key.get("alg")
+            if algorithm is None and key.get("kty") == "EC":
+                algorithm = _CURVE_ALGORITHMS.get(key.get("crv", ""))
+            if algorithm is None:
+                algorithm = _DEFAULT_ALGORITHMS.get(key.get("kty", ""))
+            material = json.dumps(key, sort_keys=True).encode("utf-8")
+        else:
+            material = key.encode("utf-8") if isinstance(key, str) else key
+
+        algorithm = algorithm or self.algorithm
+        if jwk.get_key(algorithm) is None:
+            raise ValueError(f"Algorithm '{algorithm}' is not supported")
+
+        # Derive a stable key id from the key material, when none is given
+        if kid is None:
+            kid = hashlib.sha256(material).hexdigest()[:16]
+
+        return _Entry(kid=kid, algorithm=algorithm, key=jwk.construct(key, algorithm))
+
+    def add_key(
+        self,
+        key: Union[str, bytes, Dict],
+        algorithm: Optional[str] = None,
+        kid: Optional[str] = None,
+        signing: bool = False,
+    ) -> str:
+        """Add a key to the key ring. The first key that is able to sign (a secret or a private key)
+        becomes the signing key, unless another key is explicitly marked for signing.
+
+        Args:
+            key (Union[str, bytes, Dict]): A secret, PEM encoded key or JSON Web Key
+            algorithm (Optional[str], optional): The algorithm of the key. Defaults to the algorithm of
+                the JSON Web Key, or the default algorithm of the key ring.
+            kid (Optional[str], optional): The key id. Defaults to the "kid" of the JSON Web Key, or
+                a hash of the key.
+            signing (bool, optional): Use this key for signing new tokens. Defaults to False.
+
+        Raises:
+            ValueError: Raised when the algorithm of the key is not supported
+
+        Returns:
+            str: The key id
+        """
+
+        entry = self._parse_key(key, algorithm=algorithm, kid=kid)
+        with self._lock:
+            keys = dict(self._keys)
+            keys[entry.kid] = entry
+            self._keys = keys
+            if signing or (self.signing_kid is None and self._can_sign(entry)):
+                self.signing_kid = entry.kid
+            self.version += 1
+        return entry.kid
+
+    def remove_key(self, kid: str) -> None:
+        """Remove a key from the key ring (if present).
+
+        Args:
+            kid (str): The id of the key
+        """
+        with self._lock:
+            keys = dict(self._keys)
+            keys.pop(kid, None)
+            self._keys = keys
+            if self.signing_kid == kid:
+                self.signing_kid = None
+            self.version += 1
+
+    def load_jwks(self, jwks: Union[str, Dict], replace: bool = True) -> None:
+        """Load the keys from a JSON Web Key Set. Keys with an unsupported algorithm are skipped.
+        By default the current keys are replaced by the new set, in a single step, which
+        makes this method suitable for rotating keys at runtime.
+
+        Args:
+            jwks (Union[str, Dict]): The key set, as dictionary, JSON string or path to a file
+            replace (bool, optional): Replace the current keys. Defaults to True.
+        """
+
+        if isinstance(jwks, str):
+            if os.path.isfile(jwks):
+                with open(jwks) as fh:
+                    jwks = json.load(fh)
+            else:
+                jwks = json.loads(jwks)
+
+        # Parse all keys before touching the key ring
+        entries = []
+        for key in jwks.get("keys", []):  # type: ignore
+            try:
+                entries.append(self._parse_key(key))
+            except (ValueError, JWTError) as e:
+                warnings.warn(f"Skipping key '{key.get('kid')}': {e}")
+
+        with self._lock:
+            keys = {} if replace else dict(self._keys)
+            signing_kid = None if replace else self.signing_kid
+            for entry in entries:
+                keys[entry.kid] = entry
+                if signing_kid is None and self._can_sign(entry):
+                    signing_kid = entry.kid
+            self._keys = keys
+            self.signing_kid = signing_kid
+            self.version += 1
+
+    def get(self, kid: str) -> Optional[Any]:
+        """Get the (parsed) key with a specific key id.
+
+        Args:
+            kid (str): The id of the key
+
+        Returns:
+            Optional[Any]: The key object, or None if there is no key with this id
+        """
+        entry = self._keys.get(kid)
+        return None if entry is None else entry.key
+
+    def sign(self, claims: Dict) -> str:
+        """Sign a new token with the signing key. The id of the key is added to the header of the token.
+
+        Args:
+            claims (Dict): The claims of the token
+
+        Raises:
+            ValueError: Raised when there is no key to sign with
+
+        Returns:
+            str: The signed token
+        """
+
+        entry = self._keys.get(self.signing_kid or "")
+        if entry is None:
+            raise ValueError("No signing key available")
+        return jwt.encode(
+            claims, entry.key, algorithm=entry.algorithm, headers={"kid": entry.kid}
+        )
+
+    def decode(self, token: str, **kwargs) -> Dict:
+        """Verify and decode a token. The key is selected by the key id in the header of the token.
+        Tokens without a key id are verified with the keys that match the algorithm of the token.
+
+        Args:
+            token (str): The encoded token
+            **kwargs: Additional arguments for `jose.jwt.decode`, e.g. audience or issuer
+
+        Raises:
+            JWTError: Raised when the token is not valid, or no key is available for the token
+
+        Returns:
+            Dict: The claims of the token
+        """
+
+        header = jwt.get_unverified_header(token)
+        kid = header.get("kid")
+        keys = self._keys
+        if kid is not None:
+            entry = keys.get(kid)
+            if entry is None:
+                raise JWTError(f"Unknown key id '{kid}'")
+            return jwt.decode(token, entry.key, algorithms=[entry.algorithm], **kwargs)
+
+        # No key id, try the keys with a matching algorithm
+        algorithm = header.get("alg")
+        for entry in keys.values():
+            if entry.algorithm == algorithm:
+                try:
+                    return jwt.decode(
+                        token, entry.key, algorithms=[algorithm], **kwargs
+                    )
+
+                # Only a non-matching key is a reason to try the next one
+                except JWTError as e:
+                    if not str(e).startswith("Signature verification failed"):
+                        raise
+        raise JWTError("Signature verification failed.")
+
+    @staticmethod
+    def _can_sign(entry: _Entry) -> bool:
+        is_public = getattr(entry.key, "is_public", None)
+        return is_public is None or not is_public()
+
+
+def fetch_jwks(
+    location: str, http_client: Optional[Any] = None, default_max_age: float = 3600
+) -> Tuple[Dict, float]:
+    """Fetch a JSON Web Key Set from a URL or a local file. For URLs, the lifetime of the key set
+    is read from the "Cache-Control" header of the response.
+
+    Args:
+        location (str): The URL, file URL ("file://...") or path of the key set
+        http_client (Optional[Any], optional): The HTTP client to use for URLs. Defaults to a new session.
+        default_max_age (float, optional): The lifetime (in seconds) of key sets without a cache lifetime.
+            Defaults to 3600.
+
+    Returns:
+        Tuple[Dict, float]: The key set and its lifetime in seconds
+    """
+
+    if location.startswith(("http://", "https://")):
+        if http_client is None:
+            import requests
+
+            http_client = requests.Session()
+
+        response = http_client.get(location)
+        response.raise_for_status()
+        match = re.search(
+            r"max-age=(\d+)", response.headers.get("Cache-Control", "")
+        )
+        max_age = float(match.group(1)) if match else default_max_age
+        return response.json(), max_age
+
+    # Local files
+    if location.startswith("file://"):
+        location = location[len("file://"):]
+    with open(location) as fh:
+        return json.load(fh), default_max_age
@@ -0,0 +1,219 @@
+import bisect
+import threading
+
+from abc import ABC, abstractmethod
+from customs.cache import BaseCache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Default histogram buckets (in seconds), from sub-millisecond checks to slow provider calls
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class MetricsSink(ABC):
+    """Interface for collecting metrics from Customs. Implement this interface to send the
+    metrics to an existing monitoring system (e.g. StatsD), or use `InMemoryMetrics`.
+    """
+
+    @abstractmethod
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """Increment a counter.
+
+        Args:
+            name (str): The name of the counter
+            value (float, optional): The value to add. Defaults to 1.
+            **labels (str): The labels of the counter, e.g. the name of the strategy
+        """
+        ...  # pragma: no cover
+
+    @abstractmethod
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Observe a value (e.g. a duration in seconds) for a histogram.
+
+        Args:
+            name (str): The name of the histogram
+            value (float): The observed value
+            **labels (str): The labels of the histogram, e.g. the name of the strategy
+        """
+        ...  # pragma: no cover
+
+
+class InMemoryMetrics(MetricsSink):
+    """Metrics sink that keeps counters and histograms in memory, and can render them in the
+    Prometheus text format.
+
+    Args:
+        buckets (Sequence[float], optional): The upper bounds of the histogram buckets. Defaults to DEFAULT_BUCKETS.
+
+    Examples:
+        >>> metrics = InMemoryMetrics()
+        >>> metrics.increment("customs_strategy_attempts_total", strategy="basic", outcome="success")
+        >>> metrics.observe("customs_strategy_duration_seconds", 0.002, strategy="basic")
+        >>> text = metrics.render_prometheus()
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], List] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self.histograms[key] = histogram
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def get_counter(self, name: str, **labels: str) -> float:
+        """Get the current value of a counter.
+
+        Args:
+            name (str): The name of the counter
+            **labels (str): The labels of the counter
+
+        Returns:
+            float: The value of the counter
+        """
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def get_histogram(
+        self, name: str, **labels: str
+    ) -> Optional[Tuple[List[int], float, int]]:
+        """Get the current state of a histogram.
+
+        Args:
+            name (str): The name of the histogram
+            **labels (str): The labels of the histogram
+
+        Returns:
+            Optional[Tuple[List[int], float, int]]: The counts per bucket (not cumulative, the last bucket is "+Inf"),
+                the sum and the count of the observed values. None if nothing was observed.
+        """
+        histogram = self.histograms.get((name, tuple(sorted(labels.items()))))
+        if histogram is None:
+            return None
+        return list(histogram[0]), histogram[1], histogram[2]
+
+    def render_prometheus(
+        self, gauges: Iterable[Tuple[str, Dict[str, str], float]] = ()
+    ) -> str:
+        """Render all metrics in the Prometheus text format.
+
+        Args:
+            gauges (Iterable[Tuple[str, Dict[str, str], float]], optional): Additional values that are collected
+                at render time, as (name, labels, value). Defaults to ().
+
+        Returns:
+            str: The metrics
+        """
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (list(value[0]), value[1], value[2]))
+                for key, value in self.histograms.items()
+            )
+
+        lines: List[str] = []
+        typed = set()
+
+        def add_type(name: str, kind: str):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            add_type(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            add_type(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                bucket_labels = labels + (("le", _format_value(bound)),)
+                lines.append(
+                    f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for name, gauge_labels, value in gauges:
+            add_type(name, "gauge")
+            labels = tuple(sorted(gauge_labels.items()))
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def count_attempt(metrics: MetricsSink, strategy: str, success: bool) -> None:
+    """Count an attempt of a strategy to authenticate a request."""
+    metrics.increment(
+        "customs_strategy_attempts_total",
+        strategy=strategy,
+        outcome="success" if success else "failure",
+    )
+
+
+def count_session_check(metrics: MetricsSink, hit: bool) -> None:
+    """Count a check of the session for an authenticated user."""
+    metrics.increment("customs_session_checks_total", result="hit" if hit else "miss")
+
+
+def collect_cache_metrics(
+    strategies: Iterable,
+) -> List[Tuple[str, Dict[str, str], float]]:
+    """Collect the hits and misses of the caches of strategies (the `cache` attribute), as gauges."""
+
+    gauges: List[Tuple[str, Dict[str, str], float]] = []
+    for strategy in strategies:
+        cache = getattr(strategy, "cache", None)
+        if isinstance(cache, BaseCache):
+            labels = {"strategy": strategy.name}
+            gauges.append(("customs_cache_hits", labels, cache.hits))
+            gauges.append(("customs_cache_misses", labels, cache.misses))
+    return gauges
+
+
+def _format_labels(labels: Labels) -> str:
+    if len(labels) == 0:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
@@ -0,0 +1,268 @@
+import os
+import hmac
+import base64
+import hashlib
+import warnings
+import threading
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from customs.exceptions import UnauthorizedException
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class PasswordHasher:
+    """Hashing and verification of passwords, for strategies that validate credentials (e.g. the
+    `verify_password` method of the basic and local strategies). Hashing is slow on purpose, so the
+    work runs on a pool of workers with a limited number of concurrent hashes. Requests that can not
+    get a worker within the queue timeout fail fast, instead of starving the rest of the app during
+    a storm of logins.
+
+    Passwords are hashed with scrypt (from hashlib, which releases the GIL while hashing), or with
+    bcrypt when the "bcrypt" package is installed (`pip install customs[bcrypt]`). Hashes of both
+    schemes can be verified, regardless of the scheme that is used for new hashes.
+
+    Args:
+        scheme (str, optional): The scheme for new hashes, "scrypt" or "bcrypt". Defaults to "scrypt".
+        n (int, optional): The scrypt CPU/memory cost (a power of 2). Defaults to 2 ** 14.
+        r (int, optional): The scrypt block size. Defaults to 8.
+        p (int, optional): The scrypt parallelization. Defaults to 1.
+        rounds (int, optional): The bcrypt cost (log2 of the number of rounds). Defaults to 12.
+        max_concurrency (int, optional): The maximum number of concurrent hashes. Defaults to the number of CPUs.
+        queue_timeout (Optional[float], optional): Seconds to wait for a worker, before giving up with a
+            503 (Service Unavailable) `UnauthorizedException`. Defaults to 5.0, None waits forever.
+        use_processes (bool, optional): Hash on a pool of processes instead of threads. Defaults to False.
+
+    Examples:
+        >>> hasher = PasswordHasher()
+        >>> hashed = hasher.hash("secret")
+        >>> hasher.verify("secret", hashed)
+        True
+    """
+
+    def __init__(
+        self,
+        scheme: str = "scrypt",
+        n: int = 2**14,
+        r: int = 8,
+        p: int = 1,
+        rounds: int = 12,
+        max_concurrency: Optional[int] = None,
+        queue_timeout: Optional[float] = 5.0,
+        use_processes: bool = False,
+    ) -> None:
+
+        if scheme not in ("scrypt", "bcrypt"):
+            raise ValueError(f"Unknown password hashing scheme '{scheme}'")
+        if scheme == "bcrypt":
+            _import_bcrypt()
+
+        # Store input arguments
+        self.scheme = scheme
+        self.n = n
+        self.r = r
+        self.p = p
+        self.rounds = rounds
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.queue_timeout = queue_timeout
+        self.use_processes = use_processes
+
+        # Limit the number of hashes in progress, the pool is created on first use
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the current scheme and parameters.
+
+        Args:
+            password (str): The password
+
+        Raises:
+            UnauthorizedException: Raised when no worker is available within the queue timeout
+
+        Returns:
+            str: The hash, including the scheme, parameters and salt
+        """
+        if self.scheme == "bcrypt":
+            return self._run(_bcrypt_hash, password.encode("utf-8"), self.rounds)
+
+        salt = os.urandom(16)
+        digest = self._run(
+            _scrypt, password.encode("utf-8"), salt, self.n, self.r, self.p
+        )
+        return "$".join(
+            [
+                "",
+                "scrypt",
+                f"ln={self.n.bit_length() - 1},r={self.r},p={self.p}",
+                base64.b64encode(salt).decode("ascii"),
+                base64.b64encode(digest).decode("ascii"),
+            ]
+        )
+
+    def verify(self, password: str, hashed: str) -> bool:
+        """Verify a password against a hash, in constant time. Invalid hashes never match, and
+        neither do bcrypt hashes when the "bcrypt" package is not installed (with a warning).
+
+        Args:
+            password (str): The password
+            hashed (str): The stored hash
+
+        Raises:
+            UnauthorizedException: Raised when no worker is available within the queue timeout
+
+        Returns:
+            bool: True when the password matches the hash
+        """
+
+        if hashed.startswith("$2"):
+            try:
+                _import_bcrypt()
+            except ImportError as e:
+                warnings.warn(f"Unable to verify a bcrypt hash: {e}")
+                return False
+            return self._run(
+                _bcrypt_verify, password.encode("utf-8"), hashed.encode("ascii")
+            )
+
+        parsed = _parse_scrypt(hashed)
+        if parsed is None:
+            return False
+        parameters, salt, expected = parsed
+        digest = self._run(
+            _scrypt,
+            password.encode("utf-8"),
+            salt,
+            parameters["n"],
+            parameters["r"],
+            parameters["p"],
+        )
+        return hmac.compare_digest(digest, expected)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """Check if a hash was made with another scheme or other parameters than the current ones.
+
+        Args:
+            hashed (str): The stored hash
+
+        Returns:
+            bool: True when the password should be hashed again
+        """
+        if hashed.startswith("$2"):
+            return self.scheme != "bcrypt" or hashed[4:6] != f"{self.rounds:02d}"
+        parsed = _parse_scrypt(hashed)
+        return (
+            self.scheme != "scrypt"
+            or parsed is None
+            or parsed[0] != {"n": self.n, "r": self.r, "p": self.p}
+        )
+
+    def verify_and_update(
+        self, password: str, hashed: str
+    ) -> Tuple[bool, Optional[str]]:
+        """Verify a password, and hash it again when the hash is outdated (see `needs_rehash`).
+
+        Args:
+            password (str): The password
+            hashed (str): The stored hash
+
+        Returns:
+            Tuple[bool, Optional[str]]: Whether the password matches, and the new hash to store (if any)
+        """
+        if not self.verify(password, hashed):
+            return False, None
+        if self.needs_rehash(hashed):
+            return True, self.hash(password)
+        return True, None
+
+    def _run(self, func: Callable, *args: Any) -> Any:
+        """Run a hash function on the pool, waiting at most the queue timeout for a worker."""
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise UnauthorizedException("Too many login attempts, try again later", 503)
+        try:
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.use_processes:
+                        from concurrent.futures import ProcessPoolExecutor
+
+                        self._executor = ProcessPoolExecutor(self.max_concurrency)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            self.max_concurrency, thread_name_prefix="customs-hash"
+                        )
+        return self._executor
+
+    def shutdown(self) -> None:
+        """Stop the workers of the pool. The pool is started again when needed."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+def _parse_scrypt(hashed: str) -> Optional[Tuple[Dict[str, int], bytes, bytes]]:
+    """Parse a scrypt hash into its parameters, salt and digest. Returns None for invalid hashes."""
+    try:
+        _, scheme, parameters, salt, digest = hashed.split("$")
+        values = dict(item.split("=") for item in parameters.split(","))
+        if scheme != "scrypt":
+            return None
+        return (
+            {"n": 2 ** int(values["ln"]), "r": int(values["r"]), "p": int(values["p"])},
+            base64.b64decode(salt),
+            base64.b64decode(digest),
+        )
+    except (ValueError, KeyError):
+        return None
+
+
+def _scrypt(password: bytes, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password, salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 128 * r * p, dklen=32
+    )
+
+
+def _import_bcrypt() -> Any:
+    try:
+        import bcrypt  # type: ignore
+    except ImportError:
+        raise ImportError(
+            "The bcrypt package is required for bcrypt hashes, install customs[bcrypt]"
+        )
+    return bcrypt
+
+
+def _bcrypt_hash(password: bytes, rounds: int) -> str:
+    bcrypt = _import_bcrypt()
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode("ascii")
+
+
+def _bcrypt_verify(password: bytes, hashed: bytes) -> bool:
+    try:
+        return _import_bcrypt().checkpw(password, hashed)
+    except ValueError:
+        return False
+
+
+_default_hasher: Optional[PasswordHasher] = None
+
+
+def default_hasher() -> PasswordHasher:
+    """Get the password hasher that is shared by strategies without a hasher of their own, so all
+    strategies share the same limit on concurrent hashes.
+
+    Returns:
+        PasswordHasher: The shared password hasher
+    """
+    global _default_hasher
+    if _default_hasher is None:
+        _default_hasher = PasswordHasher()
+    return _default_hasher
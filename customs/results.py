@@ -0,0 +1,104 @@
+from customs.exceptions import UnauthorizedException
+
+from typing import Any, Optional
+
+
+class AuthResult:
+    """Outcome of an attempt of a strategy to authenticate a request. Strategies return a result
+    instead of raising an exception, which keeps failed attempts (the common case under attack)
+    cheap. Customs only turns the final failure into an HTTP response.
+
+    Args:
+        success (bool): Whether the user was authenticated
+        user (Any, optional): The authenticated user. Defaults to None.
+        message (str, optional): The reason of a failure. Defaults to "Unauthorized".
+        status_code (int, optional): The response status code of a failure. Defaults to 401.
+
+    Examples:
+        >>> AuthResult.ok({"username": "admin"}).user
+        {'username': 'admin'}
+        >>> AuthResult.fail("No token found").status_code
+        401
+    """
+
+    __slots__ = ("success", "user", "message", "status_code")
+
+    def __init__(
+        self,
+        success: bool,
+        user: Any = None,
+        message: str = "Unauthorized",
+        status_code: int = 401,
+    ) -> None:
+        self.success = success
+        self.user = user
+        self.message = message
+        self.status_code = status_code
+
+    def __repr__(self) -> str:
+        if self.success:
+            return f"AuthResult.ok({self.user!r})"
+        return f"AuthResult.fail({self.message!r}, {self.status_code})"
+
+    @classmethod
+    def ok(cls, user: Any) -> "AuthResult":
+        """Result of a successful attempt.
+
+        Args:
+            user (Any): The authenticated user
+
+        Returns:
+            AuthResult: The result
+        """
+        return cls(True, user=user)
+
+    @classmethod
+    def fail(
+        cls, message: Optional[str] = None, status_code: Optional[int] = None
+    ) -> "AuthResult":
+        """Result of a failed attempt. Failures without a specific reason share a single instance.
+
+        Args:
+            message (Optional[str], optional): The reason of the failure. Defaults to "Unauthorized".
+            status_code (Optional[int], optional): The response status code. Defaults to 401.
+
+        Returns:
+            AuthResult: The result
+        """
+        if message is None and status_code is None:
+            return UNAUTHORIZED
+        return cls(
+            False,
+            message=(
+                UnauthorizedException._default_message if message is None else message
+            ),
+            status_code=(
+                UnauthorizedException._default_status_code
+                if status_code is None
+                else status_code
+            ),
+        )
+
+    @classmethod
+    def from_exception(cls, exception: UnauthorizedException) -> "AuthResult":
+        """Convert the exception of a (legacy) strategy that raises on failures.
+
+        Args:
+            exception (UnauthorizedException): The exception
+
+        Returns:
+            AuthResult: The failed result
+        """
+        return cls(False, message=exception.message, status_code=exception.status_code)
+
+    def to_exception(self) -> UnauthorizedException:
+        """Convert a failed result to an exception, for APIs that raise on failures.
+
+        Returns:
+            UnauthorizedException: The exception
+        """
+        return UnauthorizedException(self.message, self.status_code)
+
+
+# Shared result for failures without a specific reason
+UNAUTHORIZED = AuthResult(False)
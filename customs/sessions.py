@@ -0,0 +1,266 @@
+"""Server-side session storage. With a session store the session data (e.g. the serialized user and
+OAuth tokens) is kept on the server, and the session cookie only carries an opaque session id. This
+keeps response headers small, and avoids signing and serializing the session on every request.
+
+Any cache with the `BaseCache` interface can store sessions: an `LRUCache` keeps them in memory (for
+a single process), a `SQLiteStore` keeps them in a (shared) SQLite database and a `KeyValueStore`
+keeps them in a Redis-like key-value store. The stores can also be used as the cache of a strategy,
+values are serialized with Flask's tagged JSON serializer (e.g. dicts, lists, tuples and bytes).
+
+When a user is stored in a session (after logging in), the session gets a new id, so a session id
+that was given to the client before logging in (e.g. by an attacker) is useless afterwards.
+
+Examples:
+    >>> from customs import Customs
+    >>> from customs.sessions import SQLiteStore
+    >>> customs = Customs(app, session_store=SQLiteStore("sessions.db"))
+"""
+
+import time
+import sqlite3
+import secrets
+import threading
+
+from flask import Flask
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from customs.cache import BaseCache
+
+from typing import Any, Dict, Hashable, Optional
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session that is stored on the server, identified by its session id.
+
+    Args:
+        initial (Optional[Dict], optional): The stored session data. Defaults to None.
+        sid (Optional[str], optional): The id of the session. Defaults to a new random id.
+    """
+
+    def __init__(self, initial: Optional[Dict] = None, sid: Optional[str] = None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.new = sid is None
+        self.sid = sid or secrets.token_urlsafe(32)
+        self.modified = False
+        self.regenerate = False
+
+    def __setitem__(self, key: str, value: Any) -> None:
+
+        # A new (or other) user logs in, the session needs a new id
+        if key == "user":
+            self.regenerate = True
+        super().__setitem__(key, value)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface that keeps the session data in a store on the server. The session
+    cookie only contains the (random) session id. Sessions are only written to the store when they
+    were modified during the request. The session data is serialized here, unless the store
+    serializes values itself (see `BaseCache.serializes`).
+
+    Args:
+        store (BaseCache): The store for the session data
+        key_prefix (str, optional): Prefix for the keys of the sessions in the store. Defaults to "session:".
+    """
+
+    serializer = TaggedJSONSerializer()
+    session_class = ServerSideSession
+
+    def __init__(self, store: BaseCache, key_prefix: str = "session:") -> None:
+        self.store = store
+        self.key_prefix = key_prefix
+
+    def open_session(self, app: Flask, request: Any) -> ServerSideSession:
+        sid = request.cookies.get(app.config["SESSION_COOKIE_NAME"])
+        if sid:
+            data = self.store.get(self.key_prefix + sid)
+            if data is not None:
+                try:
+                    if not self.store.serializes:
+                        data = self.serializer.loads(data)
+                    return self.session_class(data, sid=sid)
+                except ValueError:
+                    pass
+
+        # No (valid) session, start a new one
+        return self.session_class()
+
+    def save_session(self, app: Flask, session: Any, response: Any) -> None:
+        name = app.config["SESSION_COOKIE_NAME"]
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # The session was emptied, remove it from the store and the client
+        if len(session) == 0:
+            if session.modified:
+                self.store.delete(self.key_prefix + session.sid)
+                if not session.new:
+                    response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        # Give the session a new id when a user logs in, against session fixation
+        if session.regenerate and not session.new:
+            self.store.delete(self.key_prefix + session.sid)
+            session.sid = secrets.token_urlsafe(32)
+
+        # Only write the session when it changed
+        if session.modified:
+            data = dict(session)
+            self.store.set(
+                self.key_prefix + session.sid,
+                data if self.store.serializes else self.serializer.dumps(data),
+                ttl=app.permanent_session_lifetime.total_seconds(),
+            )
+
+        if self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+class SQLiteStore(BaseCache):
+    """Store that keeps values in a SQLite database, so they can be shared between processes
+    on the same machine. Expired values are removed periodically. Values are serialized with
+    Flask's tagged JSON serializer.
+
+    Args:
+        path (str, optional): The path of the database file. Defaults to ":memory:".
+        ttl (Optional[float], optional): The default time to live of values in seconds. Defaults to None (no expiry).
+        cleanup_interval (float, optional): Minimum number of seconds between removals of expired values.
+            Defaults to 60.
+    """
+
+    serializes = True
+    serializer = TaggedJSONSerializer()
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        ttl: Optional[float] = None,
+        cleanup_interval: float = 60,
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+        self._cleaned_at = time.time()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS customs_store "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM customs_store WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (str(key), time.time()),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.serializer.loads(row[0])
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.ttl
+        if ttl is not None and ttl <= 0:
+            return
+        now = time.time()
+        expires_at = None if ttl is None else now + ttl
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO customs_store (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                (str(key), self.serializer.dumps(value), expires_at),
+            )
+
+            # Remove the expired values every now and then
+            if now - self._cleaned_at >= self.cleanup_interval:
+                self._cleaned_at = now
+                self._connection.execute(
+                    "DELETE FROM customs_store WHERE expires_at <= ?", (now,)
+                )
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM customs_store WHERE key = ?", (str(key),)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM customs_store")
+
+
+class KeyValueStore(BaseCache):
+    """Store that keeps values in a Redis-like key-value store. The client needs `get(key)`,
+    `set(key, value, ex=seconds)` and `delete(key)` methods, like the client of Redis, and
+    `scan_iter(match=pattern)` to support clearing the store. Values are serialized with Flask's
+    tagged JSON serializer.
+
+    Args:
+        client (Any): The client of the key-value store
+        prefix (str, optional): Prefix for all keys. Defaults to "customs:".
+        ttl (Optional[float], optional): The default time to live of values in seconds. Defaults to None (no expiry).
+
+    Examples:
+        >>> import redis
+        >>> store = KeyValueStore(redis.Redis(), ttl=3600)
+    """
+
+    serializes = True
+    serializer = TaggedJSONSerializer()
+
+    def __init__(
+        self, client: Any, prefix: str = "customs:", ttl: Optional[float] = None
+    ) -> None:
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self.client.get(f"{self.prefix}{key}")
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.serializer.loads(
+            value.decode("utf-8") if isinstance(value, bytes) else value
+        )
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.ttl
+        if ttl is not None and ttl <= 0:
+            return
+
+        # Key-value stores expire keys in whole seconds
+        expires = None if ttl is None else max(int(ttl), 1)
+        self.client.set(f"{self.prefix}{key}", self.serializer.dumps(value), ex=expires)
+
+    def delete(self, key: Hashable) -> None:
+        self.client.delete(f"{self.prefix}{key}")
+
+    def clear(self) -> None:
+        for key in list(self.client.scan_iter(match=f"{self.prefix}*")):
+            self.client.delete(key)
@@ -1,14 +1,47 @@
 """Strategies define how the customs should protect a resource (endpoint, blueprint, or app). Strategies can
 be combined to create the desired protection. Strategies should be subclassed to tell them about application
 specific element, for example how to read a user from the database.
+
+Strategies are imported lazily, on first access, so an application only pays for the dependencies
+(e.g. jose or requests) of the strategies it actually uses.
 """
 
-from customs.strategies.local_strategy import LocalStrategy
-from customs.strategies.basic_strategy import BasicStrategy
-from customs.strategies.jwt_strategy import JWTStrategy
-from customs.strategies.google_strategy import GoogleStrategy
-from customs.strategies.github_strategy import GithubStrategy
-from customs.strategies.facebook_strategy import FacebookStrategy
+import importlib
+
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:  # pragma: no cover
+    from customs.strategies.local_strategy import LocalStrategy
+    from customs.strategies.basic_strategy import BasicStrategy
+    from customs.strategies.jwt_strategy import JWTStrategy
+    from customs.strategies.google_strategy import GoogleStrategy
+    from customs.strategies.github_strategy import GithubStrategy
+    from customs.strategies.facebook_strategy import FacebookStrategy
 
 
+# Strategy name -> module that defines the strategy
+_STRATEGY_MODULES = {
+    "LocalStrategy": "customs.strategies.local_strategy",
+    "BasicStrategy": "customs.strategies.basic_strategy",
+    "JWTStrategy": "customs.strategies.jwt_strategy",
+    "GoogleStrategy": "customs.strategies.google_strategy",
+    "GithubStrategy": "customs.strategies.github_strategy",
+    "FacebookStrategy": "customs.strategies.facebook_strategy",
+}
+
 __all__ = ["LocalStrategy", "BasicStrategy", "JWTStrategy", "GoogleStrategy", "GithubStrategy", "FacebookStrategy"]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _STRATEGY_MODULES:
+        strategy = getattr(importlib.import_module(_STRATEGY_MODULES[name]), name)
+
+        # Store the strategy on the package, so the next access is a plain lookup
+        globals()[name] = strategy
+        return strategy
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -1,23 +1,52 @@
+import asyncio
 import warnings
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Union
+from functools import partial
+from typing import Any, Dict, Optional, Tuple, Union
 
 from flask.app import Flask
 
 from flask import Request as FlaskRequest
 from werkzeug.wrappers import Request
 
+from customs.exceptions import UnauthorizedException
+from customs.results import AuthResult
+
 
 class BaseStrategy(ABC):
+    """Base class for all strategies.
+
+    Strategies can declare the sources of credentials they consume in the `consumes` attribute
+    (e.g. "authorization:basic", "header:x-api-key", "cookie:token", "session:oauth_token" or "content").
+    Customs uses these declarations to skip strategies that can never match a request. Strategies that
+    do not declare anything (the default) are always tried. A subclass that changes how credentials are
+    read (e.g. overrides `extract_credentials`), without declaring `consumes` itself, is always tried too.
+
+    Strategies that authenticate a user once (e.g. a login form) establish a session for the user, so
+    the next requests are authenticated from the session. Stateless strategies (e.g. tokens sent with
+    every request) set `establishes_session` to False, and never touch the session.
+
+    Strategies that mostly wait on I/O (e.g. a call to an identity provider or a remote database) can
+    set `io_bound` to True. When Customs is configured for parallel strategies, I/O bound strategies are
+    attempted concurrently, so these strategies should be thread-safe.
+    """
+
+    consumes: Optional[Tuple[str, ...]] = None
+    establishes_session: bool = True
+    io_bound: bool = False
+
     def __init__(
         self,
     ) -> None:
 
         # Register this strategy as an available strategy for Customs
         from customs.customs import Customs
+        from customs.asgi import AsyncCustoms
 
-        self._customs: Optional[Customs] = Customs.get_instance()
+        self._customs: Optional[Union[Customs, AsyncCustoms]] = (
+            Customs.get_instance() or AsyncCustoms.get_instance()
+        )
         if self._customs is not None:
             self._customs.register_strategy(self.name, self)
         else:
@@ -46,6 +75,57 @@ class BaseStrategy(ABC):
         """ Method should return the user info """
         ...  # pragma: no cover
 
+    def attempt(self, request: Union[Request, FlaskRequest]) -> AuthResult:
+        """Attempt to authenticate the request, without raising on failures. This is the method
+        Customs calls. By default it adapts `authenticate` (which raises an `UnauthorizedException`
+        on failures), strategies can override it with a native, exception-free implementation.
+
+        Args:
+            request (Union[Request, FlaskRequest]): The incoming request
+
+        Returns:
+            AuthResult: The result of the attempt
+        """
+        try:
+            return AuthResult.ok(self.authenticate(request))
+        except UnauthorizedException as e:
+            return AuthResult.from_exception(e)
+
+    def _overrides_authenticate(self, strategy_class: type) -> bool:
+        """Check if a subclass overrides `authenticate` of a strategy class. The native `attempt` of
+        a strategy class should then not be used, but the overridden `authenticate` instead.
+        """
+        return type(self).authenticate is not strategy_class.authenticate  # type: ignore
+
+    def declared_sources(self) -> Optional[Tuple[str, ...]]:
+        """Get the sources of credentials the strategy consumes (see `consumes`). The sources declared
+        by a parent class are not trusted when a subclass overrides how credentials are read.
+
+        Returns:
+            Optional[Tuple[str, ...]]: The sources, None when the strategy could read credentials from anywhere
+        """
+        for cls in type(self).__mro__:
+            if "consumes" in vars(cls):
+                return vars(cls)["consumes"]
+            if any(method in vars(cls) for method in _READS_CREDENTIALS):
+                return None
+        return None
+
+    def password_credentials(
+        self, request: Union[Request, FlaskRequest]
+    ) -> Optional[Tuple[str, str]]:
+        """Get the username and password of a request, for strategies that authenticate with passwords.
+        Used to throttle failed attempts (see `customs.throttling.Throttle`).
+
+        Args:
+            request (Union[Request, FlaskRequest]): The incoming request
+
+        Returns:
+            Optional[Tuple[str, str]]: The username and password, None when the strategy doesn't use them
+                (the default) or the request doesn't contain them
+        """
+        return None
+
     @abstractmethod
     def get_or_create_user(self, user: Dict) -> Dict:
         ...  # pragma: no cover
@@ -58,3 +138,38 @@ class BaseStrategy(ABC):
 
     def register_additional_routes(self, app: Flask) -> None:
         ...
+
+    async def authenticate_async(self, request: Any) -> Any:
+        """Coroutine variant of `authenticate`, used by `AsyncCustoms`. By default the (blocking)
+        `authenticate` method is run in a worker thread. Strategies with non-blocking backends can
+        override this method.
+        """
+        return await _run_in_thread(self.authenticate, request)
+
+    async def attempt_async(self, request: Any) -> AuthResult:
+        """Coroutine variant of `attempt`, used by `AsyncCustoms`. Adapts `authenticate_async` when a
+        strategy overrides it, otherwise `attempt` is run in a worker thread.
+        """
+        if type(self).authenticate_async is BaseStrategy.authenticate_async:
+            return await _run_in_thread(self.attempt, request)
+        try:
+            return AuthResult.ok(await self.authenticate_async(request))
+        except UnauthorizedException as e:
+            return AuthResult.from_exception(e)
+
+    async def get_or_create_user_async(self, user: Dict) -> Dict:
+        """Coroutine variant of `get_or_create_user`. Runs `get_or_create_user` in a worker thread by default."""
+        return await _run_in_thread(self.get_or_create_user, user)
+
+    async def deserialize_user_async(self, data: Dict) -> Any:
+        """Coroutine variant of `deserialize_user`. Runs `deserialize_user` in a worker thread by default."""
+        return await _run_in_thread(self.deserialize_user, data)
+
+
+# Methods that read the credentials from a request
+_READS_CREDENTIALS = ("extract_credentials", "authenticate", "attempt")
+
+
+async def _run_in_thread(func, *args) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(func, *args))
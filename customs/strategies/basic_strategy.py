@@ -1,19 +1,44 @@
+import os
+import hmac
 import base64
+import hashlib
 
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
 from abc import abstractmethod
 from flask import Request as FlaskRequest
 from werkzeug.wrappers import Request
 
-from customs.helpers import parse_headers
+from customs.cache import BaseCache, LRUCache
+from customs.helpers import get_credentials
 from customs.exceptions import UnauthorizedException
+from customs.passwords import PasswordHasher, default_hasher
+from customs.results import AuthResult
 from customs.strategies.base_strategy import BaseStrategy
 
 
 class BasicStrategy(BaseStrategy):
     """Strategy that enables authorization using the "basic" authorization header.
 
+    Successful verifications can optionally be cached, so clients that send their credentials
+    on every request don't have to be validated every time. The cache only stores keyed hashes
+    of the credentials, never the plaintext. Use `invalidate` when a user's credentials change.
+
+    `validate_credentials` can raise an `UnauthorizedException` or return None for invalid credentials.
+    Returning None is cheaper, which matters when most requests fail (e.g. during an attack).
+
+    Args:
+        cache_ttl (Optional[float], optional): Number of seconds to cache a successful verification.
+            Defaults to None (no caching).
+        cache_size (int, optional): The maximum number of cached verifications. Defaults to 1024.
+        cache (Optional[BaseCache], optional): A custom cache to use, instead of an in-process cache.
+            Defaults to None.
+        password_hasher (Optional[PasswordHasher], optional): The hasher for `verify_password`.
+            Defaults to a PasswordHasher with scrypt, shared by all strategies.
+        cache_secret (Optional[bytes], optional): The secret for hashing the credentials in the cache. Strategies
+            (e.g. in other processes) with the same secret share their cached verifications. Defaults to None
+            (the secret of a shared cache, or a random secret).
+
     Examples:
         >>> class BasicAuthentication(BasicStrategy):
         ...     def get_or_create_user(self, user: Dict) -> Dict:
@@ -29,8 +54,27 @@ class BasicStrategy(BaseStrategy):
     """
 
     name: str = "basic"
+    consumes = ("authorization:basic",)
+    establishes_session = False
+
+    def __init__(
+        self,
+        cache_ttl: Optional[float] = None,
+        cache_size: int = 1024,
+        cache: Optional[BaseCache] = None,
+        password_hasher: Optional[PasswordHasher] = None,
+        cache_secret: Optional[bytes] = None,
+    ) -> None:
+
+        # Cache of verified credentials, with a secret to hash the credentials
+        if cache is None and cache_ttl is not None:
+            cache = LRUCache(max_size=cache_size, ttl=cache_ttl)
+        self.cache = cache
+        if cache_secret is None and cache is not None:
+            cache_secret = cache.secret
+        self._cache_secret = cache_secret or os.urandom(32)
+        self.password_hasher = password_hasher or default_hasher()
 
-    def __init__(self) -> None:
         super().__init__()
 
     @abstractmethod
@@ -40,22 +84,52 @@ class BasicStrategy(BaseStrategy):
     def extract_credentials(
         self, request: Union[Request, FlaskRequest]
     ) -> Dict[str, str]:
+        credentials = self._parse_credentials(request)
+        if credentials is None:
+            raise UnauthorizedException()
+        return {"username": credentials[0], "password": credentials[1]}
 
-        # Parse the headers of the request
-        headers = parse_headers(request)
-        authorization_header = headers.get("authorization", "")
-
-        if authorization_header.lower().startswith("basic "):
-            try:
-                decoded = base64.b64decode(authorization_header[len("basic "):])
-                username, password = decoded.decode("utf-8").split(":")
-                return {"username": username, "password": password}
-            except Exception as e:
-                print(e)
-                raise UnauthorizedException()
+    def _parse_credentials(
+        self, request: Union[Request, FlaskRequest]
+    ) -> Optional[Tuple[str, str]]:
+        """Parse the username and password from the authorization header, None when missing or invalid."""
+
+        # Get the (parsed) authorization header of the request
+        scheme, value = get_credentials(request).authorization
+        if scheme != "basic":
+            return None
+
+        try:
+            decoded = base64.b64decode(value).decode("utf-8")
+        except ValueError:
+            return None
+        username, separator, password = decoded.partition(":")
+        if separator == "" or ":" in password:
+            return None
+        return username, password
+
+    def password_credentials(
+        self, request: Union[Request, FlaskRequest]
+    ) -> Optional[Tuple[str, str]]:
+        try:
+            return self._credentials(request)
+        except UnauthorizedException:
+            return None
 
-        else:
-            raise UnauthorizedException()
+    def _credentials(
+        self, request: Union[Request, FlaskRequest]
+    ) -> Optional[Tuple[str, str]]:
+        """The username and password of the request, None when missing or invalid."""
+
+        # Use the credentials of an overridden `extract_credentials` (e.g. from custom headers)
+        if type(self).extract_credentials is not BasicStrategy.extract_credentials:
+            credentials = self.extract_credentials(request)
+            username = credentials.get("username")
+            password = credentials.get("password")
+            if username is None or password is None:
+                return None
+            return username, password
+        return self._parse_credentials(request)
 
     def authenticate(self, request: Union[Request, FlaskRequest]) -> Any:
         """Method that will extract the basic authorization header from the request,
@@ -73,12 +147,103 @@ class BasicStrategy(BaseStrategy):
             Dict: The user information
         """
 
+        result = self._attempt(request)
+        if not result.success:
+            raise result.to_exception()
+        return result.user
+
+    def attempt(self, request: Union[Request, FlaskRequest]) -> AuthResult:
+        if self._overrides_authenticate(BasicStrategy):
+            return super().attempt(request)
+        return self._attempt(request)
+
+    def _attempt(self, request: Union[Request, FlaskRequest]) -> AuthResult:
+        """Exception-free implementation of authentication. The `validate_credentials` method can
+        return None for invalid credentials, instead of raising an exception.
+        """
+
         # Extract the credentials
-        credentials = self.extract_credentials(request)
-        username = credentials.get("username")
-        password = credentials.get("password")
-
-        # Test authentication
-        if username is None or password is None:
-            raise UnauthorizedException()  # pragma: no cover
-        return self.validate_credentials(username, password)
+        try:
+            credentials = self._credentials(request)
+        except UnauthorizedException as e:
+            return AuthResult.from_exception(e)
+        if credentials is None:
+            return AuthResult.fail()
+        username, password = credentials
+
+        if self.cache is None:
+            return self._validate(username, password)
+
+        # Use the cached verification, if the credentials match
+        user_key, credentials_digest = self._cache_keys(username, password)
+        entry = self.cache.get(user_key)
+        if entry is not None and hmac.compare_digest(entry[0], credentials_digest):
+            return AuthResult.ok(entry[1])
+
+        result = self._validate(username, password)
+        if result.success:
+            self.cache.set(user_key, (credentials_digest, result.user))
+        return result
+
+    def _validate(self, username: str, password: str) -> AuthResult:
+        try:
+            user = self.validate_credentials(username, password)
+        except UnauthorizedException as e:
+            return AuthResult.from_exception(e)
+        if user is None:
+            return AuthResult.fail()
+        return AuthResult.ok(user)
+
+    def verify_password(self, username: str, password: str, hashed: str) -> bool:
+        """Helper for `validate_credentials`, that verifies a password against a stored hash with the
+        password hasher of the strategy. When the hash is outdated (e.g. after the hash parameters
+        changed), the password is hashed again and passed to `rehash_password`.
+
+        Args:
+            username (str): The name of the user
+            password (str): The password from the request
+            hashed (str): The stored hash of the password of the user
+
+        Raises:
+            UnauthorizedException: Raised when the password hasher is too busy
+
+        Returns:
+            bool: True when the password matches the hash
+        """
+        valid, new_hash = self.password_hasher.verify_and_update(password, hashed)
+        if new_hash is not None:
+            self.rehash_password(username, new_hash)
+        return valid
+
+    def rehash_password(self, username: str, hashed: str) -> None:
+        """Hook to store a new hash of the password of a user, called by `verify_password` when the
+        stored hash is outdated. Does nothing by default.
+
+        Args:
+            username (str): The name of the user
+            hashed (str): The new hash of the password
+        """
+        ...
+
+    def invalidate(self, username: str) -> None:
+        """Remove the cached verification of a user, e.g. after the password has changed.
+
+        Args:
+            username (str): The name of the user
+        """
+        if self.cache is not None:
+            self.cache.delete(self._cache_keys(username)[0])
+
+    def _cache_keys(self, username: str, password: str = "") -> Tuple[str, str]:
+        """Keyed hashes of the username (the key in the cache) and the credentials (used to verify
+        the password).
+        """
+        user_key = hmac.new(
+            self._cache_secret, username.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+        credentials_digest = hmac.new(
+            self._cache_secret,
+            f"{username}:{password}".encode("utf-8"),
+            hashlib.sha256,
+        ).hexdigest()
+        return f"basic:{user_key}", credentials_digest
@@ -2,9 +2,6 @@ from typing import Dict
 from customs.exceptions import UnauthorizedException
 from customs.strategies.oauth2_strategy import OAuth2Strategy
 
-from requests_oauthlib import OAuth2Session  # type: ignore
-from requests_oauthlib.compliance_fixes import facebook_compliance_fix  # type: ignore
-
 
 class FacebookStrategy(OAuth2Strategy):
     """Authentication using Facebook as an OAuth2 provider."""
@@ -16,7 +13,7 @@ class FacebookStrategy(OAuth2Strategy):
     authorization_base_url = "https://www.facebook.com/dialog/oauth"
     token_url = "https://graph.facebook.com/oauth/access_token"
     refresh_url = "https://graph.facebook.com/oauth/access_token"
-    user_profile_endpoint = "https://graph.facebook.com/me?"
+    user_profile_endpoint = "https://graph.facebook.com/me"
 
     def get_user_info(self) -> Dict:
         """Method to get user info for the logged in user.
@@ -30,31 +27,12 @@ class FacebookStrategy(OAuth2Strategy):
 
         try:
 
-            # Get the token
-            token = self.token
-
-            # Helper method to update the token in the session
-            def token_updater(token):
-                self.token = token
-
-            # Get a session with auto-refresh of the token
-            client = OAuth2Session(
-                self.client_id,
-                token=token,
-                auto_refresh_kwargs={
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                },
-                auto_refresh_url=self.refresh_url,
-                token_updater=token_updater,
-            )
-
-            if self.name == "facebook":
-                facebook_compliance_fix(client)
-
             # Return the user info
+            client = self.get_user_session()
             return client.get(
-                self.user_profile_endpoint + "fields=" + ",".join(self.fields)
+                self.user_profile_endpoint,
+                params={"fields": ",".join(self.fields)},
+                timeout=self.timeout,
             ).json()
 
         except Exception:
@@ -1,5 +1,3 @@
-import requests
-
 from typing import Dict
 from customs.exceptions import UnauthorizedException
 from customs.strategies.oauth2_strategy import OAuth2Strategy
@@ -16,10 +14,16 @@ class GithubStrategy(OAuth2Strategy):
     token_url = "https://github.com/login/oauth/access_token"
     refresh_url = "https://github.com/login/oauth/access_token"
     user_profile_endpoint = "https://api.github.com/user"
+    validation_url = (
+        "https://api.github.com/applications/{client_id}/tokens/{access_token}"
+    )
 
-    def validate_token(self) -> Dict:
+    def validate_access_token(self, access_token: str) -> Dict:
         """Method to validate a Github token with Github.
 
+        Args:
+            access_token (str): The access token
+
         Raises:
             UnauthorizedException: When the user isn't authenticated or token is not valid
 
@@ -28,12 +32,12 @@ class GithubStrategy(OAuth2Strategy):
         """
 
         try:
-            # Get the token
-            access_token = self.token["access_token"]
-            validate_url = f"https://api.github.com/applications/{self.client_id}/tokens/{access_token}"
+            validate_url = self.validation_url.format(  # type: ignore
+                client_id=self.client_id, access_token=access_token
+            )
 
-            # No OAuth2Session is needed, just a plain GET request
-            data = requests.get(validate_url).json()
+            # No OAuth2Session is needed, just a plain GET request (using the pooled client)
+            data = self.http_client.get(validate_url).json()
             return data
 
         except Exception as e:
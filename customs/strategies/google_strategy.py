@@ -1,12 +1,25 @@
-import requests
+import time
+import threading
 
-from typing import Dict
+from typing import Any, Dict, Optional
 from customs.exceptions import UnauthorizedException
+from customs.keys import KeyRing, fetch_jwks
 from customs.strategies.oauth2_strategy import OAuth2Strategy
 
 
 class GoogleStrategy(OAuth2Strategy):
     """Authentication using Google as an OAuth2 provider.
+
+    By default the token of the user is validated with Google on every request. Alternatively,
+    the ID token of the user can be verified locally, using Google's (cached) public certificates.
+
+    Args:
+        *args: Arguments for the OAuth2Strategy
+        verify_id_token (bool, optional): Verify the ID token locally, instead of validating the token
+            with Google. Defaults to False.
+        certs_url (Optional[str], optional): The location of the certificates (JSON Web Key Set), as URL or
+            path to a local file. Defaults to Google's certificates.
+        **kwargs: Keyword arguments for the OAuth2Strategy
     """
 
     name = "google"
@@ -19,10 +32,101 @@ class GoogleStrategy(OAuth2Strategy):
     token_url = "https://www.googleapis.com/oauth2/v4/token"
     refresh_url = "https://www.googleapis.com/oauth2/v4/token"
     user_profile_endpoint = "https://www.googleapis.com/oauth2/v1/userinfo"
+    validation_url = (
+        "https://www.googleapis.com/oauth2/v1/tokeninfo?access_token={access_token}"
+    )
+    certs_url = "https://www.googleapis.com/oauth2/v3/certs"
+    issuers = ["accounts.google.com", "https://accounts.google.com"]
+
+    def __init__(
+        self,
+        *args: Any,
+        verify_id_token: bool = False,
+        certs_url: Optional[str] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+
+        # ID tokens are only issued for the "openid" scope
+        self.verify_id_token = verify_id_token
+        if verify_id_token and "openid" not in self.scopes:
+            self.scopes = ["openid", *self.scopes]  # type: ignore
+
+        # Google's certificates, refreshed when they expire
+        if certs_url is not None:
+            self.certs_url = certs_url
+        self.certs = KeyRing()
+        self._certs_expire_at = 0.0
+        self._certs_lock = threading.Lock()
 
     def validate_token(self) -> Dict:
+        """Method to validate the token of the logged in user. Verifies the ID token locally
+        when `verify_id_token` is enabled, validates the token with Google otherwise.
+
+        Raises:
+            UnauthorizedException: When the user isn't authenticated or token is not valid
+
+        Returns:
+            Dict: The data from the token
+        """
+
+        if not self.verify_id_token:
+            return super().validate_token()
+
+        try:
+            token = self.token
+            return self.validate_id_token(token["id_token"], token.get("access_token"))
+        except Exception:
+            raise UnauthorizedException()
+
+    def validate_id_token(
+        self, id_token: str, access_token: Optional[str] = None
+    ) -> Dict:
+        """Verify a Google ID token locally: the signature, issuer, audience and expiration of the token are checked.
+
+        Args:
+            id_token (str): The ID token
+            access_token (Optional[str], optional): The access token that was issued with the ID token,
+                to check the "at_hash" claim against. Defaults to None.
+
+        Raises:
+            UnauthorizedException: When the token is not valid
+
+        Returns:
+            Dict: The claims of the token
+        """
+
+        try:
+            return self.get_certs().decode(
+                id_token,
+                audience=self.client_id,
+                issuer=self.issuers,
+                access_token=access_token,
+            )
+        except Exception:
+            raise UnauthorizedException()
+
+    def get_certs(self) -> KeyRing:
+        """Get Google's certificates. Certificates are (re)loaded when their cache lifetime has passed.
+
+        Returns:
+            KeyRing: The certificates
+        """
+
+        if time.time() >= self._certs_expire_at:
+            with self._certs_lock:
+                if time.time() >= self._certs_expire_at:
+                    jwks, max_age = fetch_jwks(self.certs_url, self.http_client)
+                    self.certs.load_jwks(jwks)
+                    self._certs_expire_at = time.time() + max_age
+        return self.certs
+
+    def validate_access_token(self, access_token: str) -> Dict:
         """Method to validate a Google token with Google.
 
+        Args:
+            access_token (str): The access token
+
         Raises:
             UnauthorizedException: When the user isn't authenticated or token is not valid
 
@@ -31,13 +135,14 @@ class GoogleStrategy(OAuth2Strategy):
         """
 
         try:
-            # Get the token
-            access_token = self.token["access_token"]
-            validate_url = f"https://www.googleapis.com/oauth2/v1/tokeninfo?access_token={access_token}"
+            validate_url = self.validation_url.format(  # type: ignore
+                client_id=self.client_id, access_token=access_token
+            )
 
-            # No OAuth2Session is needed, just a plain GET request
-            data = requests.get(validate_url).json()
-            return data
+            # No OAuth2Session is needed, just a plain GET request (using the pooled client)
+            response = self.http_client.get(validate_url)
+            response.raise_for_status()
+            return response.json()
 
         except Exception:
             raise UnauthorizedException()
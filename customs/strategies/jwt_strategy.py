@@ -1,5 +1,7 @@
+import time
 import random
 import string
+import hashlib
 
 from customs.strategies.base_strategy import BaseStrategy
 
@@ -7,37 +9,70 @@ from typing import Any, Dict, Optional, Union
 
 from flask import Request as FlaskRequest
 from werkzeug.wrappers import Request
-from customs.helpers import parse_headers
-from customs.exceptions import UnauthorizedException
-from jose import jwt  # type: ignore
+from customs.cache import BaseCache, LRUCache
+from customs.helpers import get_credentials
+from customs.keys import KeyRing
+from customs.results import AuthResult
 
 
 class JWTStrategy(BaseStrategy):
     """Authentication using JWT tokens.
+
+    Decoded tokens can optionally be cached, so the signature of a token that is reused
+    for many requests is only verified once. Cached tokens are evicted no later than their
+    expiration time ("exp" claim).
+
+    Args:
+        key (Optional[str], optional): The key to sign and verify tokens with. Defaults to a random key.
+        keys (Optional[KeyRing], optional): A key ring with (multiple) keys to sign and verify tokens with,
+            instead of a single key. Defaults to None.
+        cache_ttl (Optional[float], optional): Maximum number of seconds to cache a decoded token.
+            Defaults to None (no caching).
+        cache_size (int, optional): The maximum number of cached tokens. Defaults to 1024.
+        cache (Optional[BaseCache], optional): A custom cache to use, instead of an in-process cache.
+            Defaults to None.
     """
 
     name: str = "jwt"
-
-    def __init__(self, key: Optional[str] = None) -> None:
-        if key is None:
+    consumes = ("authorization:bearer",)
+    establishes_session = False
+
+    def __init__(
+        self,
+        key: Optional[str] = None,
+        keys: Optional[KeyRing] = None,
+        cache_ttl: Optional[float] = None,
+        cache_size: int = 1024,
+        cache: Optional[BaseCache] = None,
+    ) -> None:
+        if key is None and keys is None:
             key = "".join(
                 random.SystemRandom().choice(string.ascii_uppercase + string.digits)
                 for _ in range(64)
             )
         self.key = key
 
+        # All keys are kept (parsed) in a key ring
+        if keys is None:
+            keys = KeyRing([key])  # type: ignore
+        self.keys = keys
+
+        # Cache of decoded tokens
+        if cache is None and cache_ttl is not None:
+            cache = LRUCache(max_size=cache_size, ttl=cache_ttl)
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+
         super().__init__()
 
     def extract_credentials(
         self, request: Union[Request, FlaskRequest]
     ) -> Dict[str, str]:
 
-        # Parse the headers of the request
-        headers = parse_headers(request)
-        authorization_header = headers.get("authorization", "")
+        # Get the (parsed) authorization header of the request
+        scheme, token = get_credentials(request).authorization
 
-        if authorization_header.lower().startswith("bearer "):
-            token = authorization_header[len("bearer "):]
+        if scheme == "bearer":
             return {"token": token}
 
         return {}
@@ -58,19 +93,65 @@ class JWTStrategy(BaseStrategy):
             Dict: The user information
         """
 
+        result = self._attempt(request)
+        if not result.success:
+            raise result.to_exception()
+        return result.user
+
+    def attempt(self, request: Union[Request, FlaskRequest]) -> AuthResult:
+        if self._overrides_authenticate(JWTStrategy):
+            return super().attempt(request)
+        return self._attempt(request)
+
+    def _attempt(self, request: Union[Request, FlaskRequest]) -> AuthResult:
+        """Exception-free implementation of authentication (for the common failures)."""
+
         # Get the token
         credentials = self.extract_credentials(request)
         token = credentials.get("token")
         if token is None:
-            raise UnauthorizedException("No token found")
+            return AuthResult.fail("No token found")
 
         # Decode and validate the token
         try:
-            decoded = jwt.decode(token, self.key)
-            return self.deserialize_user(decoded)
+            decoded = self.decode(token)
+            return AuthResult.ok(self.deserialize_user(decoded))
 
         except Exception:
-            raise UnauthorizedException()
+            return AuthResult.fail()
+
+    def decode(self, token: str) -> Dict:
+        """Decode and validate a token. Uses the cache of decoded tokens, when enabled.
+
+        Args:
+            token (str): The encoded token
+
+        Raises:
+            JWTError: Raised when the token is not valid
+
+        Returns:
+            Dict: The claims of the token
+        """
+
+        if self.cache is None:
+            return self.keys.decode(token)
+
+        # Tokens are cached per version of the key ring, rotating keys invalidates the cache
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        cache_key = f"jwt:{self.keys.version}:{digest}"
+        claims = self.cache.get(cache_key)
+        if claims is None:
+            claims = self.keys.decode(token)
+
+            # Never keep the token beyond its expiration time
+            ttl = self.cache_ttl
+            if "exp" in claims:
+                remaining = float(claims["exp"]) - time.time()
+                ttl = remaining if ttl is None else min(ttl, remaining)
+            self.cache.set(cache_key, claims, ttl=ttl)
+
+        # Hand out a copy, so the cached claims can't be modified
+        return dict(claims)
 
     def sign(self, user: Any) -> str:
         """Sign a new token for the user. Serialize the user info before signing.
@@ -81,4 +162,4 @@ class JWTStrategy(BaseStrategy):
         Returns:
             str: The signed token
         """
-        return jwt.encode(self.serialize_user(user), self.key)
+        return self.keys.sign(self.serialize_user(user))
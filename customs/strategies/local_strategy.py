@@ -1,21 +1,30 @@
 from abc import abstractmethod
 from customs.exceptions import UnauthorizedException
+from customs.passwords import PasswordHasher, default_hasher
+from customs.results import AuthResult
 from customs.strategies.base_strategy import BaseStrategy
 
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
 from flask import Request as FlaskRequest
 from werkzeug.wrappers import Request
-from customs.helpers import parse_content
+from customs.helpers import get_credentials
 
 
 class LocalStrategy(BaseStrategy):
     """Authentication using request information (e.g. arguments) with username and password.
+    `validate_credentials` can raise an `UnauthorizedException` or return None for invalid credentials.
+
+    Args:
+        password_hasher (Optional[PasswordHasher], optional): The hasher for `verify_password`.
+            Defaults to a PasswordHasher with scrypt, shared by all strategies.
     """
 
     name: str = "local"
+    consumes = ("content",)
 
-    def __init__(self) -> None:
+    def __init__(self, password_hasher: Optional[PasswordHasher] = None) -> None:
+        self.password_hasher = password_hasher or default_hasher()
         super().__init__()
 
     @abstractmethod
@@ -25,18 +34,78 @@ class LocalStrategy(BaseStrategy):
     def extract_credentials(
         self, request: Union[Request, FlaskRequest]
     ) -> Dict[str, str]:
-        data = parse_content(request)
-        try:
-            return {"username": data["username"], "password": data["password"]}
-        except Exception as e:
-            print(e)
-        return {}
+        data = get_credentials(request).content
+        username = data.get("username")
+        password = data.get("password")
+        if username is None or password is None:
+            return {}
+        return {"username": username, "password": password}
+
+    def password_credentials(
+        self, request: Union[Request, FlaskRequest]
+    ) -> Optional[Tuple[str, str]]:
+        credentials = self.extract_credentials(request)
+        if len(credentials) == 0:
+            return None
+        return credentials["username"], credentials["password"]
+
+    def verify_password(self, username: str, password: str, hashed: str) -> bool:
+        """Helper for `validate_credentials`, that verifies a password against a stored hash with the
+        password hasher of the strategy. When the hash is outdated (e.g. after the hash parameters
+        changed), the password is hashed again and passed to `rehash_password`.
+
+        Args:
+            username (str): The name of the user
+            password (str): The password from the request
+            hashed (str): The stored hash of the password of the user
+
+        Raises:
+            UnauthorizedException: Raised when the password hasher is too busy
+
+        Returns:
+            bool: True when the password matches the hash
+        """
+        valid, new_hash = self.password_hasher.verify_and_update(password, hashed)
+        if new_hash is not None:
+            self.rehash_password(username, new_hash)
+        return valid
+
+    def rehash_password(self, username: str, hashed: str) -> None:
+        """Hook to store a new hash of the password of a user, called by `verify_password` when the
+        stored hash is outdated. Does nothing by default.
+
+        Args:
+            username (str): The name of the user
+            hashed (str): The new hash of the password
+        """
+        ...
 
     def authenticate(self, request: Union[Request, FlaskRequest]) -> Any:
+        result = self._attempt(request)
+        if not result.success:
+            raise result.to_exception()
+        return result.user
+
+    def attempt(self, request: Union[Request, FlaskRequest]) -> AuthResult:
+        if self._overrides_authenticate(LocalStrategy):
+            return super().attempt(request)
+        return self._attempt(request)
+
+    def _attempt(self, request: Union[Request, FlaskRequest]) -> AuthResult:
+        """Exception-free implementation of authentication. The `validate_credentials` method can
+        return None for invalid credentials, instead of raising an exception.
+        """
         credentials = self.extract_credentials(request)
         username = credentials.get("username")
         password = credentials.get("password")
 
         if username is None or password is None:
-            raise UnauthorizedException()
-        return self.validate_credentials(username, password)
+            return AuthResult.fail()
+
+        try:
+            user = self.validate_credentials(username, password)
+        except UnauthorizedException as e:
+            return AuthResult.from_exception(e)
+        if user is None:
+            return AuthResult.fail()
+        return AuthResult.ok(user)
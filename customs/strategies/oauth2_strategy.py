@@ -1,4 +1,8 @@
 import os
+import time
+import hashlib
+import requests
+import threading
 import warnings
 
 from abc import abstractmethod
@@ -15,10 +19,13 @@ from werkzeug.wrappers import Request
 from requests_oauthlib import OAuth2Session  # type: ignore
 from requests_oauthlib.compliance_fixes import facebook_compliance_fix  # type: ignore
 
+from concurrent.futures import ThreadPoolExecutor
+from customs.cache import BaseCache, LRUCache
 from customs.exceptions import UnauthorizedException
+from customs.http_client import HTTPClient
 from customs.strategies.base_strategy import BaseStrategy
 
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 
 class OAuth2Strategy(BaseStrategy):
@@ -30,8 +37,36 @@ class OAuth2Strategy(BaseStrategy):
         scopes (Optional[List[str]], optional): [description]. Defaults to None.
         enable_insecure (bool, optional): [description]. Defaults to False.
         endpoint_prefix (Optional[str], optional): [description]. Defaults to None.
+        http_client (Optional[requests.Session], optional): The (pooled) HTTP client for all calls to the
+            provider. Defaults to a new HTTPClient with the settings below.
+        pool_size (int, optional): The maximum number of connections to the provider. Defaults to 10.
+        timeout (Union[float, Tuple[float, float]], optional): The (connect, read) timeout for calls to the
+            provider in seconds. Defaults to (3.05, 10).
+        retries (int, optional): The maximum number of retries for idempotent calls. Defaults to 2.
+        cache_ttl (Optional[float], optional): Maximum number of seconds to cache the validation of an access
+            token. Validations are never cached beyond the expiration of the token. Defaults to None (no caching).
+        cache_size (int, optional): The maximum number of cached validations. Defaults to 1024.
+        cache (Optional[BaseCache], optional): A custom cache to use, instead of an in-process cache.
+            Defaults to None.
+        stale_while_revalidate (Optional[float], optional): Number of seconds before a cached validation expires,
+            in which it is refreshed in the background while requests are still served from the cache.
+            Defaults to None (no background refresh).
+        authorization_base_url (Optional[str], optional): Override the authorization URL of the provider.
+            Defaults to None.
+        token_url (Optional[str], optional): Override the token URL of the provider. Defaults to None.
+        refresh_url (Optional[str], optional): Override the token refresh URL of the provider. Defaults to None.
+        user_profile_endpoint (Optional[str], optional): Override the user profile URL of the provider.
+            Defaults to None.
+        validation_url (Optional[str], optional): Override the token validation URL of the provider, with
+            "{access_token}" and "{client_id}" placeholders. Defaults to None.
     """
 
+    consumes = ("session:oauth_token",)
+    io_bound = True
+
+    # URL to validate access tokens with, for providers that support it
+    validation_url: Optional[str] = None
+
     def __init__(
         self,
         client_id: str,
@@ -39,15 +74,58 @@ class OAuth2Strategy(BaseStrategy):
         scopes: Optional[List[str]] = None,
         enable_insecure: bool = False,
         endpoint_prefix: Optional[str] = None,
+        http_client: Optional[requests.Session] = None,
+        pool_size: int = 10,
+        timeout: Union[float, Tuple[float, float]] = (3.05, 10),
+        retries: int = 2,
+        cache_ttl: Optional[float] = None,
+        cache_size: int = 1024,
+        cache: Optional[BaseCache] = None,
+        stale_while_revalidate: Optional[float] = None,
+        authorization_base_url: Optional[str] = None,
+        token_url: Optional[str] = None,
+        refresh_url: Optional[str] = None,
+        user_profile_endpoint: Optional[str] = None,
+        validation_url: Optional[str] = None,
     ) -> None:
 
         # Store the input arguments
         self.client_id = client_id
         self.client_secret = client_secret
 
+        # A single HTTP client (with a connection pool) is used for all calls to the provider
+        if http_client is None:
+            http_client = HTTPClient(
+                pool_size=pool_size, timeout=timeout, retries=retries
+            )
+        self.http_client = http_client
+        self.timeout = getattr(http_client, "timeout", timeout)
+
+        # Cache of token validations, optionally refreshed in the background
+        if cache is None and cache_ttl is not None:
+            cache = LRUCache(max_size=cache_size, ttl=cache_ttl)
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self._revalidating: Set[str] = set()
+        self._revalidation_lock = threading.Lock()
+        self._revalidation_executor: Optional[ThreadPoolExecutor] = None
+
         if scopes is not None:
             self.scopes = scopes  # type: ignore
 
+        # Override the URLs of the provider (e.g. to use a stub provider for testing)
+        overrides = {
+            "authorization_base_url": authorization_base_url,
+            "token_url": token_url,
+            "refresh_url": refresh_url,
+            "user_profile_endpoint": user_profile_endpoint,
+            "validation_url": validation_url,
+        }
+        for attribute, url in overrides.items():
+            if url is not None:
+                setattr(self, attribute, url)
+
         if endpoint_prefix is None:
             self.endpoint_prefix = f"/auth/{self.name}"
         else:
@@ -152,36 +230,56 @@ class OAuth2Strategy(BaseStrategy):
 
         try:
 
-            # Get the token
-            token = self.token
-
-            # Helper method to update the token in the session
-            def token_updater(token):
-                self.token = token
-
-            # Get a session with auto-refresh of the token
-            client = OAuth2Session(
-                self.client_id,
-                token=token,
-                auto_refresh_kwargs={
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                },
-                auto_refresh_url=self.refresh_url,
-                token_updater=token_updater,
-            )
-
-            if self.name == "facebook":
-                facebook_compliance_fix(client)
-
             # Return the user info
-            return client.get(self.user_profile_endpoint).json()
+            client = self.get_user_session()
+            return client.get(self.user_profile_endpoint, timeout=self.timeout).json()
 
         except Exception:
             raise UnauthorizedException()
 
+    def get_oauth_session(self, **kwargs) -> OAuth2Session:
+        """Create an OAuth2 session for the provider, that uses the connection pool of the HTTP client.
+
+        Args:
+            **kwargs: Arguments for the OAuth2Session
+
+        Returns:
+            OAuth2Session: The session
+        """
+
+        client = OAuth2Session(self.client_id, **kwargs)
+        for prefix, adapter in self.http_client.adapters.items():
+            client.mount(prefix, adapter)
+
+        if self.name == "facebook":
+            facebook_compliance_fix(client)
+
+        return client
+
+    def get_user_session(self) -> OAuth2Session:
+        """Create an OAuth2 session for the logged in user, with auto-refresh of the token.
+
+        Returns:
+            OAuth2Session: The session
+        """
+
+        # Helper method to update the token in the session
+        def token_updater(token):
+            self.token = token
+
+        return self.get_oauth_session(
+            token=self.token,
+            auto_refresh_kwargs={
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            },
+            auto_refresh_url=self.refresh_url,
+            token_updater=token_updater,
+        )
+
     def validate_token(self) -> Dict:
-        """Method to validate a Github token with Github.
+        """Method to validate the token of the logged in user with the provider. Uses the cache
+        of validations, when enabled.
 
         Raises:
             UnauthorizedException: When the user isn't authenticated or token is not valid
@@ -190,8 +288,107 @@ class OAuth2Strategy(BaseStrategy):
             Dict: The data from the token
         """
 
+        try:
+            token = self.token
+            access_token = token["access_token"]
+        except Exception:
+            raise UnauthorizedException()
+
+        if self.cache is None:
+            return self._validate_access_token(access_token)
+
+        cache_key = f"oauth2:{self.name}:" + hashlib.sha256(
+            access_token.encode("utf-8")
+        ).hexdigest()
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            entry = self._store_validation(
+                cache_key, access_token, token.get("expires_at")
+            )
+
+        # Refresh the validation in the background, when it is about to expire
+        elif entry["refresh_at"] is not None and entry["refresh_at"] <= time.time():
+            self._revalidate(cache_key, access_token, entry["expires_at"])
+
+        return entry["data"]
+
+    def validate_access_token(self, access_token: str) -> Dict:
+        """Method to validate an access token with the provider. Should be implemented by strategies
+        for providers that support validating tokens.
+
+        Args:
+            access_token (str): The access token
+
+        Raises:
+            UnauthorizedException: When the token is not valid
+
+        Returns:
+            Dict: The data from the token
+        """
+
         return {}
 
+    def _validate_access_token(self, access_token: str) -> Dict:
+        """Validate an access token with the provider, and record the latency of the provider."""
+
+        started = time.perf_counter()
+        try:
+            return self.validate_access_token(access_token)
+        finally:
+            if self._customs is not None:
+                self._customs.record_timing(
+                    "provider_validation", time.perf_counter() - started, self.name
+                )
+
+    def _store_validation(
+        self, cache_key: str, access_token: str, expires_at: Optional[float]
+    ) -> Dict:
+        """Validate an access token and store the result in the cache."""
+
+        data = self._validate_access_token(access_token)
+
+        # Never cache beyond the expiration of the token
+        now = time.time()
+        ttl = self.cache_ttl
+        if expires_at is not None:
+            remaining = float(expires_at) - now
+            ttl = remaining if ttl is None else min(ttl, remaining)
+
+        refresh_at = None
+        if self.stale_while_revalidate is not None and ttl is not None:
+            refresh_at = now + max(ttl - self.stale_while_revalidate, 0)
+
+        entry = {"data": data, "refresh_at": refresh_at, "expires_at": expires_at}
+        self.cache.set(cache_key, entry, ttl=ttl)  # type: ignore
+        return entry
+
+    def _revalidate(
+        self, cache_key: str, access_token: str, expires_at: Optional[float]
+    ) -> None:
+        """Refresh a cached validation in a background thread. Only a single refresh per token runs at a time."""
+
+        with self._revalidation_lock:
+            if cache_key in self._revalidating:
+                return
+            self._revalidating.add(cache_key)
+            if self._revalidation_executor is None:
+                self._revalidation_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="customs-revalidate"
+                )
+
+        def revalidate():
+            try:
+                self._store_validation(cache_key, access_token, expires_at)
+
+            # The token is no longer valid, the next request has to validate it again
+            except Exception:
+                self.cache.delete(cache_key)  # type: ignore
+            finally:
+                with self._revalidation_lock:
+                    self._revalidating.discard(cache_key)
+
+        self._revalidation_executor.submit(revalidate)
+
     def authenticate(self, request: Union[Request, FlaskRequest]) -> Any:
         """Method to authenticate a user.
 
@@ -226,15 +423,11 @@ class OAuth2Strategy(BaseStrategy):
 
         @authentication_blueprint.route("/login")
         def login():
-            client = OAuth2Session(
-                self.client_id,
+            client = self.get_oauth_session(
                 scope=self.scopes,
                 redirect_uri=url_for(".callback", _external=True),
             )
 
-            if self.name == "facebook":
-                facebook_compliance_fix(client)
-
             authorization_url, state = client.authorization_url(
                 self.authorization_base_url,
                 access_type="offline",
@@ -247,26 +440,28 @@ class OAuth2Strategy(BaseStrategy):
 
         @authentication_blueprint.route("/callback", methods=["GET"])
         def callback():
-            client = OAuth2Session(
-                self.client_id,
+            client = self.get_oauth_session(
                 state=session["oauth_state"],
                 redirect_uri=url_for(".callback", _external=True),
             )
 
-            if self.name == "facebook":
-                facebook_compliance_fix(client)
-
             self.token = client.fetch_token(
                 self.token_url,
                 client_secret=self.client_secret,
                 authorization_response=request.url,
+                timeout=self.timeout,
             )
 
             # Get additional data for the user
             user_data = self.get_user_info()
 
             # Ensure the user is registered
+            started = time.perf_counter()
             user = self.get_or_create_user(user_data)
+            if self._customs is not None:
+                self._customs.record_timing(
+                    "get_or_create_user", time.perf_counter() - started, self.name
+                )
 
             # Store the (serialized) user info on the sessions
             session["user"] = self.serialize_user(user)
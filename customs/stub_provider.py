@@ -0,0 +1,392 @@
+"""Stub OAuth2 / OpenID Connect provider, to test and load-test the OAuth2 strategies without
+a live provider. The provider implements the authorize, token (including refresh), userinfo,
+tokeninfo and certificate endpoints, with configurable artificial latency and error rate.
+
+Run the provider as a standalone server with:
+
+    $ python -m customs.stub_provider --port 5001 --latency 0.05 --error-rate 0.01
+
+Or route the calls of a strategy to the provider in-process, without any network traffic:
+
+    >>> provider = StubProvider()
+    >>> client = HTTPClient()
+    >>> client.mount("http://stub-provider", provider.adapter())
+    >>> strategy = GoogleStrategy(
+    ...     client_id="id",
+    ...     client_secret="secret",
+    ...     http_client=client,
+    ...     **provider.urls("http://stub-provider"),
+    ... )
+"""
+
+import sys
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+
+from flask import Flask, jsonify, redirect, request
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk  # type: ignore
+from jose.utils import calculate_at_hash  # type: ignore
+from urllib.parse import urlencode, urlsplit
+
+from customs.keys import KeyRing
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class StubProvider:
+    """Stub OAuth2 / OpenID Connect provider. Users are logged in (and consent) immediately when
+    they are sent to the authorize endpoint. Every login creates a new access token, refresh token
+    and signed ID token.
+
+    Args:
+        latency (float, optional): Artificial latency of every request in seconds. Defaults to 0.
+        error_rate (float, optional): Fraction of the requests that fail with a "503 Service Unavailable"
+            error. Defaults to 0.
+        token_lifetime (int, optional): The lifetime of access tokens in seconds. Defaults to 3600.
+        user (Optional[Dict], optional): The profile of the user that logs in. A "login_hint" in the
+            authorization request creates a different user for every hint. Defaults to a stub user.
+        issuer (str, optional): The issuer of the ID tokens. Defaults to "stub-provider".
+        seed (Optional[int], optional): Seed for the random errors, for reproducible runs. Defaults to None.
+
+    Examples:
+        >>> provider = StubProvider(latency=0.05, error_rate=0.01)
+        >>> provider.app.run(port=5001)
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        token_lifetime: int = 3600,
+        user: Optional[Dict] = None,
+        issuer: str = "stub-provider",
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.token_lifetime = token_lifetime
+        self.issuer = issuer
+        self.user = user or {
+            "id": "1",
+            "sub": "1",
+            "login": "stub",
+            "name": "Stub User",
+            "email": "stub@example.com",
+        }
+
+        # Issued codes and tokens
+        self.codes: Dict[str, Tuple[Dict, str, str]] = {}
+        self.access_tokens: Dict[str, Tuple[Dict, str, str, float]] = {}
+        self.refresh_tokens: Dict[str, Tuple[Dict, str, str]] = {}
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+        # Key to sign the ID tokens with, published on the certificates endpoint
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        self.keys = KeyRing(algorithm="RS256")
+        kid = self.keys.add_key(pem, kid="stub-provider")
+        self.jwks = {
+            "keys": [
+                {
+                    **jwk.construct(pem, "RS256").public_key().to_dict(),
+                    "kid": kid,
+                    "alg": "RS256",
+                    "use": "sig",
+                }
+            ]
+        }
+
+        self.app = self._create_app()
+
+    def urls(self, base_url: str) -> Dict[str, str]:
+        """Get the URLs of the provider, as keyword arguments for an OAuth2 strategy. The
+        certificates for ID tokens are available at "<base_url>/certs".
+
+        Args:
+            base_url (str): The URL the provider is available at
+
+        Returns:
+            Dict[str, str]: The URL overrides for the strategy
+        """
+
+        base_url = base_url.rstrip("/")
+        return {
+            "authorization_base_url": f"{base_url}/authorize",
+            "token_url": f"{base_url}/token",
+            "refresh_url": f"{base_url}/token",
+            "user_profile_endpoint": f"{base_url}/userinfo",
+            "validation_url": f"{base_url}/tokeninfo?access_token={{access_token}}",
+        }
+
+    def adapter(self) -> "WSGIAdapter":
+        """Get a transport adapter for the requests library, that handles requests with the
+        provider in-process. Mount the adapter on the HTTP client of a strategy.
+
+        Returns:
+            WSGIAdapter: The adapter
+        """
+        return WSGIAdapter(self.app)
+
+    def _issue_tokens(
+        self, user: Dict, client_id: str, scope: str, nonce: Optional[str] = None
+    ) -> Dict:
+        """Issue a new access token (and ID token) for a user."""
+
+        now = time.time()
+        access_token = uuid.uuid4().hex
+        with self._lock:
+            self.access_tokens[access_token] = (
+                user,
+                client_id,
+                scope,
+                now + self.token_lifetime,
+            )
+
+        claims = {
+            **user,
+            "iss": self.issuer,
+            "aud": client_id,
+            "iat": int(now),
+            "exp": int(now + self.token_lifetime),
+            "at_hash": calculate_at_hash(access_token, hashlib.sha256),
+        }
+        if nonce is not None:
+            claims["nonce"] = nonce
+
+        return {
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "expires_in": self.token_lifetime,
+            "scope": scope,
+            "id_token": self.keys.sign(claims),
+        }
+
+    def _get_access_token(self) -> Optional[Tuple[Dict, str, str, float]]:
+        """Get the (valid) access token from the current request."""
+
+        access_token = request.args.get("access_token")
+        authorization = request.headers.get("Authorization", "")
+        if authorization.lower().startswith("bearer "):
+            access_token = authorization[7:]
+
+        with self._lock:
+            token = self.access_tokens.get(access_token or "")
+        if token is None or token[3] <= time.time():
+            return None
+        return token
+
+    def _create_app(self) -> Flask:
+        """Create the Flask app with the endpoints of the provider."""
+
+        app = Flask("customs-stub-provider")
+
+        @app.before_request
+        def before_request():
+            with self._lock:
+                self.requests[request.endpoint] = (
+                    self.requests.get(request.endpoint, 0) + 1
+                )
+
+            if self.latency > 0:
+                time.sleep(self.latency)
+
+            if self.error_rate > 0 and self._random.random() < self.error_rate:
+                return jsonify({"error": "temporarily_unavailable"}), 503
+
+        @app.route("/authorize")
+        def authorize():
+            args = request.args
+            if (
+                args.get("response_type", "code") != "code"
+                or "redirect_uri" not in args
+            ):
+                return jsonify({"error": "invalid_request"}), 400
+
+            # The user is logged in immediately, a login hint logs in a different user
+            user = dict(self.user)
+            login_hint = args.get("login_hint")
+            if login_hint is not None:
+                user.update(
+                    id=login_hint,
+                    sub=login_hint,
+                    login=login_hint,
+                    email=f"{login_hint}@example.com",
+                )
+
+            code = uuid.uuid4().hex
+            with self._lock:
+                self.codes[code] = (
+                    user,
+                    args.get("client_id", ""),
+                    args.get("scope", ""),
+                )
+
+            query: Dict[str, str] = {"code": code}
+            if "state" in args:
+                query["state"] = args["state"]
+            separator = "&" if "?" in args["redirect_uri"] else "?"
+            return redirect(args["redirect_uri"] + separator + urlencode(query))
+
+        @app.route("/token", methods=["POST"])
+        def token():
+            grant_type = request.form.get("grant_type")
+
+            if grant_type == "authorization_code":
+                with self._lock:
+                    issued = self.codes.pop(request.form.get("code", ""), None)
+                if issued is None:
+                    return jsonify({"error": "invalid_grant"}), 400
+                user, client_id, scope = issued
+
+            elif grant_type == "refresh_token":
+                with self._lock:
+                    issued = self.refresh_tokens.get(
+                        request.form.get("refresh_token", "")
+                    )
+                if issued is None:
+                    return jsonify({"error": "invalid_grant"}), 400
+                user, client_id, scope = issued
+
+            else:
+                return jsonify({"error": "unsupported_grant_type"}), 400
+
+            tokens = self._issue_tokens(
+                user, client_id, scope, nonce=request.form.get("nonce")
+            )
+
+            # The refresh token stays the same, the access token is replaced
+            refresh_token = request.form.get("refresh_token") or uuid.uuid4().hex
+            with self._lock:
+                self.refresh_tokens[refresh_token] = (user, client_id, scope)
+            tokens["refresh_token"] = refresh_token
+
+            return jsonify(tokens)
+
+        @app.route("/userinfo")
+        def userinfo():
+            token = self._get_access_token()
+            if token is None:
+                return jsonify({"error": "invalid_token"}), 401
+            return jsonify(token[0])
+
+        @app.route("/tokeninfo")
+        def tokeninfo():
+            token = self._get_access_token()
+            if token is None:
+                return jsonify({"error": "invalid_token"}), 400
+
+            user, client_id, scope, expires_at = token
+            return jsonify(
+                {
+                    "aud": client_id,
+                    "user_id": user.get("sub"),
+                    "email": user.get("email"),
+                    "scope": scope,
+                    "expires_in": int(expires_at - time.time()),
+                }
+            )
+
+        @app.route("/certs")
+        def certs():
+            response = jsonify(self.jwks)
+            response.headers["Cache-Control"] = "public, max-age=3600"
+            return response
+
+        return app
+
+
+class WSGIAdapter(BaseAdapter):
+    """Transport adapter for the requests library, that sends requests to a WSGI app in-process.
+
+    Args:
+        app (Flask): The app to send the requests to
+    """
+
+    def __init__(self, app: Flask) -> None:
+        super().__init__()
+        self.app = app
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        timeout: Any = None,
+        verify: Any = True,
+        cert: Any = None,
+        proxies: Any = None,
+    ) -> Response:
+        url = urlsplit(str(request.url))
+        headers = {
+            key: value
+            for key, value in request.headers.items()
+            if key.lower() != "content-length"
+        }
+
+        client = self.app.test_client(use_cookies=False)
+        wsgi_response = client.open(
+            url.path or "/",
+            method=request.method,
+            base_url=f"{url.scheme}://{url.netloc}",
+            query_string=url.query,
+            headers=headers,
+            data=request.body,
+        )
+
+        # Convert the response to a response of the requests library
+        response = Response()
+        response.status_code = wsgi_response.status_code
+        response.reason = wsgi_response.status.partition(" ")[2]
+        response.headers = CaseInsensitiveDict(wsgi_response.headers)
+        response._content = wsgi_response.get_data()
+        response.url = str(request.url)
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m customs.stub_provider",
+        description="Run a stub OAuth2 / OpenID Connect provider.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Host to listen on")
+    parser.add_argument("--port", type=int, default=5001, help="Port to listen on")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Latency per request in seconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of failing requests"
+    )
+    parser.add_argument(
+        "--token-lifetime", type=int, default=3600, help="Token lifetime in seconds"
+    )
+    args = parser.parse_args(argv)
+
+    provider = StubProvider(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        token_lifetime=args.token_lifetime,
+    )
+    provider.app.run(host=args.host, port=args.port, threaded=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
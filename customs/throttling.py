@@ -0,0 +1,219 @@
+import os
+import hmac
+import time
+import hashlib
+import threading
+
+from collections import OrderedDict
+from customs.cache import LRUCache
+from customs.results import AuthResult
+from customs.strategies.base_strategy import BaseStrategy
+
+from typing import Any, Callable, Hashable, Iterable, List, Optional
+
+
+class SlidingWindowCounter:
+    """Thread safe counts of events per key, over a sliding window of time. The count is approximated
+    from the counts of the current and the previous (fixed) window, weighted by the overlap with the
+    sliding window. This takes constant time and memory per key. The number of keys is bounded, when
+    the counter is full the least recently used key is evicted.
+
+    Args:
+        window (float): The length of the window in seconds
+        max_keys (int, optional): The maximum number of keys. Defaults to 10000.
+
+    Examples:
+        >>> counter = SlidingWindowCounter(window=60)
+        >>> counter.hit("admin")
+        >>> counter.count("admin")
+        1.0
+    """
+
+    def __init__(self, window: float, max_keys: int = 10000) -> None:
+        self.window = window
+        self.max_keys = max_keys
+
+        # Per key the index of the current window, and the counts of the current and previous window
+        self._entries: "OrderedDict[Hashable, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hit(self, key: Hashable) -> None:
+        """Count an event for a key.
+
+        Args:
+            key (Hashable): The key, e.g. a username or IP address
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [now // self.window, 0, 0]
+                if len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+                self._roll(entry, now)
+            entry[1] += 1
+
+    def count(self, key: Hashable) -> float:
+        """Get the (approximate) number of events for a key in the last window.
+
+        Args:
+            key (Hashable): The key, e.g. a username or IP address
+
+        Returns:
+            float: The number of events
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return 0.0
+            self._roll(entry, now)
+            overlap = 1 - (now % self.window) / self.window
+            return entry[1] + entry[2] * overlap
+
+    def reset(self, key: Hashable) -> None:
+        """Forget the events of a key.
+
+        Args:
+            key (Hashable): The key, e.g. a username or IP address
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _roll(self, entry: List[float], now: float) -> None:
+        """Move the counts of an entry to the window of the current time."""
+        index = now // self.window
+        if entry[0] == index:
+            return
+        entry[2] = entry[1] if entry[0] == index - 1 else 0
+        entry[0], entry[1] = index, 0
+
+
+class Throttle:
+    """Protection against brute force and credential stuffing attacks, for strategies that authenticate
+    with a username and password (see `BaseStrategy.password_credentials`). Failed attempts are counted
+    per username and per client IP address, and clients with too many failures in a sliding window are
+    rejected (429 Too Many Requests) before any strategy is attempted. Credentials that failed recently
+    are rejected from a negative cache, without calling the backend of the strategy again. Only requests
+    with a username and password are throttled, other strategies (e.g. tokens) are never affected. Only
+    invalid credentials (401) count as failures, errors like a busy password hasher (503) don't.
+
+    Behind a reverse proxy or load balancer, `request.remote_addr` is the address of the proxy. Use
+    werkzeug's `ProxyFix` middleware, or pass a `client_ip` function that gets the address of the client
+    (e.g. from a trusted "X-Forwarded-For" header), otherwise all clients share a single limit.
+
+    Args:
+        max_failures_per_user (int, optional): The maximum number of failures per username in the window.
+            Defaults to 5.
+        max_failures_per_ip (int, optional): The maximum number of failures per IP address in the window.
+            Defaults to 50.
+        window (float, optional): The length of the sliding window in seconds. Defaults to 300.
+        negative_ttl (float, optional): Number of seconds to remember failed credentials. Defaults to 30.
+        max_keys (int, optional): The maximum number of usernames, IP addresses and failed credentials
+            to keep track of (each). Defaults to 10000.
+        client_ip (Optional[Callable[[Any], Optional[str]]], optional): Function that gets the IP address of the
+            client from a request. Defaults to None (`request.remote_addr`).
+
+    Examples:
+        >>> customs = Customs(app, throttle=Throttle(max_failures_per_user=5, window=300))
+    """
+
+    def __init__(
+        self,
+        max_failures_per_user: int = 5,
+        max_failures_per_ip: int = 50,
+        window: float = 300,
+        negative_ttl: float = 30,
+        max_keys: int = 10000,
+        client_ip: Optional[Callable[[Any], Optional[str]]] = None,
+    ) -> None:
+
+        # Store input arguments
+        self.max_failures_per_user = max_failures_per_user
+        self.max_failures_per_ip = max_failures_per_ip
+        self.client_ip = client_ip or _remote_addr
+
+        # Failures per username and IP address, and the recently failed credentials (keyed hashes only)
+        self.users = SlidingWindowCounter(window, max_keys=max_keys)
+        self.ips = SlidingWindowCounter(window, max_keys=max_keys)
+        self.failed = LRUCache(max_size=max_keys, ttl=negative_ttl)
+        self._secret = os.urandom(32)
+
+    def check(
+        self, request: Any, strategies: Iterable[BaseStrategy]
+    ) -> Optional[AuthResult]:
+        """Check if a request should be rejected, before any strategy is attempted. Only requests
+        with a username and password for one of the strategies are checked.
+
+        Args:
+            request (Any): The incoming request
+            strategies (Iterable[BaseStrategy]): The strategies that will be attempted
+
+        Returns:
+            Optional[AuthResult]: The failure when the client is throttled, None otherwise
+        """
+        usernames = set()
+        for strategy in strategies:
+            credentials = strategy.password_credentials(request)
+            if credentials is not None:
+                usernames.add(credentials[0])
+        if len(usernames) == 0:
+            return None
+
+        ip = self.client_ip(request)
+        if ip is not None and self.ips.count(ip) >= self.max_failures_per_ip:
+            return THROTTLED
+        for username in usernames:
+            if self.users.count(username) >= self.max_failures_per_user:
+                return THROTTLED
+        return None
+
+    def attempt(self, strategy: BaseStrategy, request: Any) -> AuthResult:
+        """Attempt to authenticate a request with a strategy, and keep track of the failures. Credentials
+        that failed recently are rejected without attempting the strategy.
+
+        Args:
+            strategy (BaseStrategy): The strategy
+            request (Any): The incoming request
+
+        Returns:
+            AuthResult: The result of the attempt
+        """
+        credentials = strategy.password_credentials(request)
+        if credentials is None:
+            return strategy.attempt(request)
+
+        username, password = credentials
+        digest = hmac.new(
+            self._secret,
+            f"{strategy.name}:{username}:{password}".encode("utf-8"),
+            hashlib.sha256,
+        ).digest()
+        result = self.failed.get(digest)
+        if result is None:
+            result = strategy.attempt(request)
+
+            # Only invalid credentials are failures, not errors (e.g. a busy backend)
+            if result.success or result.status_code != 401:
+                return result
+            self.failed.set(digest, result)
+
+        # Count the failure
+        self.users.hit(username)
+        ip = self.client_ip(request)
+        if ip is not None:
+            self.ips.hit(ip)
+        return result
+
+
+def _remote_addr(request: Any) -> Optional[str]:
+    return getattr(request, "remote_addr", None)
+
+
+# Shared result for throttled requests
+THROTTLED = AuthResult.fail("Too many failed attempts, try again later", 429)
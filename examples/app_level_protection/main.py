@@ -18,6 +18,10 @@ DATABASE = {"admin": {"name": "Administrator User", "password": "admin"}}
 
 
 class BasicAuthentication(BasicStrategy):
+
+    # Basic authentication is stateless by default, remember the user in the session instead
+    establishes_session = True
+
     def get_or_create_user(self, user: Dict) -> Dict:
         if user.get("username") in DATABASE:
             return DATABASE[user["username"]]
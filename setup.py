@@ -30,6 +30,7 @@ setuptools.setup(
         "requests_oauthlib",
     ],
     extras_require={
+        "bcrypt": ["bcrypt"],
         "test": [
             "pytest",
             "pytest-cov",
@@ -1,10 +1,13 @@
 from flask.globals import request
+import sys
 import pytest
 import base64
+import multiprocessing
 
 from flask import Flask
 from typing import Dict
 from customs import Customs
+from customs.cache import MmapCache
 from customs.exceptions import UnauthorizedException
 from customs.strategies import BasicStrategy
 
@@ -117,3 +120,188 @@ def test_basic_strategy_authenticate():
 
     # Cleanup of the Customs object used for testing
     Customs.remove_instance()
+
+
+def test_basic_strategy_cache():
+
+    validations = []
+
+    class Basic(BasicStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return {}
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            validations.append(username)
+            if password != "test":
+                raise UnauthorizedException()
+            return {"username": username}
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    Customs(app)
+
+    # Create the strategy
+    strategy = Basic(cache_ttl=60)
+
+    def authenticate(password: str):
+        header = base64.b64encode(f"test:{password}".encode()).decode()
+        with app.test_request_context(
+            "/", headers={"Authorization": f"Basic {header}"}
+        ):
+            return strategy.authenticate(request)
+
+    assert authenticate("test") == {"username": "test"}
+    assert authenticate("test") == {"username": "test"}
+    assert validations == ["test"]
+
+    # A wrong password is never served from the cache
+    with pytest.raises(UnauthorizedException):
+        authenticate("wrong")
+    assert validations == ["test", "test"]
+
+    # Invalidating the user forces a new validation
+    strategy.invalidate("test")
+    authenticate("test")
+    assert validations == ["test", "test", "test"]
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_basic_strategy_attempt():
+    class Basic(BasicStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            if password == "secret":
+                return {"username": username}
+            return None
+
+    class Legacy(Basic):
+        name = "legacy"
+
+        def authenticate(self, request) -> Dict:
+            raise UnauthorizedException("Legacy", 403)
+
+    class Headers(Basic):
+        name = "headers"
+
+        def extract_credentials(self, request) -> Dict:
+            if "X-Username" not in request.headers:
+                raise UnauthorizedException("No username", 400)
+            return {
+                "username": request.headers["X-Username"],
+                "password": request.headers.get("X-Password"),
+            }
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    Customs(app)
+    strategy = Basic()
+    legacy = Legacy()
+    headers = Headers()
+
+    def header(password: str) -> Dict:
+        credentials = base64.b64encode(f"admin:{password}".encode()).decode()
+        return {"Authorization": f"Basic {credentials}"}
+
+    # Failures are returned, not raised
+    with app.test_request_context("/", headers=header("wrong")):
+        result = strategy.attempt(request)
+        assert not result.success and result.status_code == 401
+
+        with pytest.raises(UnauthorizedException):
+            strategy.authenticate(request)
+
+    with app.test_request_context("/", headers={"Authorization": "Basic invalid"}):
+        assert not strategy.attempt(request).success
+
+    with app.test_request_context("/", headers=header("secret")):
+        assert strategy.attempt(request).user == {"username": "admin"}
+        assert strategy.authenticate(request) == {"username": "admin"}
+
+        # Strategies that override authenticate are adapted
+        result = legacy.attempt(request)
+        assert (result.success, result.message, result.status_code) == (
+            False,
+            "Legacy",
+            403,
+        )
+
+    # Strategies that override extract_credentials use their own credentials
+    with app.test_request_context(
+        "/", headers={"X-Username": "admin", "X-Password": "secret"}
+    ):
+        assert headers.attempt(request).user == {"username": "admin"}
+        assert headers.authenticate(request) == {"username": "admin"}
+        assert headers.password_credentials(request) == ("admin", "secret")
+
+    with app.test_request_context("/"):
+        result = headers.attempt(request)
+        assert (result.message, result.status_code) == ("No username", 400)
+        assert headers.password_credentials(request) is None
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+class _CountingBasic(BasicStrategy):
+    """Basic authentication that counts the validations of credentials."""
+
+    validations = 0
+
+    def get_or_create_user(self, user: Dict) -> Dict:
+        return user
+
+    def validate_credentials(self, username: str, password: str) -> Dict:
+        type(self).validations += 1
+        if password != "secret":
+            raise UnauthorizedException()
+        return {"username": username}
+
+
+def _login_with_shared_cache(path: str) -> int:
+    """Authenticate a request with a strategy on a shared cache, in a fresh app. Returns the number
+    of validations of the credentials."""
+
+    Customs.remove_instance()
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, use_sessions=False)
+    _CountingBasic.validations = 0
+    _CountingBasic(cache=MmapCache(path, ttl=60))
+
+    @app.route("/protected")
+    @customs.protect(strategies=["basic"])
+    def protected(user):
+        return user["username"]
+
+    credentials = base64.b64encode(b"admin:secret").decode()
+    with app.test_client() as client:
+        response = client.get(
+            "/protected", headers={"Authorization": f"Basic {credentials}"}
+        )
+        assert response.data == b"admin"
+
+    Customs.remove_instance()
+    return _CountingBasic.validations
+
+
+def _worker_login(path: str) -> None:
+    sys.exit(0 if _login_with_shared_cache(path) == 1 else 2)
+
+
+def test_basic_strategy_shared_cache(tmp_path):
+
+    # Another worker process verifies the credentials first
+    path = str(tmp_path / "cache")
+    process = multiprocessing.Process(target=_worker_login, args=(path,))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+    # The verification is a hit for this process
+    assert _login_with_shared_cache(path) == 0
@@ -0,0 +1,163 @@
+import json
+import time
+import pytest
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from flask import Flask
+from jose import jwk
+from requests import Response, Session
+from requests.adapters import BaseAdapter
+from typing import Dict
+from customs import Customs
+from customs.exceptions import UnauthorizedException
+from customs.keys import KeyRing
+from customs.strategies import GoogleStrategy
+
+
+class StubAdapter(BaseAdapter):
+    """Adapter that answers every request with the same JSON data."""
+
+    def __init__(self, data: Dict) -> None:
+        super().__init__()
+        self.data = data
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append((request, kwargs))
+        response = Response()
+        response.status_code = 200
+        response._content = json.dumps(self.data).encode()
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def test_google_strategy_http_client():
+    class Google(GoogleStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    Customs(app)
+
+    # Point the strategy to a stub provider
+    adapter = StubAdapter({"email": "test@example.com"})
+    client = Session()
+    client.mount("https://", adapter)
+    strategy = Google(client_id="id", client_secret="secret", http_client=client)
+    assert strategy.http_client is client
+
+    with app.test_request_context("/"):
+        strategy.token = {"access_token": "token", "token_type": "Bearer"}
+        assert strategy.validate_token() == {"email": "test@example.com"}
+        assert strategy.get_user_info() == {"email": "test@example.com"}
+
+    # Both calls went through the injected client
+    assert len(adapter.requests) == 2
+    assert "access_token=token" in adapter.requests[0][0].url
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_google_strategy_validation_cache():
+    class Google(GoogleStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    Customs(app)
+
+    adapter = StubAdapter({"email": "test@example.com"})
+    client = Session()
+    client.mount("https://", adapter)
+    strategy = Google(
+        client_id="id",
+        client_secret="secret",
+        http_client=client,
+        cache_ttl=60,
+        stale_while_revalidate=60,
+    )
+
+    with app.test_request_context("/"):
+        strategy.token = {"access_token": "token", "expires_at": time.time() + 3600}
+        for _ in range(3):
+            assert strategy.validate_token() == {"email": "test@example.com"}
+
+        # The first call validates, the entry is immediately stale so it is refreshed in the background
+        strategy._revalidation_executor.shutdown(wait=True)
+        assert 2 <= len(adapter.requests) <= 3
+        assert strategy.cache.hits == 2
+
+        # Expired tokens are never cached
+        strategy.token = {"access_token": "expired", "expires_at": time.time() - 1}
+        strategy.validate_token()
+        assert len(strategy.cache) == 1
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_google_strategy_verify_id_token(tmp_path):
+    class Google(GoogleStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    Customs(app)
+
+    # Local certificates, and a key to issue tokens with
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    key = jwk.construct(pem.decode(), "RS256")
+    path = tmp_path / "certs.json"
+    path.write_text(json.dumps({"keys": [{**key.public_key().to_dict(), "kid": "1"}]}))
+    issuer = KeyRing(jwks={"keys": [{**key.to_dict(), "kid": "1"}]})
+
+    adapter = StubAdapter({})
+    client = Session()
+    client.mount("https://", adapter)
+    strategy = Google(
+        client_id="id",
+        client_secret="secret",
+        http_client=client,
+        verify_id_token=True,
+        certs_url=str(path),
+    )
+    assert "openid" in strategy.scopes
+
+    claims = {"iss": "https://accounts.google.com", "aud": "id", "sub": "123"}
+    with app.test_request_context("/"):
+        strategy.token = {
+            "access_token": "token",
+            "id_token": issuer.sign({**claims, "exp": time.time() + 60}),
+        }
+        assert strategy.validate_token()["sub"] == "123"
+
+        # Wrong audience, or expired tokens are rejected
+        for invalid_claims in [
+            {**claims, "aud": "other", "exp": time.time() + 60},
+            {**claims, "exp": time.time() - 60},
+        ]:
+            strategy.token = {"access_token": "token", "id_token": issuer.sign(invalid_claims)}
+            with pytest.raises(UnauthorizedException):
+                strategy.validate_token()
+
+    # No calls were made to the provider
+    assert adapter.requests == []
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
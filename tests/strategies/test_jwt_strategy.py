@@ -1,4 +1,5 @@
 from flask.globals import request
+import time
 import pytest
 
 from flask import Flask
@@ -119,3 +120,41 @@ def test_jwt_strategy_authenticate_invalid_token():
 
     # Cleanup of the Customs object used for testing
     Customs.remove_instance()
+
+
+def test_jwt_strategy_cache():
+    class JWT(JWTStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return super().get_or_create_user(user)
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    Customs(app)
+
+    # Create the strategy
+    strategy = JWT(cache_ttl=60)
+    token = strategy.sign({"username": "test"})
+    expired_token = strategy.sign({"username": "test", "exp": time.time() - 10})
+
+    for _ in range(3):
+        with app.test_request_context("/", headers={"Authorization": f"Bearer {token}"}):
+            user = strategy.authenticate(request)
+            assert user == {"username": "test"}
+
+            # Changes to the user don't end up in the cache
+            user["username"] = "changed"
+
+    assert strategy.cache.misses == 1
+    assert strategy.cache.hits == 2
+
+    # Invalid tokens are never cached
+    with pytest.raises(UnauthorizedException):
+        with app.test_request_context(
+            "/", headers={"Authorization": f"Bearer {expired_token}"}
+        ):
+            strategy.authenticate(request)
+    assert len(strategy.cache) == 1
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
@@ -0,0 +1,283 @@
+import json
+import time
+import pytest
+import asyncio
+
+from typing import Dict, List, Optional
+from customs.asgi import AsyncCustoms
+from customs.exceptions import UnauthorizedException
+from customs.strategies import GithubStrategy, JWTStrategy, LocalStrategy
+
+
+async def app(scope, receive, send):
+    """Plain ASGI app that returns the user and the body of the request."""
+
+    message = await receive()
+    user = scope.get("user")
+    body = json.dumps({"user": user, "body": message.get("body", b"").decode()})
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body.encode()})
+
+
+def call(
+    customs: AsyncCustoms,
+    path: str,
+    headers: Optional[List] = None,
+    body: bytes = b"",
+    session: Optional[Dict] = None,
+) -> Dict:
+    """Call the ASGI app with a single request, and collect the response."""
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "query_string": b"",
+        "headers": headers or [],
+    }
+    if session is not None:
+        scope["session"] = session
+
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    response: Dict = {}
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+        else:
+            response["body"] = message["body"]
+
+    asyncio.run(customs(scope, receive, send))
+    return response
+
+
+def test_async_customs():
+
+    customs = AsyncCustoms(app)
+
+    class JWT(JWTStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    class Local(LocalStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            raise UnauthorizedException()
+
+        async def authenticate_async(self, request):
+            credentials = self.extract_credentials(request)
+            if credentials.get("password") != "secret":
+                raise UnauthorizedException()
+            return {"username": credentials["username"]}
+
+    jwt = JWT()
+    Local()
+    customs.safe_zone("/api", strategies=["jwt", "local"])
+
+    # Unprotected paths are passed through, zones match whole path segments
+    assert call(customs, "/open")["status"] == 200
+    assert call(customs, "/apiary")["status"] == 200
+    assert call(customs, "/api")["status"] == 401
+
+    # Missing credentials
+    response = call(customs, "/api/test")
+    assert response["status"] == 401
+
+    # JWT tokens, the user is added to the scope
+    token = jwt.sign({"username": "admin"})
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+    response = call(customs, "/api/test", headers=headers)
+    assert response["status"] == 200
+    assert json.loads(response["body"])["user"] == {"username": "admin"}
+
+    # Credentials in the body, the body is still available for the app
+    body = json.dumps({"username": "local", "password": "secret"}).encode()
+    session: Dict = {}
+    response = call(customs, "/api/test", body=body, session=session)
+    assert json.loads(response["body"]) == {
+        "user": {"username": "local"},
+        "body": body.decode(),
+    }
+    assert session == {"user": {"username": "local"}, "strategy": "local"}
+
+    # The session is used for the next request
+    response = call(customs, "/api/test", session=session)
+    assert response["status"] == 200
+
+    # Cleanup of the Customs object used for testing
+    AsyncCustoms.remove_instance()
+
+
+def test_async_customs_redirect():
+
+    customs = AsyncCustoms(app, unauthorized_redirect_url="/login")
+
+    class JWT(JWTStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    JWT()
+    customs.safe_zone("/", strategies=["jwt"])
+
+    response = call(customs, "/test", headers=[(b"host", b"example.com")])
+    assert response["status"] == 302
+    assert (
+        response["headers"][b"location"]
+        == b"/login?next=http%3A%2F%2Fexample.com%2Ftest"
+    )
+
+    # Cleanup of the Customs object used for testing
+    AsyncCustoms.remove_instance()
+
+
+def test_async_customs_parallel_strategies():
+
+    customs = AsyncCustoms(app, use_sessions=False, parallel_strategies=True)
+
+    class Remote(LocalStrategy):
+        io_bound = True
+
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            raise UnauthorizedException()
+
+    class Slow(Remote):
+        name = "slow"
+
+        async def authenticate_async(self, request):
+            await asyncio.sleep(0.5)
+            raise UnauthorizedException("Slow failure")
+
+    class Fast(Remote):
+        name = "fast"
+
+        async def authenticate_async(self, request):
+            credentials = self.extract_credentials(request)
+            if credentials.get("password") != "secret":
+                raise UnauthorizedException("Fast failure")
+            return {"username": credentials["username"]}
+
+    Slow()
+    Fast()
+    customs.safe_zone("/", strategies=["slow", "fast"])
+
+    # The first success wins, the slow attempt is cancelled
+    body = json.dumps({"username": "local", "password": "secret"}).encode()
+    started = time.perf_counter()
+    response = call(customs, "/test", body=body)
+    assert json.loads(response["body"])["user"] == {"username": "local"}
+    assert time.perf_counter() - started < 0.4
+
+    # The failure of the first strategy is reported
+    body = json.dumps({"username": "local", "password": "wrong"}).encode()
+    response = call(customs, "/test", body=body)
+    assert response["status"] == 401
+    assert response["body"] == b"Slow failure"
+
+    # Cleanup of the Customs object used for testing
+    AsyncCustoms.remove_instance()
+
+
+def test_async_customs_websocket():
+
+    customs = AsyncCustoms(app, use_sessions=False)
+
+    class JWT(JWTStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    jwt = JWT()
+    customs.safe_zone("/ws", strategies=["jwt"])
+
+    async def websocket_app(scope, receive, send):
+        await send({"type": "websocket.accept"})
+
+    customs.app = websocket_app
+
+    def connect(headers: List) -> List:
+        scope = {"type": "websocket", "path": "/ws", "headers": headers}
+        messages: List = []
+
+        async def receive():
+            return {"type": "websocket.connect"}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(customs(scope, receive, send))
+        return messages
+
+    # Unauthenticated connections are closed before they are accepted
+    assert connect([]) == [{"type": "websocket.close", "code": 1008}]
+
+    token = jwt.sign({"username": "admin"})
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+    assert connect(headers) == [{"type": "websocket.accept"}]
+
+    # Cleanup of the Customs object used for testing
+    AsyncCustoms.remove_instance()
+
+
+def test_async_customs_body():
+
+    customs = AsyncCustoms(app, use_sessions=False, max_body_size=64)
+    bodies = []
+
+    class Custom(JWTStrategy):
+        name = "custom"
+        consumes = None
+
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+        async def authenticate_async(self, request):
+            bodies.append(request.data)
+            return {"username": "custom"}
+
+    Custom()
+    customs.safe_zone("/", strategies=["custom"])
+
+    # Strategies that don't declare the "content" source never read the body
+    response = call(customs, "/test", body=b"x" * 128)
+    assert json.loads(response["body"])["body"] == "x" * 128
+    assert bodies == [b""]
+
+    class Local(LocalStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            return {"username": username}
+
+    Local()
+    customs.safe_zone("/login", strategies=["local"])
+
+    # Bodies that are read for authentication are limited in size
+    body = json.dumps({"username": "local", "password": "x" * 64}).encode()
+    assert call(customs, "/login", body=body)["status"] == 413
+
+    # Cleanup of the Customs object used for testing
+    AsyncCustoms.remove_instance()
+
+
+def test_async_customs_oauth2_warning():
+
+    AsyncCustoms(app)
+
+    class Github(GithubStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    with pytest.warns(UserWarning, match="needs a Flask app"):
+        Github(client_id="id", client_secret="secret")
+
+    # Cleanup of the Customs object used for testing
+    AsyncCustoms.remove_instance()
@@ -0,0 +1,31 @@
+import json
+
+from customs import Customs
+from customs.bench import SCENARIOS, main, run_benchmarks
+
+
+def test_run_benchmarks():
+
+    results = run_benchmarks(
+        ["bare", "basic-protect", "session-hit"], requests=5, warmup=1
+    )
+    assert [result["scenario"] for result in results["results"]] == [
+        "bare",
+        "basic-protect",
+        "session-hit",
+    ]
+    for result in results["results"]:
+        assert result["requests_per_second"] > 0
+        assert result["p50_ms"] <= result["p99_ms"]
+        assert result["allocated_bytes_per_request"] > 0
+
+    # Every scenario cleans up its Customs instance
+    assert Customs.get_instance() is None
+
+
+def test_main(tmp_path):
+
+    output = tmp_path / "results.json"
+    assert main(["--requests", "3", "--warmup", "0", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert [result["scenario"] for result in results["results"]] == list(SCENARIOS)
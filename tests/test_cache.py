@@ -0,0 +1,126 @@
+import time
+import pytest
+import multiprocessing
+
+from customs.cache import LRUCache, MmapCache
+
+
+def test_lru_cache():
+
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # Use "a", so "b" is the least recently used entry
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.hits == 2 and cache.misses == 1
+
+    cache.delete("a")
+    assert cache.get("a") is None
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_lru_cache_ttl():
+
+    cache = LRUCache(ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=0.01)
+    cache.set("c", 3, ttl=0)
+
+    time.sleep(0.02)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") is None
+
+
+def _fill_mmap_cache(path: str, worker: int) -> None:
+    """Store values in the shared cache from another process."""
+    cache = MmapCache(path, slots=1024)
+    for index in range(10):
+        cache.set(f"{worker}:{index}", {"worker": worker, "index": index})
+    if cache.get("parent") == "value":
+        cache.set(f"{worker}:parent", True)
+
+
+def test_mmap_cache(tmp_path):
+
+    cache = MmapCache(str(tmp_path / "cache"), slots=8, slot_size=64, ways=2)
+    cache.set("a", {"username": "admin"})
+    assert cache.get("a") == {"username": "admin"}
+    assert cache.get("b") is None
+    assert cache.hits == 1 and cache.misses == 1
+
+    # Values that don't fit in a slot are not cached
+    cache.set("large", "x" * 64)
+    assert cache.get("large") is None
+
+    # Expired values are gone, and their slots are reused
+    cache.set("short", 1, ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+
+    # The cache never holds more values than slots
+    for index in range(20):
+        cache.set(index, index)
+    assert sum(cache.get(index) is not None for index in range(20)) <= 8
+    assert cache.get(19) == 19
+
+    cache.delete(19)
+    assert cache.get(19) is None
+
+    # Another layout of the same file starts with an empty cache
+    cache.close()
+    cache = MmapCache(str(tmp_path / "cache"), slots=16, slot_size=64)
+    assert cache.get(18) is None
+
+    cache.set("a", 1)
+    cache.clear()
+    assert cache.get("a") is None
+    cache.close()
+
+
+def test_mmap_cache_processes(tmp_path):
+
+    path = str(tmp_path / "cache")
+    cache = MmapCache(path, slots=1024)
+    cache.set("parent", "value")
+
+    # Values stored by other processes are visible to all processes
+    processes = [
+        multiprocessing.Process(target=_fill_mmap_cache, args=(path, worker))
+        for worker in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    for worker in range(4):
+        assert cache.get(f"{worker}:parent") is True
+        for index in range(10):
+            assert cache.get(f"{worker}:{index}") == {"worker": worker, "index": index}
+    cache.close()
+
+
+def test_mmap_cache_permissions(tmp_path):
+
+    path = tmp_path / "cache"
+    path.write_bytes(b"")
+    path.chmod(0o666)
+    with pytest.raises(PermissionError):
+        MmapCache(str(path))
+
+    # The secret is shared by every user of the file
+    path.chmod(0o600)
+    cache = MmapCache(str(path), slots=8)
+    assert cache.secret is not None
+    assert MmapCache(str(path), slots=8).secret == cache.secret
+    assert MmapCache(str(path), slots=16).secret != cache.secret
+    cache.close()
@@ -0,0 +1,601 @@
+import io
+import time
+import threading
+import base64
+
+from flask import Flask, request
+from typing import Dict
+from customs import Customs
+from customs.customs import _AuthPlan
+from customs.exceptions import UnauthorizedException
+from customs.strategies import BasicStrategy, JWTStrategy, LocalStrategy
+
+
+DATABASE = {"admin": {"username": "admin", "password": "admin"}}
+
+
+class Basic(BasicStrategy):
+    def get_or_create_user(self, user: Dict) -> Dict:
+        return user
+
+    def validate_credentials(self, username: str, password: str) -> Dict:
+        if username in DATABASE and DATABASE[username]["password"] == password:
+            return DATABASE[username]
+        raise UnauthorizedException()
+
+
+class SessionBasic(Basic):
+    """Basic authentication that stores the authenticated user on the session."""
+
+    establishes_session = True
+
+
+def _basic_header(username: str, password: str) -> Dict:
+    credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return {"Authorization": f"Basic {credentials}"}
+
+
+def test_customs_protect():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app)
+    strategy = Basic()
+
+    @app.route("/protected")
+    @customs.protect(strategies=[strategy])
+    def protected(user):
+        return user["username"]
+
+    with app.test_client() as client:
+        response = client.get("/protected")
+        assert response.status_code == 401
+
+        response = client.get("/protected", headers=_basic_header("admin", "admin"))
+        assert response.status_code == 200
+        assert response.data == b"admin"
+
+        # Basic authentication is stateless, the session is never touched
+        assert "Set-Cookie" not in response.headers
+        response = client.get("/protected")
+        assert response.status_code == 401
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_safe_zone_plans():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, use_sessions=False)
+    Basic()
+
+    @app.route("/with_user")
+    def with_user(user):
+        return user["username"]
+
+    @app.route("/without_user")
+    def without_user():
+        return "Success"
+
+    customs.safe_zone(app, strategies=["basic"])
+
+    with app.test_client() as client:
+        assert client.get("/with_user").status_code == 401
+
+        headers = _basic_header("admin", "admin")
+        assert client.get("/with_user", headers=headers).data == b"admin"
+        assert client.get("/without_user", headers=headers).data == b"Success"
+        assert client.get("/not_found", headers=headers).status_code == 404
+
+    # The plans are built once per endpoint
+    assert customs._plans["with_user"].accepts_user
+    assert not customs._plans["without_user"].accepts_user
+
+    # Changing the zone invalidates the plans
+    customs.safe_zone(app, strategies=["basic"])
+    assert customs._plans == {}
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_scheme_dispatch():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, use_sessions=False)
+
+    attempts = []
+
+    class Local(LocalStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            attempts.append(self.name)
+            raise UnauthorizedException()
+
+    class JWT(JWTStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    Basic()
+    Local()
+    jwt = JWT()
+
+    @app.route("/")
+    def index(user):
+        return user["username"]
+
+    customs.safe_zone(app, strategies=["basic", "local", "jwt"])
+
+    with app.test_client() as client:
+        token = jwt.sign({"username": "admin"})
+        response = client.get("/", headers={"Authorization": f"Bearer {token}"})
+        assert response.data == b"admin"
+        assert attempts == []
+
+        # Local is a candidate as soon as there is content
+        response = client.get("/?username=test&password=test")
+        assert response.status_code == 401
+        assert attempts == ["local"]
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_scheme_dispatch_overridden():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, use_sessions=False)
+
+    # Subclasses that read credentials from other places, without declaring them
+    class Headers(Basic):
+        def extract_credentials(self, request) -> Dict:
+            return {
+                "username": request.headers.get("X-User"),
+                "password": request.headers.get("X-Pass"),
+            }
+
+    class Form(LocalStrategy):
+        name = "form"
+
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            return Basic.validate_credentials(self, username, password)
+
+        def extract_credentials(self, request) -> Dict:
+            return {
+                "username": request.form.get("user"),
+                "password": request.form.get("pass"),
+            }
+
+    class JWT(JWTStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    JWT()
+    Headers()
+    Form()
+
+    @app.route("/", methods=["GET", "POST"])
+    def index(user):
+        return user["username"]
+
+    customs.safe_zone(app, strategies=["jwt", "basic", "form"])
+
+    # The overridden strategies are always candidates
+    with app.test_client() as client:
+        response = client.get("/", headers={"X-User": "admin", "X-Pass": "admin"})
+        assert response.data == b"admin"
+        response = client.post("/", data={"user": "admin", "pass": "admin"})
+        assert response.data == b"admin"
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_metrics():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, metrics_endpoint="/metrics")
+    SessionBasic(cache_ttl=60)
+
+    @app.route("/protected")
+    @customs.protect(strategies=["basic"])
+    def protected():
+        return "Success"
+
+    with app.test_client() as client:
+        client.get("/protected")
+        client.get("/protected", headers=_basic_header("admin", "admin"))
+        client.get("/protected")
+        response = client.get("/metrics")
+
+    metrics = customs.metrics
+    assert metrics.get_counter(
+        "customs_strategy_attempts_total", strategy="basic", outcome="failure"
+    ) == 1
+    assert metrics.get_counter(
+        "customs_strategy_attempts_total", strategy="basic", outcome="success"
+    ) == 1
+    assert metrics.get_counter("customs_session_checks_total", result="hit") == 1
+    assert metrics.get_counter("customs_session_checks_total", result="miss") == 2
+    assert metrics.get_histogram("customs_strategy_duration_seconds", strategy="basic")[2] == 2
+
+    assert response.mimetype == "text/plain"
+    assert b'customs_strategy_attempts_total{outcome="success",strategy="basic"} 1' in response.data
+    assert b'customs_cache_misses{strategy="basic"} 1' in response.data
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_server_timing():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, server_timing=True)
+    SessionBasic()
+
+    @app.route("/open")
+    def open_route():
+        return "Success"
+
+    @app.route("/protected")
+    @customs.protect(strategies=["basic"])
+    def protected():
+        return "Success"
+
+    with app.test_client() as client:
+        assert "Server-Timing" not in client.get("/open").headers
+
+        response = client.get("/protected", headers=_basic_header("admin", "admin"))
+        timings = response.headers["Server-Timing"].split(", ")
+        assert timings[0].startswith("customs-session;dur=")
+        assert timings[1].startswith("customs-strategy-basic;dur=")
+
+        response = client.get("/protected")
+        timings = response.headers["Server-Timing"].split(", ")
+        assert timings[0].startswith("customs-deserialize-basic;dur=")
+        assert timings[1].startswith("customs-session;dur=")
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_lazy_user():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, lazy_user=True)
+    loaded = []
+
+    class LazyBasic(SessionBasic):
+        def deserialize_user(self, data: Dict) -> Dict:
+            loaded.append(data["username"])
+            if data["username"] not in DATABASE:
+                raise UnauthorizedException()
+            return DATABASE[data["username"]]
+
+    LazyBasic()
+
+    @app.route("/status")
+    @customs.protect(strategies=["basic"])
+    def status(user):
+        return "Authenticated" if user else "Anonymous"
+
+    @app.route("/profile")
+    @customs.protect(strategies=["basic"])
+    def profile(user):
+        return user["username"] + user.get("password")
+
+    with app.test_client() as client:
+        response = client.get("/status", headers=_basic_header("admin", "admin"))
+        assert response.data == b"Authenticated"
+
+        # The user is only loaded when the view uses it, and only once
+        assert client.get("/status").data == b"Authenticated"
+        assert loaded == []
+        assert client.get("/profile").data == b"adminadmin"
+        assert loaded == ["admin"]
+
+        # Users that can no longer be loaded are logged out
+        with client.session_transaction() as session:
+            session["user"] = {"username": "removed"}
+        assert client.get("/profile").status_code == 401
+        assert client.get("/status").status_code == 401
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_auth_memo():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app)
+    calls: Dict[str, int] = {"basic": 0, "failing": 0}
+
+    class CountingBasic(Basic):
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            calls[self.name] += 1
+            return super().validate_credentials(username, password)
+
+    class Failing(CountingBasic):
+        name = "failing"
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            calls[self.name] += 1
+            raise UnauthorizedException()
+
+    class JWT(JWTStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    CountingBasic()
+    Failing()
+    JWT()
+
+    @app.route("/nested")
+    @customs.protect(strategies=["failing", "basic"])
+    def nested(user):
+        return user["username"]
+
+    @app.route("/other")
+    @customs.protect(strategies=["failing", "jwt"])
+    def other(user):
+        return user["username"]
+
+    customs.safe_zone(app, strategies=["failing", "basic"])
+
+    with app.test_client() as client:
+
+        # The safe zone and the protected route share a single authentication
+        response = client.get("/nested", headers=_basic_header("admin", "admin"))
+        assert response.data == b"admin"
+        assert calls == {"basic": 1, "failing": 1}
+
+        # A strategy that failed for the request is not tried again
+        response = client.get("/other", headers=_basic_header("admin", "admin"))
+        assert response.status_code == 401
+        assert calls == {"basic": 2, "failing": 2}
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_parallel_strategies():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, use_sessions=False, parallel_strategies=4)
+
+    class Remote(Basic):
+        io_bound = True
+
+    class Slow(Remote):
+        name = "slow"
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            time.sleep(0.5)
+            raise UnauthorizedException("Slow failure")
+
+    class Fast(Remote):
+        name = "fast"
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            if password != "admin":
+                raise UnauthorizedException("Fast failure")
+            return super().validate_credentials(username, password)
+
+    Slow()
+    Fast()
+
+    @app.route("/protected")
+    @customs.protect(strategies=["slow", "fast"])
+    def protected(user):
+        return user["username"]
+
+    with app.test_client() as client:
+
+        # The first success wins, without waiting for the slow strategy
+        started = time.perf_counter()
+        response = client.get("/protected", headers=_basic_header("admin", "admin"))
+        assert response.data == b"admin"
+        assert time.perf_counter() - started < 0.4
+
+        # The failure of the first strategy is reported
+        response = client.get("/protected", headers=_basic_header("admin", "wrong"))
+        assert response.status_code == 401
+        assert response.data == b"Slow failure"
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_parallel_strategies_server_timing():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(
+        app, use_sessions=False, parallel_strategies=2, server_timing=True
+    )
+
+    class Remote(Basic):
+        io_bound = True
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            customs.record_timing("provider_validation", 0.001, self.name)
+            if self.name == "first":
+                raise UnauthorizedException()
+            return super().validate_credentials(username, password)
+
+    class First(Remote):
+        name = "first"
+
+    class Second(Remote):
+        name = "second"
+
+    First()
+    Second()
+
+    @app.route("/protected")
+    @customs.protect(strategies=["first", "second"])
+    def protected(user):
+        return user["username"]
+
+    # Timings recorded in the worker threads end up in the response
+    with app.test_client() as client:
+        response = client.get("/protected", headers=_basic_header("admin", "admin"))
+        assert response.data == b"admin"
+        header = response.headers["Server-Timing"]
+        assert "customs-provider_validation-first" in header
+        assert "customs-provider_validation-second" in header
+
+    # Removing the instance stops the worker threads
+    executor = customs._executor
+    assert executor is not None
+    Customs.remove_instance()
+    assert customs._executor is None
+    assert executor._shutdown
+
+
+def test_customs_parallel_strategies_request_context():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, use_sessions=False, parallel_strategies=2)
+    teardowns = []
+
+    @app.teardown_request
+    def teardown(exception):
+        teardowns.append(exception)
+
+    class Form(Basic):
+        io_bound = True
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            if request.form.get("strategy") != self.name:
+                raise UnauthorizedException()
+            return super().validate_credentials(username, password)
+
+    class First(Form):
+        name = "first"
+
+    class Second(Form):
+        name = "second"
+
+    First()
+    Second()
+
+    @app.route("/upload", methods=["POST"])
+    @customs.protect(strategies=["first", "second"])
+    def upload(user):
+        return request.files["f"].read()
+
+    # The upload is still readable in the view, and the request is torn down once
+    response = app.test_client().post(
+        "/upload",
+        headers=_basic_header("admin", "admin"),
+        data={"strategy": "second", "f": (io.BytesIO(b"content"), "f.txt")},
+    )
+    assert response.status_code == 200
+    assert response.data == b"content"
+    assert teardowns == [None]
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_adaptive_order():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, use_sessions=False, adaptive_order=2)
+    attempts = []
+
+    class Failing(Basic):
+        name = "failing"
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            attempts.append(self.name)
+            raise UnauthorizedException("First failure")
+
+    class Counting(Basic):
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            attempts.append(self.name)
+            return super().validate_credentials(username, password)
+
+    Failing()
+    Counting()
+
+    @app.route("/protected")
+    @customs.protect(strategies=["failing", "basic"])
+    def protected(user):
+        return user["username"]
+
+    with app.test_client() as client:
+        headers = _basic_header("admin", "admin")
+
+        # Registration order, until the strategies are ranked
+        for _ in range(2):
+            assert client.get("/protected", headers=headers).data == b"admin"
+        assert attempts == ["failing", "basic"] * 2
+
+        # The most successful strategy is tried first
+        attempts.clear()
+        assert client.get("/protected", headers=headers).data == b"admin"
+        assert attempts == ["basic"]
+
+        # Failures are reported for the first strategy in registration order
+        response = client.get("/protected", headers=_basic_header("admin", "wrong"))
+        assert response.data == b"First failure"
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_adaptive_order_threads():
+
+    # Outcomes are recorded concurrently by the requests to an endpoint
+    class Strategy:
+        def declared_sources(self) -> None:
+            return None
+
+    strategies = [Strategy() for _ in range(8)]
+    plan = _AuthPlan(strategies, True, False, rank_interval=7)  # type: ignore
+
+    def record(strategy) -> None:
+        for _ in range(1000):
+            plan.record(strategy)
+
+    threads = [
+        threading.Thread(target=record, args=(strategy,)) for strategy in strategies
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Every outcome is counted, and every strategy is ranked
+    assert plan._recorded == 8000 % 7
+    assert plan._rank is not None and len(plan._rank) == 8
@@ -1,12 +1,18 @@
 from customs.helpers import (
+    LazyUser,
+    get_credentials,
     parse_args,
     parse_content,
     parse_headers,
     parse_data,
+    request_provides,
+    resolve_user,
     set_redirect_url,
+    store_user,
 )
 
 from flask import Flask, request, session
+from typing import Dict
 
 
 def test_parse_args():
@@ -64,3 +70,90 @@ def test_set_redirect_url():
     with app.test_request_context("/?next=test"):
         set_redirect_url()
         assert session["next"] == "test"
+
+
+def test_request_provides():
+
+    # Create a test app
+    app = Flask(__name__)
+    app.secret_key = "bcdec7a5-f9fc-48db-8a11-1fefe7a7c809"
+
+    with app.test_request_context("/", headers={"Authorization": "Bearer token"}):
+        assert request_provides(request, "authorization:bearer")
+        assert not request_provides(request, "authorization:basic")
+        assert not request_provides(request, "content")
+        assert not request_provides(request, "session:oauth_token")
+
+    with app.test_request_context("/?test=123", headers={"X-Api-Key": "key"}):
+        assert request_provides(request, "content")
+        assert request_provides(request, "header:x-api-key")
+        assert not request_provides(request, "cookie:token")
+
+
+def test_get_credentials():
+
+    # Create a test app
+    app = Flask(__name__)
+
+    with app.test_request_context(
+        "/?test=123", json={"bla": "bla"}, headers={"Authorization": "Bearer token"}
+    ):
+        credentials = get_credentials(request)
+
+        # The view is shared for the request
+        assert get_credentials(request) is credentials
+        assert credentials.authorization == ("bearer", "token")
+        assert credentials.headers["authorization"] == "Bearer token"
+        assert credentials.content == {"test": "123", "bla": "bla"}
+        assert credentials.data is credentials.data
+
+    with app.test_request_context("/"):
+        assert get_credentials(request).authorization == ("", "")
+
+
+def test_store_user():
+
+    class Stateful:
+        name = "stateful"
+        establishes_session = True
+
+        def serialize_user(self, user):
+            return {"username": user["username"]}
+
+    class Stateless(Stateful):
+        name = "stateless"
+        establishes_session = False
+
+    session: Dict = {}
+    user = {"username": "admin", "password": "admin"}
+
+    # Stateless strategies never touch the session
+    assert not store_user(session, user, Stateless())
+    assert session == {}
+
+    # The session is only written when the user (or strategy) changes
+    assert store_user(session, user, Stateful())
+    assert session == {"user": {"username": "admin"}, "strategy": "stateful"}
+    assert not store_user(session, user, Stateful())
+    assert store_user(session, {"username": "other"}, Stateful())
+
+
+def test_lazy_user():
+
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"username": "admin"}
+
+    user = LazyUser(loader)
+    assert user and repr(user) == "LazyUser(<not loaded>)"
+    assert calls == []
+
+    assert user["username"] == "admin"
+    assert user.get("username") == "admin"
+    assert "username" in user and list(user) == ["username"] and len(user) == 1
+    assert user == {"username": "admin"}
+    assert resolve_user(user) == {"username": "admin"}
+    assert resolve_user("plain") == "plain"
+    assert calls == [1]
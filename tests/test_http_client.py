@@ -0,0 +1,13 @@
+from customs.http_client import HTTPClient
+
+
+def test_http_client():
+
+    client = HTTPClient(pool_size=4, timeout=(1, 2), retries=3)
+    assert client.timeout == (1, 2)
+
+    # All requests share the same adapter (and connection pool)
+    adapter = client.get_adapter("https://example.com")
+    assert adapter is client.get_adapter("http://example.com")
+    assert adapter._pool_maxsize == 4
+    assert adapter.max_retries.total == 3
@@ -0,0 +1,62 @@
+import sys
+import json
+import pytest
+import subprocess
+
+# Heavy dependencies that are only needed by some strategies
+HEAVY_MODULES = ["jose", "cryptography", "requests", "requests_oauthlib"]
+
+# Generous upper bound for the cumulative import time of Customs, in seconds
+IMPORT_BUDGET = 2.0
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    """Run Python code in a new interpreter, with an empty module cache."""
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_basic_import_skips_heavy_dependencies():
+
+    result = run_python(
+        "import sys, json\n"
+        "from customs import Customs\n"
+        "from customs.strategies import BasicStrategy, LocalStrategy\n"
+        "print(json.dumps(sorted(sys.modules)))"
+    )
+    modules = json.loads(result.stdout)
+    assert [module for module in HEAVY_MODULES if module in modules] == []
+
+
+def test_strategies_are_imported_on_first_access():
+
+    result = run_python(
+        "import sys, json\n"
+        "import customs.strategies\n"
+        "before = 'jose' in sys.modules\n"
+        "from customs.strategies import JWTStrategy\n"
+        "print(json.dumps([before, 'jose' in sys.modules, JWTStrategy.name]))"
+    )
+    assert json.loads(result.stdout) == [False, True, "jwt"]
+
+
+def test_import_time_budget():
+
+    # The cumulative import time (in microseconds) is the second column of "-X importtime"
+    result = run_python("import customs", "-X", "importtime")
+    lines = [line for line in result.stderr.splitlines() if line.endswith("| customs")]
+    cumulative = int(lines[-1].split("|")[1])
+    assert cumulative / 1e6 < IMPORT_BUDGET
+
+
+def test_unknown_strategy():
+
+    import customs.strategies
+
+    with pytest.raises(AttributeError):
+        customs.strategies.UnknownStrategy
+    assert "BasicStrategy" in dir(customs.strategies)
@@ -0,0 +1,65 @@
+import json
+import pytest
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from jose.exceptions import JWTError
+
+from customs.keys import KeyRing
+
+
+def _rsa_jwk(kid: str):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    key = jwk.construct(pem.decode(), "RS256")
+    return {**key.to_dict(), "kid": kid}, {**key.public_key().to_dict(), "kid": kid}
+
+
+def test_key_ring_symmetric():
+
+    keys = KeyRing(["first-secret"])
+    token = keys.sign({"username": "test"})
+    assert jwt.get_unverified_header(token)["kid"] == keys.signing_kid
+    assert keys.decode(token) == {"username": "test"}
+
+    # Tokens without a key id are verified with the matching keys
+    keys.add_key("second-secret", kid="second")
+    assert keys.decode(jwt.encode({"a": 1}, "second-secret")) == {"a": 1}
+    with pytest.raises(JWTError):
+        keys.decode(jwt.encode({"a": 1}, "unknown-secret"))
+
+    # Removed keys can't be used anymore
+    version = keys.version
+    keys.remove_key(keys.signing_kid)
+    assert keys.version > version
+    with pytest.raises(JWTError):
+        keys.decode(token)
+
+
+def test_key_ring_jwks(tmp_path):
+
+    private_jwk, public_jwk = _rsa_jwk("rsa-1")
+
+    # The issuer signs tokens with the private key, the verifier only has the public key
+    issuer = KeyRing(jwks={"keys": [private_jwk]})
+    path = tmp_path / "jwks.json"
+    path.write_text(json.dumps({"keys": [public_jwk, {"kty": "OKP", "kid": "ed"}]}))
+    with pytest.warns(UserWarning):
+        verifier = KeyRing(jwks=str(path))
+
+    assert "rsa-1" in verifier and len(verifier) == 1
+    assert verifier.signing_kid is None
+    token = issuer.sign({"username": "test"})
+    assert verifier.decode(token) == {"username": "test"}
+
+    # Rotate the keys at runtime
+    new_private_jwk, new_public_jwk = _rsa_jwk("rsa-2")
+    verifier.load_jwks({"keys": [new_public_jwk]})
+    with pytest.raises(JWTError):
+        verifier.decode(token)
+    assert verifier.decode(KeyRing(jwks={"keys": [new_private_jwk]}).sign({})) == {}
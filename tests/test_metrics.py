@@ -0,0 +1,23 @@
+from customs.metrics import InMemoryMetrics
+
+
+def test_in_memory_metrics():
+
+    metrics = InMemoryMetrics(buckets=[0.1, 1])
+    metrics.increment("requests_total", strategy="basic")
+    metrics.increment("requests_total", 2, strategy="basic")
+    metrics.observe("duration_seconds", 0.05, strategy="basic")
+    metrics.observe("duration_seconds", 0.5, strategy="basic")
+    metrics.observe("duration_seconds", 5, strategy="basic")
+
+    assert metrics.get_counter("requests_total", strategy="basic") == 3
+    assert metrics.get_counter("requests_total", strategy="jwt") == 0
+    assert metrics.get_histogram("duration_seconds", strategy="basic") == ([1, 1, 1], 5.55, 3)
+
+    text = metrics.render_prometheus(gauges=[("cache_hits", {"strategy": "basic"}, 4)])
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{strategy="basic"} 3' in text
+    assert 'duration_seconds_bucket{strategy="basic",le="0.1"} 1' in text
+    assert 'duration_seconds_bucket{strategy="basic",le="+Inf"} 3' in text
+    assert 'duration_seconds_count{strategy="basic"} 3' in text
+    assert 'cache_hits{strategy="basic"} 4' in text
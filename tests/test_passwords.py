@@ -0,0 +1,111 @@
+import sys
+import pytest
+import threading
+
+from flask import Flask
+from typing import Dict
+from customs import Customs
+from customs.exceptions import UnauthorizedException
+from customs.passwords import PasswordHasher
+from customs.strategies import LocalStrategy
+
+
+def test_password_hasher():
+
+    hasher = PasswordHasher(n=2**10)
+    hashed = hasher.hash("secret")
+    assert hashed.startswith("$scrypt$ln=10,r=8,p=1$")
+    assert hasher.verify("secret", hashed)
+    assert not hasher.verify("wrong", hashed)
+    assert not hasher.verify("secret", "$scrypt$invalid")
+    assert not hasher.needs_rehash(hashed)
+
+    # Hashes with other parameters are upgraded on a successful verification
+    upgraded = PasswordHasher(n=2**11)
+    assert upgraded.needs_rehash(hashed)
+    assert upgraded.verify_and_update("wrong", hashed) == (False, None)
+    valid, new_hash = upgraded.verify_and_update("secret", hashed)
+    assert valid and new_hash is not None and new_hash.startswith("$scrypt$ln=11,")
+
+    # Hashing on a pool of processes
+    processes = PasswordHasher(n=2**10, use_processes=True)
+    assert processes.verify("secret", hashed)
+    processes.shutdown()
+
+    with pytest.raises(ValueError):
+        PasswordHasher(scheme="md5")
+
+
+def test_password_hasher_without_bcrypt(monkeypatch):
+
+    # Without the bcrypt package, bcrypt hashes never match
+    monkeypatch.setitem(sys.modules, "bcrypt", None)
+    hasher = PasswordHasher(n=2**10)
+    hashed = "$2b$12$" + "a" * 53
+    with pytest.warns(UserWarning, match="customs\\[bcrypt\\]"):
+        assert not hasher.verify("secret", hashed)
+    assert hasher.needs_rehash(hashed)
+
+    with pytest.raises(ImportError):
+        PasswordHasher(scheme="bcrypt")
+
+
+def test_password_hasher_queue_timeout():
+
+    hasher = PasswordHasher(n=2**10, max_concurrency=1, queue_timeout=0.01)
+    hashed = hasher.hash("secret")
+
+    # All workers are busy, requests fail fast
+    hasher._slots.acquire()
+    with pytest.raises(UnauthorizedException) as exception:
+        hasher.verify("secret", hashed)
+    assert exception.value.status_code == 503
+
+    hasher._slots.release()
+    assert hasher.verify("secret", hashed)
+
+
+def test_local_strategy_verify_password():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app)
+
+    database = {"admin": PasswordHasher(n=2**10).hash("secret")}
+    rehashed = threading.Event()
+
+    class Local(LocalStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            if username in database and self.verify_password(
+                username, password, database[username]
+            ):
+                return {"username": username}
+            raise UnauthorizedException()
+
+        def rehash_password(self, username: str, hashed: str) -> None:
+            database[username] = hashed
+            rehashed.set()
+
+    Local(password_hasher=PasswordHasher(n=2**11))
+
+    @app.route("/login")
+    @customs.protect(strategies=["local"])
+    def login(user):
+        return user["username"]
+
+    with app.test_client() as client:
+        response = client.get("/login?username=admin&password=wrong")
+        assert response.status_code == 401
+        assert not rehashed.is_set()
+
+        response = client.get("/login?username=admin&password=secret")
+        assert response.data == b"admin"
+        assert rehashed.is_set()
+        assert database["admin"].startswith("$scrypt$ln=11,")
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
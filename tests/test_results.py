@@ -0,0 +1,24 @@
+from customs.exceptions import UnauthorizedException
+from customs.results import UNAUTHORIZED, AuthResult
+
+
+def test_auth_result():
+
+    result = AuthResult.ok({"username": "admin"})
+    assert result.success and result.user == {"username": "admin"}
+    assert repr(result) == "AuthResult.ok({'username': 'admin'})"
+
+    # Failures without a reason share a single result
+    assert AuthResult.fail() is UNAUTHORIZED
+    assert (UNAUTHORIZED.message, UNAUTHORIZED.status_code) == ("Unauthorized", 401)
+
+    failure = AuthResult.fail("No token found")
+    assert not failure.success and failure.status_code == 401
+    assert repr(failure) == "AuthResult.fail('No token found', 401)"
+
+    # Conversion from and to exceptions
+    exception = failure.to_exception()
+    assert isinstance(exception, UnauthorizedException)
+    assert exception.message == "No token found"
+    converted = AuthResult.from_exception(UnauthorizedException("Forbidden", 403))
+    assert (converted.message, converted.status_code) == ("Forbidden", 403)
@@ -0,0 +1,192 @@
+import time
+
+from flask import Flask, session
+from typing import Any, Dict, Optional
+from customs import Customs
+from customs.cache import LRUCache
+from customs.exceptions import UnauthorizedException
+from customs.sessions import KeyValueStore, SQLiteStore
+from customs.strategies import LocalStrategy
+from tests.test_customs import DATABASE, Basic, _basic_header
+
+
+class Local(LocalStrategy):
+    def get_or_create_user(self, user: Dict) -> Dict:
+        return user
+
+    def validate_credentials(self, username: str, password: str) -> Dict:
+        if username in DATABASE and DATABASE[username]["password"] == password:
+            return DATABASE[username]
+        raise UnauthorizedException()
+
+
+class FakeRedis:
+    """Local stand-in for a Redis client."""
+
+    def __init__(self) -> None:
+        self.data: Dict[str, Any] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.data.get(key)
+        if value is None or (value[1] is not None and value[1] <= time.time()):
+            return None
+        return value[0].encode()
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> None:
+        self.data[key] = (value, None if ex is None else time.time() + ex)
+
+    def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+    def scan_iter(self, match: str):
+        return [key for key in self.data if key.startswith(match.rstrip("*"))]
+
+
+def test_server_side_sessions():
+
+    # Create customs, with sessions stored on the server
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    store = LRUCache()
+    customs = Customs(app, session_store=store)
+    strategy = Local()
+
+    @app.route("/protected")
+    @customs.protect(strategies=[strategy])
+    def protected(user):
+        return user["username"]
+
+    @app.route("/logout")
+    def logout():
+        session.clear()
+        return "Bye"
+
+    with app.test_client() as client:
+        response = client.get("/protected?username=admin&password=admin")
+        assert response.status_code == 200
+
+        # The cookie only contains the session id, the user is kept on the server
+        cookie = response.headers["Set-Cookie"].split(";")[0]
+        sid = cookie.split("=", 1)[1]
+        assert "admin" not in cookie
+        assert "admin" in store.get(f"session:{sid}")
+
+        # The session is used for the next request, without writing it again
+        response = client.get("/protected")
+        assert response.status_code == 200
+        assert "Set-Cookie" not in response.headers
+
+        # Clearing the session removes it from the store
+        response = client.get("/logout")
+        assert store.get(f"session:{sid}") is None
+        assert client.get("/protected").status_code == 401
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_sqlite_store(tmp_path):
+
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteStore(path)
+    store.set("key", "value")
+    store.set("expired", "value", ttl=-1)
+    store.set("expiring", "value", ttl=0.01)
+    assert store.get("key") == "value"
+    assert store.get("expired") is None
+
+    # The database can be shared
+    assert SQLiteStore(path).get("key") == "value"
+
+    time.sleep(0.02)
+    assert store.get("expiring") is None
+    assert (store.hits, store.misses) == (1, 2)
+
+    store.delete("key")
+    assert store.get("key") is None
+    store.set("key", "value")
+    store.clear()
+    assert store.get("key") is None
+
+    # Values are serialized
+    store.set("tuple", ("digest", {"username": "admin"}))
+    assert store.get("tuple") == ("digest", {"username": "admin"})
+
+
+def test_key_value_store():
+
+    client = FakeRedis()
+    store = KeyValueStore(client, ttl=60)
+    store.set("key", "value")
+    assert store.get("key") == "value"
+    assert client.data["customs:key"][1] is not None
+    assert store.get("missing") is None
+
+    store.delete("key")
+    assert store.get("key") is None
+
+    store.set("key", "value")
+    store.clear()
+    assert client.data == {}
+
+    store.set("tuple", ("digest", b"data"))
+    assert store.get("tuple") == ("digest", b"data")
+
+
+def test_session_fixation():
+
+    # Create customs, with sessions stored on the server
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    store = SQLiteStore()
+    customs = Customs(app, session_store=store)
+    Local()
+
+    @app.route("/visit")
+    def visit():
+        session["visited"] = True
+        return "Welcome"
+
+    @app.route("/protected")
+    @customs.protect(strategies=["local"])
+    def protected(user):
+        return user["username"]
+
+    with app.test_client() as client:
+
+        # A session id that exists before logging in is replaced
+        response = client.get("/visit")
+        sid = response.headers["Set-Cookie"].split(";")[0].split("=", 1)[1]
+        response = client.get("/protected?username=admin&password=admin")
+        new_sid = response.headers["Set-Cookie"].split(";")[0].split("=", 1)[1]
+        assert new_sid != sid
+        assert store.get(f"session:{sid}") is None
+        assert client.get("/protected").data == b"admin"
+
+        # The store serializes the session, the session interface doesn't serialize it again
+        assert store.get(f"session:{new_sid}")["user"]["username"] == "admin"
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_store_as_strategy_cache():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app, use_sessions=False)
+    Basic(cache=SQLiteStore(), cache_ttl=60)
+
+    @app.route("/protected")
+    @customs.protect(strategies=["basic"])
+    def protected(user):
+        return user["username"]
+
+    with app.test_client() as client:
+        for _ in range(2):
+            response = client.get("/protected", headers=_basic_header("admin", "admin"))
+            assert response.data == b"admin"
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
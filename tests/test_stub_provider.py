@@ -0,0 +1,209 @@
+from flask import Flask
+from requests import Session
+from typing import Dict
+from urllib.parse import urlsplit
+from customs import Customs
+from customs.http_client import HTTPClient
+from customs.stub_provider import StubProvider
+from customs.strategies import FacebookStrategy, GithubStrategy, GoogleStrategy
+
+
+def login(client, provider: StubProvider, name: str, login_hint: str = None):
+    """Go through the login flow of a strategy with the stub provider."""
+
+    response = client.get(f"/auth/{name}/login")
+    assert response.status_code == 302
+    location = urlsplit(response.headers["Location"])
+    assert location.netloc == "stub-provider"
+
+    # The provider redirects back to the callback immediately
+    query = location.query + (f"&login_hint={login_hint}" if login_hint else "")
+    response = provider.app.test_client().get(f"{location.path}?{query}")
+    assert response.status_code == 302
+
+    response = client.get(response.headers["Location"])
+    assert response.status_code == 302
+
+
+def test_stub_provider_login_flow():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app)
+
+    class Google(GoogleStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    # Route all calls of the strategy to the stub provider
+    provider = StubProvider(seed=1)
+    http_client = HTTPClient()
+    http_client.mount("http://stub-provider", provider.adapter())
+    Google(
+        client_id="id",
+        client_secret="secret",
+        enable_insecure=True,
+        http_client=http_client,
+        **provider.urls("http://stub-provider"),
+    )
+
+    @app.route("/profile")
+    @customs.protect(strategies=["google"])
+    def profile(user: Dict):
+        return user
+
+    with app.test_client() as client:
+        assert client.get("/profile").status_code == 401
+
+        login(client, provider, "google", login_hint="admin")
+        response = client.get("/profile")
+        assert response.status_code == 200
+        assert response.json["email"] == "admin@example.com"
+        assert provider.requests["token"] == 1
+        assert provider.requests["tokeninfo"] == 1
+
+        # Errors of the provider deny access (when the token is validated again)
+        with client.session_transaction() as session:
+            del session["strategy"]
+        provider.error_rate = 1
+        assert client.get("/profile").status_code == 401
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_stub_provider_id_token():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    Customs(app)
+
+    class Google(GoogleStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    provider = StubProvider()
+    http_client = HTTPClient()
+    http_client.mount("http://stub-provider", provider.adapter())
+    strategy = Google(
+        client_id="id",
+        client_secret="secret",
+        enable_insecure=True,
+        http_client=http_client,
+        verify_id_token=True,
+        certs_url="http://stub-provider/certs",
+        **provider.urls("http://stub-provider"),
+    )
+    strategy.issuers = [provider.issuer]
+
+    with app.test_client() as client:
+        login(client, provider, "google")
+        with client.session_transaction() as session:
+            token = session["oauth_token"]
+
+    # The ID token is verified locally, using the certificates of the provider
+    claims = strategy.validate_id_token(token["id_token"], token["access_token"])
+    assert claims["email"] == "stub@example.com"
+    assert "tokeninfo" not in provider.requests
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_stub_provider_refresh_token():
+
+    provider = StubProvider(token_lifetime=60)
+    client = Session()
+    client.mount("http://stub-provider", provider.adapter())
+
+    # Tokens can be refreshed
+    with provider.app.test_client() as browser:
+        response = browser.get(
+            "/authorize?client_id=id&redirect_uri=http://localhost/callback&state=s"
+        )
+    code = urlsplit(response.headers["Location"]).query.split("&")[0].split("=")[1]
+    tokens = client.post(
+        "http://stub-provider/token",
+        data={"grant_type": "authorization_code", "code": code},
+    ).json()
+    assert tokens["expires_in"] == 60
+
+    refreshed = client.post(
+        "http://stub-provider/token",
+        data={"grant_type": "refresh_token", "refresh_token": tokens["refresh_token"]},
+    ).json()
+    assert refreshed["access_token"] != tokens["access_token"]
+    assert refreshed["refresh_token"] == tokens["refresh_token"]
+
+    # Codes can only be used once
+    response = client.post(
+        "http://stub-provider/token",
+        data={"grant_type": "authorization_code", "code": code},
+    )
+    assert response.status_code == 400
+
+    # The token info endpoint only knows valid tokens
+    url = "http://stub-provider/tokeninfo?access_token="
+    assert client.get(url + refreshed["access_token"]).json()["aud"] == "id"
+    assert client.get(url + "invalid").status_code == 400
+
+
+def test_url_overrides():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    Customs(app)
+
+    class Github(GithubStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    strategy = Github(
+        client_id="id", client_secret="secret", token_url="http://localhost/token"
+    )
+    assert strategy.token_url == "http://localhost/token"
+    assert strategy.authorization_base_url == GithubStrategy.authorization_base_url
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_stub_provider_facebook():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(app)
+
+    class Facebook(FacebookStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    # Route all calls of the strategy to the stub provider
+    provider = StubProvider(seed=1)
+    http_client = HTTPClient()
+    http_client.mount("http://stub-provider", provider.adapter())
+    Facebook(
+        client_id="id",
+        client_secret="secret",
+        enable_insecure=True,
+        http_client=http_client,
+        **provider.urls("http://stub-provider"),
+    )
+
+    @app.route("/profile")
+    @customs.protect(strategies=["facebook"])
+    def profile(user: Dict):
+        return user
+
+    with app.test_client() as client:
+        login(client, provider, "facebook", login_hint="admin")
+        response = client.get("/profile")
+        assert response.status_code == 200
+        assert response.json["email"] == "admin@example.com"
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
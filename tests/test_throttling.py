@@ -0,0 +1,173 @@
+import time
+import base64
+
+from flask import Flask
+from typing import Dict
+from customs import Customs
+from customs.exceptions import UnauthorizedException
+from customs.metrics import InMemoryMetrics
+from customs.strategies import BasicStrategy, JWTStrategy
+from customs.throttling import SlidingWindowCounter, Throttle
+
+
+def _basic_header(username: str, password: str) -> Dict:
+    credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return {"Authorization": f"Basic {credentials}"}
+
+
+def test_sliding_window_counter():
+
+    counter = SlidingWindowCounter(window=0.2, max_keys=2)
+    counter.hit("a")
+    counter.hit("a")
+    counter.hit("b")
+    assert counter.count("a") == 2
+    assert counter.count("unknown") == 0
+
+    # The least recently used key is evicted
+    counter.hit("c")
+    assert len(counter) == 2
+    assert counter.count("a") == 0
+
+    # Counts of the previous window fade out, and are gone after two windows
+    time.sleep(0.2)
+    assert counter.count("b") <= 1
+    time.sleep(0.4)
+    assert counter.count("b") == 0
+
+    counter.reset("c")
+    assert counter.count("c") == 0
+
+
+def test_customs_throttle():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    customs = Customs(
+        app,
+        use_sessions=False,
+        metrics=InMemoryMetrics(),
+        throttle=Throttle(max_failures_per_user=3, max_failures_per_ip=5),
+    )
+    calls = []
+
+    class Basic(BasicStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            calls.append(username)
+            if password != "secret":
+                raise UnauthorizedException()
+            return {"username": username}
+
+    Basic()
+
+    @app.route("/protected")
+    @customs.protect(strategies=["basic"])
+    def protected(user):
+        return user["username"]
+
+    with app.test_client() as client:
+
+        # Recently failed credentials don't reach the backend
+        for _ in range(2):
+            response = client.get("/protected", headers=_basic_header("admin", "a"))
+            assert response.status_code == 401
+        assert calls == ["admin"]
+
+        # Too many failures for the user
+        client.get("/protected", headers=_basic_header("admin", "b"))
+        response = client.get("/protected", headers=_basic_header("admin", "secret"))
+        assert response.status_code == 429
+        assert len(calls) == 2
+
+        # Other users are still allowed, until the IP address has too many failures
+        response = client.get("/protected", headers=_basic_header("other", "secret"))
+        assert response.data == b"other"
+        client.get("/protected", headers=_basic_header("other", "a"))
+        client.get("/protected", headers=_basic_header("other", "b"))
+        response = client.get("/protected", headers=_basic_header("other", "secret"))
+        assert response.status_code == 429
+
+    assert customs.metrics.get_counter("customs_throttled_total") == 2
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()
+
+
+def test_customs_throttle_scope():
+
+    # Create customs
+    app = Flask("TESTS")
+    app.secret_key = "630738a8-3b13-4311-8018-87554d6f7e85"
+    throttle = Throttle(
+        max_failures_per_user=2,
+        max_failures_per_ip=2,
+        client_ip=lambda request: request.headers.get("X-Client"),
+    )
+    customs = Customs(app, use_sessions=False, throttle=throttle)
+    busy = [True]
+
+    class Basic(BasicStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+        def validate_credentials(self, username: str, password: str) -> Dict:
+            if busy[0]:
+                raise UnauthorizedException("Busy", 503)
+            if password != "secret":
+                raise UnauthorizedException()
+            return {"username": username}
+
+    class JWT(JWTStrategy):
+        def get_or_create_user(self, user: Dict) -> Dict:
+            return user
+
+    Basic()
+    jwt = JWT()
+
+    @app.route("/protected")
+    @customs.protect(strategies=["basic", "jwt"])
+    def protected(user):
+        return user["username"]
+
+    with app.test_client() as client:
+
+        # Errors of the backend are not failures of the credentials
+        for _ in range(3):
+            response = client.get(
+                "/protected", headers=_basic_header("admin", "secret")
+            )
+            assert response.status_code == 503
+        assert throttle.users.count("admin") == 0
+        busy[0] = False
+        response = client.get("/protected", headers=_basic_header("admin", "secret"))
+        assert response.data == b"admin"
+
+        # The client IP is throttled for passwords only
+        headers = {"X-Client": "10.0.0.1"}
+        for password in ("a", "b"):
+            client.get(
+                "/protected", headers={**headers, **_basic_header("other", password)}
+            )
+        response = client.get(
+            "/protected", headers={**headers, **_basic_header("third", "secret")}
+        )
+        assert response.status_code == 429
+        token = jwt.sign({"username": "token"})
+        response = client.get(
+            "/protected", headers={**headers, "Authorization": f"Bearer {token}"}
+        )
+        assert response.data == b"token"
+
+        # Other clients are not affected
+        response = client.get(
+            "/protected",
+            headers={"X-Client": "10.0.0.2", **_basic_header("third", "secret")},
+        )
+        assert response.data == b"third"
+
+    # Cleanup of the Customs object used for testing
+    Customs.remove_instance()